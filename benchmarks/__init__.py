@@ -0,0 +1,4 @@
+"""
+Benchmarks for Audio Processor
+Chạy offline trên CPU, không cần model Whisper
+"""
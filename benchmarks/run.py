@@ -0,0 +1,311 @@
+"""
+Pipeline Benchmark Suite
+Đo từng stage (AudioCutter, Aligner, SentenceSplitter, Exporter, AudioSegmenter,
+silence detection, trích segment bằng pydub/stream/seek) riêng lẻ và end-to-end
+với StubTranscriber, trên dữ liệu tổng hợp từ 1 phút tới 10 giờ. Chạy offline,
+chỉ cần CPU.
+
+Usage:
+    python -m benchmarks.run                               # 1m, 10m
+    python -m benchmarks.run --scales 1m,10m,1h,10h --output bench.json
+    python -m benchmarks.run --stages splitter_text,aligner --compare old.json
+    python -m benchmarks.run --scales 2h --stages extract_pydub,extract_stream,extract_seek
+"""
+
+import argparse
+import copy
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import yaml
+
+from benchmarks.synthetic import StubTranscriber, parse_duration, write_fixture
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _config() -> Dict:
+    """Config.yaml của repo với các thiết lập chạy được offline"""
+    with open(os.path.join(ROOT, 'config.yaml'), 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    config['output']['create_subfolder'] = False
+    return config
+
+
+def _measure(fn: Callable, repeat: int) -> Dict:
+    """Chạy fn nhiều lần, lấy lần nhanh nhất"""
+    best = None
+    for _ in range(repeat):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        items = fn()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        if best is None or wall < best['wall']:
+            best = {'wall': wall, 'cpu': cpu, 'items': items}
+    return best
+
+
+class Fixture:
+    """Audio + transcription tổng hợp cho một scale, và các input trung gian"""
+
+    def __init__(self, workdir: str, duration: float, sample_rate: int, channels: int):
+        self.duration = duration
+        self.workdir = workdir
+        self.audio_path = os.path.join(workdir, f"synthetic_{int(duration)}s.wav")
+        self.transcription = write_fixture(self.audio_path, duration, sample_rate, channels)
+        self.config = _config()
+
+        from core.aligner import Aligner
+        from core.sentence_splitter import SentenceSplitter
+
+        splitter = SentenceSplitter(self.config)
+        # Ngôn ngữ 'auto' dùng splitter cơ bản, không cần NLTK data
+        self.sentences = splitter.split_sentences(self.transcription['text'], language='auto')
+        self.aligned = Aligner(self.config).align_sentences(self.sentences, self.transcription)
+
+    def output_dir(self, name: str) -> str:
+        path = os.path.join(self.workdir, 'out', name)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+
+# ---------------------------------------------------------------- stages
+
+def bench_splitter_text(fx: Fixture) -> int:
+    from core.sentence_splitter import SentenceSplitter
+    return len(SentenceSplitter(fx.config).split_sentences(fx.transcription['text'], language='auto'))
+
+
+def bench_splitter_words(fx: Fixture) -> int:
+    from core.sentence_splitter import SentenceSplitter
+    from core.transcriber import iter_words
+    splitter = SentenceSplitter(fx.config)
+    return sum(1 for _ in splitter.split_word_stream(iter_words(fx.transcription), max_duration=14.8))
+
+
+def bench_aligner(fx: Fixture) -> int:
+    from core.aligner import Aligner
+    return len(Aligner(fx.config).align_sentences(fx.sentences, fx.transcription))
+
+
+def bench_planner(fx: Fixture) -> int:
+    from core.segment_planner import SegmentPlanner
+    return len(SegmentPlanner.from_config(fx.config).plan_sentences(fx.aligned))
+
+
+def bench_cutter(fx: Fixture) -> int:
+    from core.audio_cutter import AudioCutter
+    out = fx.output_dir('cutter')
+    return len(AudioCutter(fx.config).cut_audio(fx.audio_path, fx.aligned, out))
+
+
+def bench_exporter(fx: Fixture) -> int:
+    from core.exporter import Exporter
+    out = fx.output_dir('exporter')
+    segments_info = [
+        {
+            'index': i, 'filename': f"segment_{i + 1:04d}.wav",
+            'path': os.path.join(out, f"segment_{i + 1:04d}.wav"),
+            'text': s['text'], 'start': s['start'], 'end': s['end'],
+            'duration': s['end'] - s['start'], 'sample_rate': 16000, 'channels': 1,
+            'confidence': s.get('confidence')
+        }
+        for i, s in enumerate(fx.aligned)
+    ]
+    Exporter(fx.config).export_all(segments_info, out, os.path.basename(fx.audio_path), fx.transcription)
+    return len(segments_info)
+
+
+def _sparse_spans(fx: Fixture) -> List:
+    """Mỗi câu thứ 10 (vài chục segment mỗi giờ audio), có padding"""
+    return [(max(0.0, s['start'] - 0.1), s['end'] + 0.1) for s in fx.aligned[::10]]
+
+
+def bench_extract_pydub(fx: Fixture) -> int:
+    """Cách cũ: decode cả file bằng pydub rồi slice"""
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(fx.audio_path)
+    return sum(1 for start, end in _sparse_spans(fx) if len(audio[int(start * 1000):int(end * 1000)]))
+
+
+def bench_extract_stream(fx: Fixture) -> int:
+    from core.audio_reader import AudioReader
+    reader = AudioReader(fx.audio_path, random_access=False)
+    return sum(1 for _ in reader.extract(_sparse_spans(fx)))
+
+
+def bench_extract_seek(fx: Fixture) -> int:
+    from core.audio_reader import AudioReader
+    reader = AudioReader(fx.audio_path)
+    if not reader.seekable:
+        raise RuntimeError(f"{reader.backend} backend is not seekable")
+    return sum(1 for _ in reader.extract(_sparse_spans(fx)))
+
+
+def bench_segmenter(fx: Fixture) -> int:
+    from config import AudioConfig
+    from segmenter import AudioSegmenter
+    from transcriber import TranscriptSegment
+    segments = [TranscriptSegment(i, s['start'], s['end'], s['text']) for i, s in enumerate(fx.aligned)]
+    out = fx.output_dir('segmenter')
+    return len(AudioSegmenter(AudioConfig()).export_segments(fx.audio_path, segments, out))
+
+
+def bench_silence(fx: Fixture) -> int:
+    from config import AudioConfig
+    from segmenter import AudioSegmenter
+    return len(AudioSegmenter(AudioConfig()).detect_silence_segments(fx.audio_path))
+
+
+def bench_end_to_end(fx: Fixture) -> int:
+    from cli import process_audio
+    config = copy.deepcopy(fx.config)
+    out = fx.output_dir('end_to_end')
+    result = process_audio(fx.audio_path, out, config, transcriber=StubTranscriber(config))
+    if result['status'] != 'success':
+        raise RuntimeError(result.get('error'))
+    return result['total_segments']
+
+
+STAGES = {
+    'splitter_text': bench_splitter_text,
+    'splitter_words': bench_splitter_words,
+    'aligner': bench_aligner,
+    'planner': bench_planner,
+    'cutter': bench_cutter,
+    'extract_pydub': bench_extract_pydub,
+    'extract_stream': bench_extract_stream,
+    'extract_seek': bench_extract_seek,
+    'exporter': bench_exporter,
+    'segmenter': bench_segmenter,
+    'silence': bench_silence,
+    'end_to_end': bench_end_to_end,
+}
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_suite(scales: List[float], stages: List[str], repeat: int,
+              sample_rate: int, channels: int, quiet: bool = True) -> Dict:
+    """Chạy các stage trên mọi scale, trả về kết quả dạng JSON"""
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix='audio_bench_') as workdir:
+        for duration in scales:
+            print(f"Generating {duration:.0f}s synthetic audio...", file=sys.stderr)
+            fixture = Fixture(workdir, duration, sample_rate, channels)
+
+            for name in stages:
+                try:
+                    # Các module core in ra console; tắt đi để không ảnh hưởng số đo
+                    with open(os.devnull, 'w') as devnull:
+                        stdout, sys.stdout = sys.stdout, (devnull if quiet else sys.stdout)
+                        try:
+                            measured = _measure(lambda: STAGES[name](fixture), repeat)
+                        finally:
+                            sys.stdout = stdout
+                except Exception as e:
+                    results.append({'stage': name, 'audio_seconds': duration, 'error': str(e)})
+                    print(f"  {name:<15} {duration:>8.0f}s  ERROR: {e}", file=sys.stderr)
+                    continue
+
+                results.append({
+                    'stage': name,
+                    'audio_seconds': duration,
+                    'wall_seconds': round(measured['wall'], 4),
+                    'cpu_seconds': round(measured['cpu'], 4),
+                    'items': measured['items'],
+                    # Bao nhiêu giây audio xử lý được trong 1 giây
+                    'audio_seconds_per_second': round(duration / measured['wall'], 1) if measured['wall'] else None
+                })
+                print(f"  {name:<15} {duration:>8.0f}s  {measured['wall']:>9.3f}s wall", file=sys.stderr)
+
+            shutil.rmtree(os.path.join(workdir, 'out'), ignore_errors=True)
+            for path in (fixture.audio_path, fixture.audio_path + '.words.json'):
+                os.remove(path)
+
+    return {
+        'revision': _git_revision(),
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'repeat': repeat,
+        'results': results
+    }
+
+
+def compare(current: Dict, baseline: Dict) -> List[str]:
+    """So sánh với một lần chạy trước: tỷ lệ wall time (>1 là chậm hơn)"""
+    previous = {
+        (r['stage'], r['audio_seconds']): r for r in baseline['results'] if 'wall_seconds' in r
+    }
+    lines = [f"{'stage':<15}{'audio (s)':>10}{'before':>10}{'after':>10}{'ratio':>8}"]
+    for r in current['results']:
+        old = previous.get((r['stage'], r['audio_seconds']))
+        if old and 'wall_seconds' in r and old['wall_seconds']:
+            ratio = r['wall_seconds'] / old['wall_seconds']
+            lines.append(f"{r['stage']:<15}{r['audio_seconds']:>10.0f}{old['wall_seconds']:>10.3f}"
+                         f"{r['wall_seconds']:>10.3f}{ratio:>8.2f}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic-data benchmark suite for pipeline stages')
+    parser.add_argument('--scales', default='1m,10m',
+                        help='Comma-separated audio durations, e.g. 1m,10m,1h,10h (default: 1m,10m)')
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f"Comma-separated stages (default: all): {', '.join(STAGES)}")
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per measurement, best is kept')
+    parser.add_argument('--sample-rate', type=int, default=16000, help='Synthetic audio sample rate')
+    parser.add_argument('--channels', type=int, default=1, help='Synthetic audio channels')
+    parser.add_argument('--output', type=str, help='Write JSON results to this file (default: stdout)')
+    parser.add_argument('--compare', type=str, help='Previous JSON results to compare against')
+    args = parser.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(unknown)}")
+
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+    report = run_suite(
+        [parse_duration(s) for s in args.scales.split(',')],
+        stages, args.repeat, args.sample_rate, args.channels
+    )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            print('\n'.join(compare(report, json.load(f))), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Startup Benchmark
+Đo thời gian khởi động của các lệnh không cần model (--help, --stats)
+và kiểm tra rằng không có dependency nặng nào bị import.
+
+Usage:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --budget 0.8 --repeat 5 --json startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Các module không được phép load khi chạy lệnh không cần model
+HEAVY_MODULES = [
+    'torch', 'whisper', 'stable_whisper', 'faster_whisper',
+    'nltk', 'underthesea', 'pydub', 'librosa'
+]
+
+# Chạy entry point trong subprocess rồi in ra các module nặng đã bị import
+RUNNER = """
+import json, runpy, sys
+sys.argv = {argv!r}
+try:
+    runpy.run_path({script!r}, run_name='__main__')
+except SystemExit:
+    pass
+heavy = [m for m in {heavy!r} if m in sys.modules]
+sys.stderr.write('HEAVY_MODULES=' + json.dumps(heavy) + '\\n')
+"""
+
+
+def _write_stats_fixture(directory: str) -> str:
+    """Tạo một output directory nhỏ với manifest.json để chạy --stats"""
+    manifest = {
+        "total_segments": 2,
+        "total_duration": 3.0,
+        "segments": [
+            {"id": 0, "text": "Xin chào các bạn.", "start": 0.0, "end": 1.5, "duration": 1.5},
+            {"id": 1, "text": "Đây là một bài test.", "start": 1.5, "end": 3.0, "duration": 1.5}
+        ]
+    }
+    with open(os.path.join(directory, "manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    return directory
+
+
+def measure(script: str, argv: list, repeat: int) -> dict:
+    """Chạy một lệnh nhiều lần, trả về thời gian và các module nặng đã load"""
+    code = RUNNER.format(argv=[script] + argv, script=os.path.join(ROOT, script), heavy=HEAVY_MODULES)
+
+    timings = []
+    heavy = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT,
+            capture_output=True,
+            text=True
+        )
+        timings.append(time.perf_counter() - start)
+
+        for line in proc.stderr.splitlines():
+            if line.startswith('HEAVY_MODULES='):
+                heavy = json.loads(line.split('=', 1)[1])
+
+    return {
+        'command': ' '.join([script] + argv),
+        'median_seconds': statistics.median(timings),
+        'min_seconds': min(timings),
+        'heavy_modules': heavy
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup time benchmark for model-free commands')
+    parser.add_argument('--budget', type=float, default=1.0,
+                        help='Max median startup time in seconds (default: 1.0)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per command (default: 3)')
+    parser.add_argument('--json', type=str, help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stats_dir = _write_stats_fixture(tmp)
+
+        commands = [
+            ('main.py', ['--help']),
+            ('main.py', ['--stats', stats_dir]),
+            ('cli.py', ['--help']),
+        ]
+
+        results = [measure(script, argv, args.repeat) for script, argv in commands]
+
+    failed = False
+    print(f"{'command':<40} {'median':>8} {'min':>8}  heavy imports")
+    for r in results:
+        over_budget = r['median_seconds'] > args.budget
+        failed = failed or over_budget or bool(r['heavy_modules'])
+        print(f"{r['command'][:40]:<40} {r['median_seconds']:>7.3f}s {r['min_seconds']:>7.3f}s  "
+              f"{', '.join(r['heavy_modules']) or '-'}{'  (over budget)' if over_budget else ''}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'budget_seconds': args.budget, 'results': results}, f, indent=2)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Synthetic Data for Benchmarks
+Sinh audio tổng hợp (tone + noise xen kẽ khoảng lặng) và word timeline giả,
+cùng một StubTranscriber có interface giống core.transcriber.Transcriber
+"""
+
+import json
+import os
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# Âm tiết giả để tạo "từ" (không cần ý nghĩa, chỉ cần độ dài thực tế)
+SYLLABLES = [
+    "xin", "chào", "các", "bạn", "đây", "là", "một", "bài", "kiểm", "tra",
+    "hello", "world", "audio", "text", "segment", "model", "speech", "data"
+]
+
+# Mỗi block sinh ra/ghi ra 60 giây để bộ nhớ không phụ thuộc độ dài file
+BLOCK_SECONDS = 60
+
+
+def parse_duration(value: str) -> float:
+    """'90s', '10m', '1h', '2.5' -> giây"""
+    value = value.strip().lower()
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def speech_regions(
+    duration: float,
+    seed: int = 0,
+    speech_range: Tuple[float, float] = (1.5, 6.0),
+    silence_range: Tuple[float, float] = (0.2, 1.2)
+) -> List[Tuple[float, float]]:
+    """Sinh các vùng có tiếng (start, end) xen kẽ khoảng lặng có kiểm soát"""
+    rng = np.random.default_rng(seed)
+    regions = []
+    position = float(rng.uniform(*silence_range))
+
+    while position < duration:
+        end = min(position + float(rng.uniform(*speech_range)), duration)
+        if end - position > 0.1:
+            regions.append((round(position, 3), round(end, 3)))
+        position = end + float(rng.uniform(*silence_range))
+
+    return regions
+
+
+def render_block(
+    block_start: float,
+    num_samples: int,
+    sample_rate: int,
+    regions: List[Tuple[float, float]],
+    rng: np.random.Generator
+) -> np.ndarray:
+    """Render một block audio: tone + noise trong vùng có tiếng, noise floor -60dB ở chỗ khác"""
+    t = block_start + np.arange(num_samples) / sample_rate
+    block = rng.normal(0.0, 0.001, num_samples).astype(np.float32)
+
+    block_end = block_start + num_samples / sample_rate
+    for start, end in regions:
+        if end <= block_start or start >= block_end:
+            continue
+        mask = (t >= start) & (t < end)
+        freq = 150 + 50 * (hash((start, end)) % 7)
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t[mask])  # nhịp âm tiết ~4Hz
+        block[mask] += (0.3 * envelope * np.sin(2 * np.pi * freq * t[mask])
+                        + rng.normal(0.0, 0.02, int(mask.sum()))).astype(np.float32)
+
+    return np.clip(block, -1.0, 1.0)
+
+
+def write_audio(
+    path: str,
+    duration: float,
+    sample_rate: int = 16000,
+    channels: int = 1,
+    seed: int = 0
+) -> List[Tuple[float, float]]:
+    """
+    Ghi file WAV PCM16 tổng hợp theo từng block (bộ nhớ cố định kể cả 10 giờ)
+
+    Returns:
+        Các vùng có tiếng (start, end) đã dùng để sinh audio
+    """
+    import soundfile as sf
+
+    regions = speech_regions(duration, seed)
+    rng = np.random.default_rng(seed + 1)
+    total = int(duration * sample_rate)
+    block_size = BLOCK_SECONDS * sample_rate
+
+    starts = [start for start, _ in regions]
+
+    with sf.SoundFile(path, 'w', samplerate=sample_rate, channels=channels, subtype='PCM_16') as f:
+        for offset in range(0, total, block_size):
+            block_start = offset / sample_rate
+            # Chỉ các vùng chạm vào block này
+            first = max(bisect_right(starts, block_start) - 1, 0)
+            last = bisect_right(starts, block_start + BLOCK_SECONDS)
+            block = render_block(block_start, min(block_size, total - offset),
+                                 sample_rate, regions[first:last], rng)
+            f.write(np.repeat(block[:, None], channels, axis=1) if channels > 1 else block)
+
+    return regions
+
+
+def make_transcription(
+    regions: List[Tuple[float, float]],
+    seed: int = 0,
+    word_duration: float = 0.3,
+    language: str = 'vi'
+) -> Dict:
+    """
+    Sinh transcription giả cùng format với Transcriber.transcribe
+
+    Mỗi vùng có tiếng là một segment, kết thúc bằng dấu chấm/hỏi.
+    """
+    rng = np.random.default_rng(seed)
+    segments = []
+
+    for start, end in regions:
+        count = max(1, int((end - start) / word_duration))
+        step = (end - start) / count
+        words = []
+        for i in range(count):
+            token = SYLLABLES[int(rng.integers(len(SYLLABLES)))]
+            if i == count - 1:
+                token += '.' if rng.random() < 0.8 else '?'
+            elif rng.random() < 0.08:
+                token += ','
+            words.append({
+                'word': ' ' + token,
+                'start': round(start + i * step, 3),
+                'end': round(start + (i + 0.9) * step, 3),
+                'probability': round(float(rng.uniform(0.5, 1.0)), 3)
+            })
+
+        segments.append({
+            'start': start,
+            'end': end,
+            'text': ''.join(w['word'] for w in words).strip(),
+            'confidence': round(float(rng.uniform(-0.8, -0.1)), 3),
+            'words': words
+        })
+
+    return {
+        'text': ' '.join(s['text'] for s in segments),
+        'segments': segments,
+        'language': language,
+        'duration': regions[-1][1] if regions else 0.0
+    }
+
+
+def timeline_path(audio_path: str) -> str:
+    """File sidecar chứa word timeline của audio tổng hợp"""
+    return audio_path + '.words.json'
+
+
+def write_fixture(path: str, duration: float, sample_rate: int = 16000,
+                  channels: int = 1, seed: int = 0) -> Dict:
+    """Ghi audio tổng hợp + word timeline sidecar, trả về transcription"""
+    regions = write_audio(path, duration, sample_rate, channels, seed)
+    transcription = make_transcription(regions, seed)
+    transcription['duration'] = duration
+
+    with open(timeline_path(path), 'w', encoding='utf-8') as f:
+        json.dump(transcription, f, ensure_ascii=False)
+
+    return transcription
+
+
+class StubTranscriber:
+    """
+    Transcriber giả (không load model) cho benchmark và test offline
+
+    Đọc word timeline sidecar nếu có (write_fixture), nếu không thì sinh
+    timeline đều theo duration của file.
+    """
+
+    def __init__(self, config: Optional[Dict] = None, delay_factor: float = 0.0):
+        """
+        Args:
+            config: Config dict (giữ cùng chữ ký với Transcriber)
+            delay_factor: Giả lập thời gian model = delay_factor * duration
+        """
+        self.config = config or {}
+        self.delay_factor = delay_factor
+        self.engine = 'stub'
+
+    def transcribe(self, audio_path) -> Dict:
+        if isinstance(audio_path, np.ndarray):
+            duration = len(audio_path) / 16000
+            transcription = make_transcription(speech_regions(duration))
+        elif os.path.exists(timeline_path(audio_path)):
+            with open(timeline_path(audio_path), 'r', encoding='utf-8') as f:
+                transcription = json.load(f)
+            duration = transcription.get('duration') or 0.0
+        else:
+            from core.audio_io import probe_audio
+
+            duration = probe_audio(audio_path)['duration']
+            transcription = make_transcription(speech_regions(duration))
+            transcription['duration'] = duration
+
+        if self.delay_factor:
+            import time
+            time.sleep(self.delay_factor * duration)
+
+        return transcription
+
+    def transcribe_stream(self, audio_path):
+        yield from self.transcribe(audio_path)['segments']
+
+    def get_words_with_timestamps(self, transcription: Dict) -> List[Dict]:
+        from core.transcriber import iter_words
+
+        return list(iter_words(transcription))
@@ -4,15 +4,41 @@ Command Line Interface for Audio Text Segmentation Tool
 
 import os
 import sys
+import json
 import yaml
 import argparse
-from tqdm import tqdm
+from datetime import datetime
 
-from core.transcriber import Transcriber
+from core.transcriber import Transcriber, iter_words
 from core.sentence_splitter import SentenceSplitter
 from core.aligner import Aligner
 from core.audio_cutter import AudioCutter
+from core.audio_cache import AudioCache, read_normalized
+from core.audio_io import load_audio
 from core.exporter import Exporter
+from core.segment_planner import SegmentPlanner
+from core.batch_pipeline import BatchPipeline, PipelineStage, format_pipeline_stats
+from core.scheduler import EtaEstimator, format_eta, order_files, probe_durations
+from core.probe_index import ProbeIndex
+from core.ledger import ProcessedLedger, config_fingerprint
+from core.dedup import duplicate_result, find_duplicates, savings_report
+from core.metrics import StageTimer, aggregate_timings, format_timing_table
+from core.memprofile import MemoryProfiler, find_scaling_stages
+from core.tracing import span, trace_to
+
+
+# Các section của config.yaml quyết định output (dùng cho ledger bỏ qua file đã xử lý)
+OUTPUT_SETTINGS = (
+    'stt', 'clip_packing', 'sentence_splitter', 'audio_segmentation',
+    'segment_planner', 'segment_dedup', 'alignment', 'export'
+)
+
+# Các key trong OUTPUT_SETTINGS chỉ ảnh hưởng tốc độ / đường dẫn, không đổi kết quả
+PERFORMANCE_SETTINGS = {
+    'sentence_splitter': ('nltk_data_dir',),
+    'audio_segmentation': ('read_block_seconds', 'cut_backend', 'write_queue_size'),
+    'segment_dedup': ('index_path',),
+}
 
 
 def load_config(config_path='config.yaml'):
@@ -25,88 +51,413 @@ def load_config(config_path='config.yaml'):
         return yaml.safe_load(f)
 
 
-def process_audio(audio_path, output_dir, config):
-    """Main processing pipeline"""
+def process_audio(audio_path, output_dir, config, transcription=None, transcriber=None):
+    """
+    Main processing pipeline
+    
+    Nếu đã có transcription (ví dụ từ clip packing), bỏ qua bước transcribe
+    và không load model. Có thể truyền sẵn transcriber (model đã load)
+    để dùng lại giữa nhiều file.
+    
+    Nếu processing.profile_memory bật, ghi thêm memory_report.json
+    (peak memory theo stage) vào output directory.
+    
+    Returns:
+        Dict kết quả: status, input_file, output_dir, total_segments, timing
+        (và memory nếu profile memory)
+    """
     
     if not os.path.exists(audio_path):
         print(f"Error: Audio file not found: {audio_path}")
-        return False
+        return {'status': 'failed', 'input_file': audio_path, 'error': 'Audio file not found'}
     
     audio_filename = os.path.basename(audio_path)
     print(f"\n{'='*60}")
     print(f"Processing: {audio_filename}")
     print(f"{'='*60}")
     
-    try:
-        # Initialize processors
-        print("\n[1/5] Initializing processors...")
-        transcriber = Transcriber(config)
+    profiler = None
+    if config.get('processing', {}).get('profile_memory', False):
+        profiler = MemoryProfiler()
+    timer = StageTimer(profiler=profiler)
+    
+    # Span cho cả file trong trace timeline (không làm gì nếu trace tắt)
+    with span('file', cat='file', file=audio_filename):
+        try:
+            # Initialize processors
+            print("\n[1/5] Initializing processors...")
+            with timer.stage('load_model'):
+                if transcriber is None and transcription is None:
+                    transcriber = Transcriber(config)
+            
+            audio, normalized_path = prepare_audio(
+                audio_path, config, timer, load=transcription is None
+            )
+            
+            # Step 1: Transcribe
+            print("\n[2/5] Transcribing audio...")
+            if transcription is None:
+                with timer.stage('transcribe'):
+                    transcription = transcriber.transcribe(audio)
+                audio = None
+            else:
+                print("  ✓ Using packed-clip transcription")
+            
+            return finish_audio(
+                audio_path, output_dir, config, transcription, timer, normalized_path
+            )
+            
+        except Exception as e:
+            return failed_result(audio_path, e, timer)
+        
+        finally:
+            if profiler is not None:
+                profiler.stop()
+
+
+def prepare_audio(audio_path, config, timer, load=True, decode=False):
+    """
+    Chuẩn bị audio cho transcribe và cắt
+    
+    Nếu bật audio_cache, chuẩn hóa file (16kHz mono) một lần và đọc từ cache.
+    decode=True decode sẵn file gốc thành array (batch pipeline: decode chạy
+    song song với ASR của file trước thay vì trong thread của model).
+    
+    Returns:
+        (audio cho transcriber: np.ndarray hoặc audio_path, normalized_path hoặc None)
+    """
+    audio_cache = AudioCache.from_config(config)
+    normalized_path = None
+    if audio_cache is not None:
+        with timer.stage('normalize'):
+            normalized_path = audio_cache.get(audio_path)
+        print(f"  ✓ Normalized audio: {normalized_path}")
+    
+    audio = audio_path
+    if load and (normalized_path or decode):
+        with timer.stage('load_audio'):
+            audio = read_normalized(normalized_path) if normalized_path else load_audio(audio_path)
+    
+    return audio, normalized_path
+
+
+def finish_audio(audio_path, output_dir, config, transcription, timer, normalized_path=None):
+    """
+    Các bước sau transcribe: split, align, (plan), cut, export
+    
+    Returns:
+        Dict kết quả như process_audio (status success)
+    """
+    audio_filename = os.path.basename(audio_path)
+    profiler = timer.profiler
+    
+    # Stage riêng: load_model chỉ đo lần load Transcriber
+    with timer.stage('init'):
         sentence_splitter = SentenceSplitter(config)
         aligner = Aligner(config)
         audio_cutter = AudioCutter(config)
         exporter = Exporter(config)
-        
-        # Step 1: Transcribe
-        print("\n[2/5] Transcribing audio...")
-        transcription = transcriber.transcribe(audio_path)
-        print(f"  ✓ Language: {transcription['language']}")
-        print(f"  ✓ Duration: {transcription.get('duration', 'N/A')}s")
-        print(f"  ✓ Text length: {len(transcription['text'])} chars")
-        
-        # Step 2: Split sentences
-        print("\n[3/5] Splitting sentences...")
-        sentences = sentence_splitter.split_sentences(
-            transcription['text'],
-            language=transcription['language']
-        )
-        print(f"  ✓ Total sentences: {len(sentences)}")
-        
-        # Step 3: Align
-        print("\n[4/5] Aligning timestamps...")
-        aligned_sentences = aligner.align_sentences(sentences, transcription)
-        print(f"  ✓ Aligned: {len(aligned_sentences)} sentences")
-        
-        # Step 4: Cut audio
-        print("\n[5/5] Cutting audio segments...")
-        
-        # Prepare output directory
-        if config['output']['create_subfolder']:
-            base_name = os.path.splitext(audio_filename)[0]
-            final_output_dir = os.path.join(output_dir, base_name)
+    
+    print(f"  ✓ Language: {transcription['language']}")
+    print(f"  ✓ Duration: {transcription.get('duration', 'N/A')}s")
+    print(f"  ✓ Text length: {len(transcription['text'])} chars")
+    
+    # Step 2: Split sentences
+    print("\n[3/5] Splitting sentences...")
+    split_mode = config['sentence_splitter'].get('mode', 'text')
+    with timer.stage('split'):
+        if split_mode == 'words':
+            # Tách trực tiếp trên word timeline, câu đã có timestamps
+            seg_config = config['audio_segmentation']
+            max_sentence_duration = (
+                seg_config['max_duration'] - seg_config['padding_before'] - seg_config['padding_after']
+            )
+            sentences = list(sentence_splitter.split_word_stream(
+                iter_words(transcription),
+                max_duration=max_sentence_duration
+            ))
         else:
-            final_output_dir = output_dir
-        
-        os.makedirs(final_output_dir, exist_ok=True)
-        
-        segments_dir = os.path.join(final_output_dir, "segments")
-        segments_info = audio_cutter.cut_audio(
-            audio_path,
-            aligned_sentences,
-            segments_dir
-        )
-        
-        # Step 5: Export
-        print("\n[6/6] Exporting results...")
+            sentences = sentence_splitter.split_sentences(
+                transcription['text'],
+                language=transcription['language']
+            )
+    print(f"  ✓ Total sentences: {len(sentences)}")
+
+    # Step 3: Align
+    print("\n[4/5] Aligning timestamps...")
+    with timer.stage('align'):
+        if split_mode == 'words':
+            aligned_sentences = aligner.align_word_spans(sentences)
+        else:
+            aligned_sentences = aligner.align_sentences(sentences, transcription)
+    print(f"  ✓ Aligned: {len(aligned_sentences)} sentences")
+
+    extra_metadata = {}
+    if transcription.get('cascade'):
+        extra_metadata['cascade'] = transcription['cascade']
+    if config.get('segment_planner', {}).get('enabled', False):
+        # Chọn điểm cắt theo duration buckets thay vì cắt theo từng câu
+        with timer.stage('plan'):
+            planner = SegmentPlanner.from_config(config)
+            baseline = [(s['start'], s['end']) for s in aligned_sentences]
+            aligned_sentences = planner.plan_sentences(aligned_sentences)
+            plan_report = planner.report(
+                [(s['start'], s['end']) for s in aligned_sentences],
+                baseline=baseline
+            )
+        extra_metadata['segment_plan'] = plan_report
+        print(f"  ✓ Planned: {len(aligned_sentences)} segments, padding efficiency "
+              f"{plan_report['baseline_padding_efficiency']:.1%} → {plan_report['padding_efficiency']:.1%}")
+
+    # Step 4: Cut audio
+    print("\n[5/5] Cutting audio segments...")
+
+    # Prepare output directory
+    if config['output']['create_subfolder']:
+        base_name = os.path.splitext(audio_filename)[0]
+        final_output_dir = os.path.join(output_dir, base_name)
+    else:
+        final_output_dir = output_dir
+
+    os.makedirs(final_output_dir, exist_ok=True)
+
+    segments_dir = os.path.join(final_output_dir, "segments")
+
+    # Output 16kHz mono: cắt thẳng từ file cache, không resample từng segment
+    cut_source = audio_path
+    if normalized_path and AudioCache.from_config(config).serves(
+        audio_cutter.output_sample_rate, audio_cutter.output_channels
+    ):
+        cut_source = normalized_path
+
+    # Cutter tự đo hai stage: decode và cut
+    segments_info = audio_cutter.cut_audio(
+        cut_source,
+        aligned_sentences,
+        segments_dir,
+        timer=timer,
+        source=audio_path
+    )
+    if audio_cutter.dedup_report is not None:
+        extra_metadata['segment_dedup'] = audio_cutter.dedup_report
+
+    # Step 5: Export
+    print("\n[6/6] Exporting results...")
+    with timer.stage('export'):
         exporter.export_all(
             segments_info,
             final_output_dir,
             audio_filename,
-            transcription
+            transcription,
+            extra_metadata
         )
-        
-        print(f"\n{'='*60}")
-        print("✓ PROCESSING COMPLETE!")
-        print(f"  Total segments: {len(segments_info)}")
-        print(f"  Output: {final_output_dir}")
-        print(f"{'='*60}\n")
-        
-        return True
-        
-    except Exception as e:
-        print(f"\n❌ Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return False
+
+    timing = timer.summary(
+        audio_duration=transcription.get('duration') or timer.audio_duration,
+        num_segments=len(segments_info)
+    )
+    if exporter.create_manifest:
+        exporter.update_manifest_metadata(final_output_dir, {'timing': timing})
+
+    memory_report = None
+    if profiler is not None:
+        memory_report = profiler.write_report(
+            os.path.join(final_output_dir, 'memory_report.json'),
+            audio_duration=timing['audio_duration'],
+            input_file=audio_path
+        )
+
+    print(f"\n{'='*60}")
+    print("✓ PROCESSING COMPLETE!")
+    print(f"  Total segments: {len(segments_info)}")
+    if timing['real_time_factor'] is not None:
+        print(f"  Time: {timing['total_wall']:.2f}s (RTF {timing['real_time_factor']:.3f})")
+    if memory_report is not None:
+        print(f"  Peak RSS: {memory_report['peak_rss_mb']} MB")
+        if memory_report['scaling_stages']:
+            print(f"  ⚠ Memory scales with duration: {', '.join(memory_report['scaling_stages'])}")
+    print(f"  Output: {final_output_dir}")
+    print(f"{'='*60}\n")
+
+    result = {
+        'status': 'success',
+        'input_file': audio_path,
+        'output_dir': final_output_dir,
+        'total_segments': len(segments_info),
+        'timing': timing
+    }
+    if memory_report is not None:
+        result['memory'] = memory_report
+    return result
+
+
+def failed_result(audio_path, error, timer=None):
+    """Kết quả của file xử lý lỗi (in traceback)"""
+    import traceback
+    
+    print(f"\n❌ Error: {str(error)}")
+    traceback.print_exception(type(error), error, error.__traceback__)
+    
+    result = {
+        'status': 'failed',
+        'input_file': audio_path,
+        'error': str(error)
+    }
+    if timer is not None:
+        result['timing'] = timer.summary()
+    return result
+
+
+def transcribe_packed_clips(audio_files, config, probe_index=None):
+    """Transcribe các clip ngắn bằng cách ghép chúng thành cửa sổ ~30s"""
+    from core.clip_packer import ClipPacker
+    
+    packer = ClipPacker(config)
+    if probe_index is not None:
+        clips = packer.select_clips(audio_files, probe=probe_index.get)
+    else:
+        clips = packer.select_clips(audio_files)
+    
+    if not clips:
+        return {}
+    
+    print(f"\nPacking {len(clips)} short clips (<= {packer.max_clip_duration}s)...")
+    packer.transcriber = Transcriber(config)
+    
+    return packer.transcribe_clips(clips)
+
+
+def pipeline_process(audio_files, output_dir, config, packed_transcriptions=None, eta=None,
+                     durations=None, ledger=None):
+    """
+    Xử lý nhiều file chồng lấn nhau qua BatchPipeline
+    
+    decode (normalize + load audio) của các file sau và cut/export của các file
+    trước chạy trong thread pool riêng, song song với transcribe của file hiện
+    tại. Model được load một lần trong thread duy nhất của stage transcribe.
+    Nếu có eta (EtaEstimator) và durations, in ETA mỗi khi một file xong.
+    Nếu có ledger (ProcessedLedger), ghi nhận các file thành công.
+    
+    Returns:
+        (list kết quả theo thứ tự audio_files, thống kê pipeline)
+    """
+    packed_transcriptions = packed_transcriptions or {}
+    processing = config.get('processing', {})
+    io_workers = max(1, processing.get('num_workers', 1))
+    model = {}
+    
+    def decode(audio_path):
+        print(f"\nDecoding: {os.path.basename(audio_path)}")
+        timer = StageTimer()
+        transcription = packed_transcriptions.get(audio_path)
+        with span('file.decode', cat='file', file=os.path.basename(audio_path)):
+            audio, normalized_path = prepare_audio(
+                audio_path, config, timer, load=transcription is None, decode=True
+            )
+        return {
+            'audio_path': audio_path,
+            'timer': timer,
+            'transcription': transcription,
+            'audio': audio,
+            'normalized_path': normalized_path
+        }
+    
+    def transcribe(job):
+        audio = job.pop('audio')
+        if job['transcription'] is None:
+            timer = job['timer']
+            if 'transcriber' not in model:
+                with timer.stage('load_model'):
+                    model['transcriber'] = Transcriber(config)
+            with timer.stage('transcribe'):
+                job['transcription'] = model['transcriber'].transcribe(audio)
+        return job
+    
+    def finish(job):
+        with span('file.finish', cat='file', file=os.path.basename(job['audio_path'])):
+            result = finish_audio(
+                job['audio_path'], output_dir, config, job['transcription'],
+                job['timer'], job['normalized_path']
+            )
+        if ledger is not None and result['status'] == 'success':
+            ledger.record(job['audio_path'], result)
+        if eta is not None:
+            eta.complete((durations or {}).get(job['audio_path'], 0.0))
+            print_eta(eta)
+        return result
+    
+    pipeline = BatchPipeline([
+        PipelineStage('decode', decode, workers=io_workers),
+        PipelineStage('transcribe', transcribe),
+        PipelineStage('finish', finish, workers=io_workers),
+    ], queue_size=processing.get('prefetch', 2))
+    
+    print(f"Pipeline: {io_workers} I/O worker(s), prefetch {pipeline.queue_size}")
+    
+    results = []
+    for item, audio_path in zip(pipeline.run(audio_files), audio_files):
+        if item.error is not None:
+            print(f"\n[{item.failed_stage}] {os.path.basename(audio_path)}")
+            # Lỗi sau decode: item.value vẫn là job, giữ timing các stage đã chạy
+            timer = item.value.get('timer') if isinstance(item.value, dict) else None
+            results.append(failed_result(audio_path, item.error, timer))
+        else:
+            results.append(item.value)
+    
+    return results, pipeline.stats()
+
+
+def output_fingerprint(config):
+    """Fingerprint các setting quyết định output (không gồm tùy chọn tốc độ/cache)"""
+    settings = {
+        section: dict(config.get(section) or {})
+        for section in OUTPUT_SETTINGS
+    }
+    for section, keys in PERFORMANCE_SETTINGS.items():
+        for key in keys:
+            settings[section].pop(key, None)
+    settings['create_subfolder'] = config.get('output', {}).get('create_subfolder', True)
+    return config_fingerprint(settings)
+
+
+def skip_processed(audio_files, ledger):
+    """
+    Tách các file đã có trong ledger
+    
+    File cùng nội dung với một input đã xử lý ở path khác (bản copy, đổi tên)
+    không bị bỏ qua mà được trả về riêng để tạo output bằng link như bản trùng.
+    
+    Returns:
+        (file cần xử lý, list kết quả status 'skipped' của file đã xử lý,
+         list (file, entry ledger của input gốc) cho bản copy/đổi tên)
+    """
+    pending, skipped, relocated = [], [], []
+    for audio_path in audio_files:
+        entry = ledger.lookup(audio_path)
+        if entry is None:
+            pending.append(audio_path)
+        elif os.path.abspath(entry['input_file']) != os.path.abspath(audio_path):
+            relocated.append((audio_path, entry))
+        else:
+            skipped.append({
+                'status': 'skipped',
+                'input_file': audio_path,
+                'output_dir': entry['output_dir'],
+                'total_segments': entry['total_segments'],
+                'processed_at': entry['processed_at']
+            })
+    # Lưu hash nội dung vừa tính để lần sau tra O(1)
+    ledger.save()
+    return pending, skipped, relocated
+
+
+def print_eta(eta):
+    """In tiến độ batch và thời gian còn lại"""
+    info = eta.summary()
+    rtf = f", RTF {info['rtf']:.3f}" if info['rtf'] is not None else ''
+    print(f"  ⏱ {info['files_done']} file(s) done, "
+          f"{info['audio_done'] / 60:.1f}/{info['audio_total'] / 60:.1f} min audio{rtf}, "
+          f"ETA {format_eta(eta.remaining_seconds())}")
 
 
 def batch_process(input_dir, output_dir, config):
@@ -125,25 +476,160 @@ def batch_process(input_dir, output_dir, config):
         print(f"No audio files found in {input_dir}")
         return
     
-    print(f"\nFound {len(audio_files)} audio files")
+    audio_files.sort()
+    total_files = len(audio_files)
+    
+    # Bỏ qua input đã xử lý vào output_dir với cùng nội dung và cùng setting
+    ledger = ProcessedLedger(output_dir, output_fingerprint(config))
+    skipped, relocated = [], []
+    if not config.get('output', {}).get('overwrite', False):
+        audio_files, skipped, relocated = skip_processed(audio_files, ledger)
+    
+    # Cùng nội dung (bản copy ở tên/thư mục khác) chỉ xử lý một lần
+    processing = config.get('processing', {})
+    duplicates = {}
+    if processing.get('dedup', True):
+        audio_files, duplicates = find_duplicates(audio_files, full_digest=ledger.content_key)
+        ledger.save()
+    
+    # Thứ tự xử lý theo độ dài (đọc từ header) và ETA theo RTF đo được
+    policy = processing.get('schedule', 'longest')
+    probe_index = ProbeIndex.from_config(config)
+    probe_index.probe_all(audio_files)
+    durations = probe_durations(audio_files, probe=probe_index.get)
+    audio_files = order_files(audio_files, policy, durations)
+    eta = EtaEstimator(durations.values())
+    
+    print(f"\nFound {total_files} audio files")
+    if skipped:
+        print(f"Skipping {len(skipped)} already processed (unchanged input and settings, --force to redo)")
+    if duplicates or relocated:
+        print(f"Skipping {sum(len(d) for d in duplicates.values()) + len(relocated)} "
+              f"duplicates of other inputs (same content)")
+    print(f"Processing {len(audio_files)} files ({eta.total_audio / 3600:.2f}h audio, {policy} first)")
     print(f"Output directory: {output_dir}\n")
     
-    success_count = 0
+    # Clip packing: transcribe các clip ngắn theo cửa sổ ghép
+    packed_transcriptions = {}
+    if config.get('clip_packing', {}).get('enabled', False):
+        packed_transcriptions = transcribe_packed_clips(audio_files, config, probe_index)
     
-    for i, audio_path in enumerate(audio_files, 1):
-        print(f"\n{'#'*60}")
-        print(f"File {i}/{len(audio_files)}")
-        print(f"{'#'*60}")
-        
-        if process_audio(audio_path, output_dir, config):
-            success_count += 1
+    pipeline_stats = None
+    
+    try:
+        # tracemalloc đo toàn process: profile memory chạy tuần tự để số đo đúng từng file
+        if processing.get('pipeline', True) and not processing.get('profile_memory', False):
+            results, pipeline_stats = pipeline_process(
+                audio_files, output_dir, config, packed_transcriptions, eta, durations, ledger
+            )
+        else:
+            results = []
+            transcriber = None
+            
+            for i, audio_path in enumerate(audio_files, 1):
+                print(f"\n{'#'*60}")
+                print(f"File {i}/{len(audio_files)}")
+                print(f"{'#'*60}")
+                
+                transcription = packed_transcriptions.get(audio_path)
+                if transcriber is None and transcription is None:
+                    # Load model một lần cho cả batch
+                    transcriber = Transcriber(config)
+                result = process_audio(audio_path, output_dir, config,
+                                       transcription=transcription,
+                                       transcriber=transcriber)
+                if result['status'] == 'success':
+                    ledger.record(audio_path, result)
+                results.append(result)
+                eta.complete(durations.get(audio_path, 0.0))
+                print_eta(eta)
+    finally:
+        # Ghi các record còn trong lô cuối
+        ledger.save()
+    
+    # Output của bản trùng: hardlink (hoặc tham chiếu) tới output của bản gốc
+    def duplicate_dir(dup):
+        if not config['output']['create_subfolder']:
+            return None
+        return os.path.join(output_dir, os.path.splitext(os.path.basename(dup))[0])
+    
+    by_input = {r['input_file']: r for r in results}
+    duplicate_results = []
+    for source, dups in duplicates.items():
+        for dup in dups:
+            duplicate_results.append(duplicate_result(dup, source, by_input[source], duplicate_dir(dup)))
+    
+    # Bản copy/đổi tên của input đã xử lý ở lần chạy trước: output gốc lấy từ ledger
+    saved_duplicates = {source: list(dups) for source, dups in duplicates.items()}
+    for dup, entry in relocated:
+        source = entry['input_file']
+        result = duplicate_result(dup, source, {**entry, 'status': 'success'}, duplicate_dir(dup))
+        duplicate_results.append(result)
+        # 'same': dùng chung output đã có, không tiết kiệm thêm gì
+        if result.get('link') != 'same':
+            saved_duplicates.setdefault(source, []).append(dup)
+    
+    # Lần chạy sau bản trùng được báo skipped, không link và tính tiết kiệm lại
+    for result in duplicate_results:
+        if result['status'] == 'duplicate':
+            ledger.record_copy(result['input_file'], result)
+    ledger.save()
+    
+    success_count = sum(1 for r in results if r['status'] == 'success')
+    failed_count = len(results) - success_count
+    duplicate_count = sum(1 for r in duplicate_results if r['status'] == 'duplicate')
+    failed_count += len(duplicate_results) - duplicate_count
+    timing_summary = aggregate_timings([r['timing'] for r in results if r['status'] == 'success'])
+    
+    summary = {
+        'total_files': total_files,
+        'successful': success_count,
+        'failed': failed_count,
+        'skipped': len(skipped),
+        'duplicates': duplicate_count,
+        'timing': timing_summary,
+        'results': results + duplicate_results + skipped,
+        'processed_at': datetime.now().isoformat()
+    }
+    
+    summary['schedule'] = {'policy': policy, **eta.summary()}
+    if saved_duplicates:
+        dup_durations = probe_durations([dup for dup, _ in relocated])
+        summary['dedup'] = savings_report(saved_duplicates, {**durations, **dup_durations}, eta.rtf)
+    if pipeline_stats is not None:
+        summary['pipeline'] = pipeline_stats
+    
+    memory_reports = [r['memory'] for r in results if 'memory' in r]
+    if memory_reports:
+        # Stage có peak memory tăng tuyến tính theo độ dài audio trên cả batch
+        summary['memory_scaling_stages'] = find_scaling_stages(memory_reports)
+    
+    # Save batch summary
+    os.makedirs(output_dir, exist_ok=True)
+    summary_path = os.path.join(output_dir, 'batch_summary.json')
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
     
     print(f"\n{'='*60}")
     print(f"BATCH PROCESSING COMPLETE")
-    print(f"  Total files: {len(audio_files)}")
+    print(f"  Total files: {total_files}")
     print(f"  Success: {success_count}")
-    print(f"  Failed: {len(audio_files) - success_count}")
-    print(f"{'='*60}\n")
+    print(f"  Failed: {failed_count}")
+    print(f"  Skipped (already processed): {len(skipped)}")
+    if saved_duplicates:
+        saved = summary['dedup']
+        compute = f", ~{saved['compute_hours_saved']:.2f}h compute" if saved['compute_hours_saved'] else ''
+        print(f"  Duplicates (linked, not reprocessed): {duplicate_count} "
+              f"(saved {saved['audio_hours_saved']:.2f}h audio{compute})")
+    print(f"  Summary: {summary_path}")
+    print(f"{'='*60}")
+    if timing_summary['files']:
+        print(format_timing_table(timing_summary))
+    if pipeline_stats is not None:
+        print(format_pipeline_stats(pipeline_stats))
+    for name, fit in summary.get('memory_scaling_stages', {}).items():
+        print(f"⚠ Memory of '{name}' scales with duration: {fit['slope_mb_per_hour']} MB per audio hour")
+    print()
 
 
 def main():
@@ -161,8 +647,23 @@ Examples:
   # Batch process all files in a directory
   python cli.py --batch ./audio_folder --output ./results
   
+  # Rerun on a growing folder processes only new/changed files; --force redoes all
+  python cli.py --batch ./audio_folder --output ./results --force
+  
+  # Drop intros/ads/jingles repeated across episodes (index in .cache/)
+  python cli.py --batch ./podcast --output ./results --dedup-segments drop
+  
   # Override language setting
   python cli.py --audio input.wav --output ./results --language en
+  
+  # Record peak memory per stage (memory_report.json)
+  python cli.py --audio long.wav --output ./results --profile-memory
+  
+  # Record a Chrome trace timeline of a batch run (open in ui.perfetto.dev)
+  python cli.py --batch ./audio_folder --output ./results --trace trace.json
+  
+  # Prepare tokenizer data once (then run offline)
+  python cli.py --prepare-tokenizers --nltk-data-dir ./nltk_data
         """
     )
     
@@ -178,13 +679,17 @@ Examples:
         type=str,
         help='Path to directory containing audio files (batch processing)'
     )
+    input_group.add_argument(
+        '--prepare-tokenizers',
+        action='store_true',
+        help='Download/verify sentence tokenizer data into nltk_data_dir, then exit'
+    )
     
     # Output
     parser.add_argument(
         '--output',
         type=str,
-        required=True,
-        help='Output directory'
+        help='Output directory (required for --audio/--batch)'
     )
     
     # Config
@@ -217,8 +722,73 @@ Examples:
         help='Override device (cpu or cuda)'
     )
     
+    parser.add_argument(
+        '--cascade-model',
+        type=str,
+        choices=['small', 'medium', 'large', 'large-v2', 'large-v3'],
+        help='Re-transcribe only low-confidence spans with this larger model (--model runs first)'
+    )
+    
+    parser.add_argument(
+        '--nltk-data-dir',
+        type=str,
+        help='Override local NLTK data directory'
+    )
+    
+    parser.add_argument(
+        '--pack-clips',
+        action='store_true',
+        help='Batch mode: transcribe short clips together in packed ~30s windows'
+    )
+    
+    parser.add_argument(
+        '--audio-cache',
+        type=str,
+        metavar='DIR',
+        help='Cache normalized 16kHz mono audio in DIR and reuse it on later runs'
+    )
+    
+    parser.add_argument(
+        '--schedule',
+        type=str,
+        choices=['longest', 'shortest', 'name'],
+        help='Batch order by audio duration (overrides processing.schedule)'
+    )
+    
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Batch: reprocess inputs already processed with the same settings'
+    )
+    parser.add_argument(
+        '--no-dedup',
+        action='store_true',
+        help='Process inputs with identical content separately (default: process once, link outputs)'
+    )
+    parser.add_argument(
+        '--dedup-segments',
+        choices=['drop', 'flag'],
+        help='Drop or flag segments repeated across/within files (intros, ads, jingles)'
+    )
+    
+    parser.add_argument(
+        '--profile-memory',
+        action='store_true',
+        help='Record peak memory and top allocators per stage (slow, writes memory_report.json)'
+    )
+    
+    parser.add_argument(
+        '--trace',
+        type=str,
+        metavar='PATH',
+        help='Write a Chrome trace-event JSON timeline of files/stages/segments to PATH'
+    )
+    
     args = parser.parse_args()
     
+    if not args.prepare_tokenizers and not args.output:
+        parser.error('--output is required for --audio/--batch')
+    
     # Load config
     config = load_config(args.config)
     
@@ -232,15 +802,57 @@ Examples:
     if args.device:
         config['stt']['device'] = args.device
     
+    if args.cascade_model:
+        config['stt']['cascade'] = {
+            **config['stt'].get('cascade', {}), 'enabled': True, 'model': args.cascade_model
+        }
+    
+    if args.pack_clips:
+        config.setdefault('clip_packing', {})['enabled'] = True
+    
+    if args.nltk_data_dir:
+        config['sentence_splitter']['nltk_data_dir'] = args.nltk_data_dir
+    
+    if args.schedule:
+        config.setdefault('processing', {})['schedule'] = args.schedule
+    if args.force:
+        config.setdefault('output', {})['overwrite'] = True
+    if args.no_dedup:
+        config.setdefault('processing', {})['dedup'] = False
+    if args.dedup_segments:
+        config['segment_dedup'] = {
+            **config.get('segment_dedup', {}), 'enabled': True, 'action': args.dedup_segments
+        }
+    if args.profile_memory:
+        config.setdefault('processing', {})['profile_memory'] = True
+    
+    if args.audio_cache:
+        config['audio_cache'] = {**config.get('audio_cache', {}), 'enabled': True, 'dir': args.audio_cache}
+    
     # Process
-    if args.audio:
+    if args.prepare_tokenizers:
+        from core.sentence_splitter import prepare_tokenizers, TokenizerResourceError
+        
+        try:
+            status = prepare_tokenizers(config)
+        except TokenizerResourceError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        
+        for name, state in status.items():
+            print(f"  ✓ {name}: {state}")
+        sys.exit(0)
+    
+    elif args.audio:
         # Single file processing
-        success = process_audio(args.audio, args.output, config)
-        sys.exit(0 if success else 1)
+        with trace_to(args.trace):
+            result = process_audio(args.audio, args.output, config)
+        sys.exit(0 if result['status'] == 'success' else 1)
     
     elif args.batch:
         # Batch processing
-        batch_process(args.batch, args.output, config)
+        with trace_to(args.trace):
+            batch_process(args.batch, args.output, config)
         sys.exit(0)
 
 
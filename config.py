@@ -5,7 +5,7 @@ Chứa các cài đặt mặc định cho toàn bộ hệ thống
 
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import Literal
+from typing import Literal, List, Optional
 
 
 class WhisperConfig(BaseModel):
@@ -25,6 +25,12 @@ class WhisperConfig(BaseModel):
     vad: bool = True  # Voice Activity Detection - phát hiện vùng có giọng nói
     mel_first: bool = True  # Tối ưu hóa alignment
     
+    # Cascade: model_size transcribe trước, chỉ các đoạn confidence thấp được
+    # decode lại bằng cascade_model (None = tắt)
+    cascade_model: Optional[Literal["small", "medium", "large"]] = None
+    cascade_min_avg_logprob: float = -0.7  # Segment có avg_logprob thấp hơn là yếu
+    cascade_min_word_probability: float = 0.5  # Hoặc >25% số từ có probability thấp hơn
+    
     
 class AudioConfig(BaseModel):
     """Cấu hình xử lý audio"""
@@ -33,11 +39,30 @@ class AudioConfig(BaseModel):
     min_silence_len: int = 500  # ms - độ dài tối thiểu của khoảng lặng
     silence_thresh: int = -40  # dB - ngưỡng coi là im lặng
     keep_silence: int = 200  # ms - giữ lại một ít silence ở đầu/cuối
+    read_block_seconds: float = 30.0  # seconds - đọc audio theo block, memory không phụ thuộc độ dài file
+    # auto: cắt bằng ffmpeg multi-output khi input không seek được hoặc format không phải wav
+    cut_backend: Literal["auto", "reader", "ffmpeg"] = "auto"
+    write_queue_size: int = 0  # > 0: ghi WAV qua thread nền, tối đa N segment chờ ghi
+    
+    # Cache audio chuẩn hóa (16kHz mono WAV) - None để tắt
+    cache_dir: Optional[Path] = None
+    cache_max_mb: float = 20480  # MB - vượt quá thì xóa file dùng lâu nhất
     
     # Minimum segment duration
     min_segment_duration: float = 0.5  # seconds - đoạn audio tối thiểu 0.5s
     max_segment_duration: float = 30.0  # seconds - đoạn audio tối đa 30s
     
+    # Duration buckets (giây) - nếu có, chọn điểm cắt bằng quy hoạch động
+    # để độ dài segment khớp các bucket thay vì merge tham lam
+    duration_buckets: Optional[List[float]] = None
+    max_merge_gap: float = 1.0  # seconds - không gộp qua khoảng lặng dài hơn
+    
+    # Segment lặp lại (intro, quảng cáo, jingle) trong file / giữa các file:
+    # drop (không ghi) hoặc flag (vẫn ghi, manifest có repeat_of) - None để tắt
+    segment_dedup: Optional[Literal["drop", "flag"]] = None
+    segment_index: Optional[Path] = None  # Index fingerprint SQLite, None = <temp_dir>/segment_index.sqlite
+    max_segment_repeats: int = 0  # Số lần lặp được giữ thêm ngoài lần xuất hiện đầu
+    
 
 class ProcessConfig(BaseModel):
     """Cấu hình xử lý"""
@@ -53,6 +78,28 @@ class ProcessConfig(BaseModel):
     prefix: str = "segment"  # Tiền tố tên file: segment_0001.wav
     padding: int = 4  # Số chữ số: 0001, 0002...
     
+    # Đo peak memory theo stage, ghi memory_report.json (chậm, chỉ để debug OOM)
+    profile_memory: bool = False
+    
+    # Batch: chồng lấn decode / transcribe / export giữa các file
+    pipeline: bool = True
+    prefetch: int = 2  # Số file chờ tối đa giữa hai stage của pipeline
+    
+    # Thứ tự xử lý batch theo độ dài audio (đọc từ header):
+    # longest (giảm makespan), shortest (có kết quả sớm), name (theo tên file)
+    schedule: Literal["longest", "shortest", "name"] = "longest"
+    
+    # Index thông tin header (duration...) của input, None = <temp_dir>/probe_index.json
+    probe_index: Optional[Path] = None
+    probe_workers: int = 8  # Số thread probe song song
+    
+    # Batch: xử lý lại file đã xử lý (cùng nội dung, cùng setting) - False thì bỏ qua
+    # theo ledger .processed_ledger.json trong output dir
+    overwrite: bool = False
+    
+    # Input trùng nội dung chỉ xử lý một lần, output bản trùng hardlink tới output đã có
+    dedup: bool = True
+    
 
 class PathConfig(BaseModel):
     """Cấu hình đường dẫn"""
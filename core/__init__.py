@@ -7,11 +7,15 @@ from .sentence_splitter import SentenceSplitter
 from .aligner import Aligner
 from .audio_cutter import AudioCutter
 from .exporter import Exporter
+from .clip_packer import ClipPacker
+from .segment_planner import SegmentPlanner
 
 __all__ = [
     'Transcriber',
     'SentenceSplitter',
     'Aligner',
     'AudioCutter',
-    'Exporter'
+    'Exporter',
+    'ClipPacker',
+    'SegmentPlanner'
 ]
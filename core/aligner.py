@@ -38,6 +38,30 @@ class Aligner:
             # Có thể implement aeneas hoặc methods khác
             return self._align_with_whisper_timestamps(sentences, transcription)
     
+    def align_word_spans(self, spans: List[Dict]) -> List[Dict]:
+        """
+        Hoàn thiện các câu đã có timestamps từ SentenceSplitter.split_word_stream
+        
+        Không cần tìm lại câu trong word timeline, chỉ tối ưu boundaries.
+        
+        Returns:
+            List of {text, start, end, confidence}
+        """
+        aligned_sentences = [
+            {
+                'text': span['text'],
+                'start': span['start'],
+                'end': span['end'],
+                'confidence': span.get('confidence')
+            }
+            for span in spans
+        ]
+        
+        if self.optimize_boundaries:
+            aligned_sentences = self._optimize_boundaries(aligned_sentences)
+        
+        return aligned_sentences
+    
     def _align_with_whisper_timestamps(
         self,
         sentences: List[str],
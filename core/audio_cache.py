@@ -0,0 +1,247 @@
+"""
+Normalized Audio Cache
+Chuyển mỗi file input một lần sang WAV PCM 16-bit mono 16kHz và lưu vào cache
+trên đĩa, để các lần chạy sau transcribe, phân tích silence và cắt segment
+đọc thẳng qua memmap thay vì decode + resample lại.
+
+- Key: hash nội dung file (blake2b), đổi tên/di chuyển file vẫn trúng cache.
+  Hash được ghi nhớ theo (path, size, mtime) nên chỉ đọc lại file khi nó đổi.
+- Chuyển đổi stream theo block (AudioReader + Resampler), memory cố định.
+- Giới hạn dung lượng: xóa file dùng lâu nhất (LRU theo mtime) khi vượt max.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from .audio_io import WHISPER_SAMPLE_RATE
+from .audio_reader import AudioReader, DEFAULT_BLOCK_SECONDS
+from .content_hash import file_digest
+from .resampler import Resampler
+from .tracing import span
+from .wav_writer import WavFileWriter
+
+
+# Đổi khi định dạng file cache / thuật toán resample thay đổi
+CACHE_VERSION = 1
+
+_INDEX_FILE = 'keys.json'
+
+
+class AudioCache:
+    """
+    Cache audio đã chuẩn hóa (mono, sample_rate cố định, PCM 16-bit)
+
+    Usage:
+        cache = AudioCache('.cache/audio', max_size_mb=20480)
+        normalized = cache.get('long.mp3')   # convert lần đầu, các lần sau trúng cache
+        audio = read_normalized(normalized)  # float32 cho Whisper
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_size_mb: float = 20480,
+        sample_rate: int = WHISPER_SAMPLE_RATE,
+        block_seconds: float = DEFAULT_BLOCK_SECONDS
+    ):
+        self.cache_dir = str(cache_dir)
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.sample_rate = sample_rate
+        self.block_seconds = block_seconds
+        self.hits = 0
+        self.misses = 0
+        # Batch pipeline gọi get() từ nhiều thread: tuần tự hóa đọc-sửa-ghi keys.json
+        self._index_lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional['AudioCache']:
+        """Tạo cache từ section audio_cache của config.yaml (None nếu tắt)"""
+        cache_config = config.get('audio_cache', {})
+        if not cache_config.get('enabled', False):
+            return None
+
+        return cls(
+            cache_config.get('dir', '.cache/audio'),
+            max_size_mb=cache_config.get('max_size_mb', 20480),
+            block_seconds=config.get('audio_segmentation', {}).get(
+                'read_block_seconds', DEFAULT_BLOCK_SECONDS
+            )
+        )
+
+    def serves(self, sample_rate: Optional[int], channels: int) -> bool:
+        """File cache dùng thay được file gốc cho output (sample_rate, channels) không"""
+        return sample_rate == self.sample_rate and channels == 1
+
+    def content_key(self, audio_path: str) -> str:
+        """Hash nội dung file, ghi nhớ theo (path, size, mtime)"""
+        stat = os.stat(audio_path)
+        stamp = f"{os.path.abspath(audio_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+        index = self._load_index()
+        key = index.get(stamp)
+        if key is None:
+            key = file_digest(audio_path)
+
+            with self._index_lock:
+                index = self._load_index()
+                index[stamp] = key
+                self._save_index(index)
+
+        return key
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(
+            self.cache_dir, f"{key}.{self.sample_rate}.v{CACHE_VERSION}.wav"
+        )
+
+    def get(self, audio_path: str) -> str:
+        """
+        Đường dẫn file đã chuẩn hóa của audio_path, convert nếu chưa có
+
+        Returns:
+            Đường dẫn WAV PCM 16-bit mono trong cache
+        """
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+
+        cached = self.path_for(self.content_key(audio_path))
+
+        if os.path.exists(cached):
+            self.hits += 1
+            # Đánh dấu vừa dùng cho LRU
+            os.utime(cached)
+            return cached
+
+        self.misses += 1
+        with span('normalize_audio', cat='stage', file=os.path.basename(audio_path)):
+            self._normalize(audio_path, cached)
+        self.evict(keep=[cached])
+
+        return cached
+
+    def _normalize(self, audio_path: str, cached: str):
+        """Stream audio_path -> mono -> resample -> WAV, ghi atomic"""
+        tmp_path = _tmp_name(cached)
+
+        try:
+            with AudioReader(audio_path, block_seconds=self.block_seconds) as reader:
+                resampler = Resampler(reader.sample_rate, self.sample_rate)
+
+                with WavFileWriter(tmp_path, self.sample_rate) as writer:
+                    for _, block in reader.blocks():
+                        writer.write(resampler.process(block.mean(axis=1)))
+                    writer.write(resampler.flush())
+
+            os.replace(tmp_path, cached)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def entries(self) -> Iterable[os.DirEntry]:
+        with os.scandir(self.cache_dir) as it:
+            return [e for e in it if e.is_file() and e.name.endswith('.wav')]
+
+    def size_bytes(self) -> int:
+        return sum(e.stat().st_size for e in self.entries())
+
+    def evict(self, keep: Iterable[str] = ()) -> int:
+        """
+        Xóa file dùng lâu nhất tới khi tổng dung lượng <= max
+
+        Returns:
+            Số file đã xóa
+        """
+        keep = {os.path.abspath(p) for p in keep}
+        entries = sorted(self.entries(), key=lambda e: e.stat().st_mtime)
+        total = sum(e.stat().st_size for e in entries)
+
+        removed = 0
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if os.path.abspath(entry.path) in keep:
+                continue
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except FileNotFoundError:
+                # Worker khác đã xóa
+                continue
+            total -= size
+            removed += 1
+
+        if removed:
+            self._prune_index()
+
+        return removed
+
+    def _load_index(self) -> Dict[str, str]:
+        try:
+            with open(os.path.join(self.cache_dir, _INDEX_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_index(self, index: Dict[str, str]):
+        path = os.path.join(self.cache_dir, _INDEX_FILE)
+        tmp_path = _tmp_name(path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, path)
+
+    def _prune_index(self):
+        """Bỏ các hash không còn file cache tương ứng"""
+        with self._index_lock:
+            index = self._load_index()
+            kept = {
+                stamp: key for stamp, key in index.items()
+                if os.path.exists(self.path_for(key))
+            }
+            if len(kept) != len(index):
+                self._save_index(kept)
+
+
+def _tmp_name(path: str) -> str:
+    """File tạm riêng cho mỗi process/thread, đổi tên atomic sau khi ghi xong"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def read_normalized(cached_path: str) -> np.ndarray:
+    """
+    Đọc file cache thành float32 mono (cùng scale với whisper.load_audio)
+
+    Dữ liệu được đọc qua memmap rồi chuyển sang float32 một lần.
+    """
+    with AudioReader(cached_path, backend='memmap') as reader:
+        return reader.read(0, reader.frames)[:, 0]
+
+
+def test_audio_cache():
+    """Test function"""
+    import tempfile
+    import time
+
+    audio_path = "sample.wav"
+    if not os.path.exists(audio_path):
+        print(f"Missing {audio_path}, skipping")
+        return
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = AudioCache(cache_dir)
+        for attempt in ('miss', 'hit'):
+            start = time.perf_counter()
+            cached = cache.get(audio_path)
+            print(f"{attempt}: {time.perf_counter() - start:.3f}s -> {os.path.basename(cached)}")
+
+        audio = read_normalized(cached)
+        print(f"{len(audio) / cache.sample_rate:.2f}s @ {cache.sample_rate}Hz mono")
+
+
+if __name__ == "__main__":
+    test_audio_cache()
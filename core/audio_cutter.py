@@ -4,12 +4,18 @@ Cắt file audio thành các segments theo timestamps
 """
 
 import os
-from typing import List, Dict
-from pydub import AudioSegment
-from pydub.silence import detect_silence
-import soundfile as sf
+from typing import List, Dict, Optional, Tuple
+
 import numpy as np
 
+from .audio_reader import AudioReader, silence_ranges, to_int16
+from .ffmpeg_cutter import cut_segments
+from .resampler import resample
+from .metrics import timed
+from .segment_dedup import SegmentDeduper
+from .tracing import span
+from .wav_writer import WavWriteQueue
+
 
 class AudioCutter:
     """Cắt audio thành các segments"""
@@ -23,20 +29,35 @@ class AudioCutter:
         self.output_sample_rate = config['audio_segmentation'].get('output_sample_rate')
         self.output_format = config['audio_segmentation']['output_format']
         self.output_channels = config['audio_segmentation']['output_channels']
+        self.read_block_seconds = config['audio_segmentation'].get('read_block_seconds', 30.0)
+        self.cut_backend = config['audio_segmentation'].get('cut_backend', 'auto')
+        self.write_queue_size = config['audio_segmentation'].get('write_queue_size', 0)
+        
+        # Kết quả dedup segment của lần cut_audio gần nhất (None nếu tắt)
+        self.dedup_report = None
     
     def cut_audio(
         self,
         audio_path: str,
         aligned_sentences: List[Dict],
-        output_dir: str
+        output_dir: str,
+        timer=None,
+        source: Optional[str] = None
     ) -> List[Dict]:
         """
         Cắt audio thành các segments theo aligned_sentences
         
+        Nếu bật segment_dedup, segment lặp lại quá max_repeats lần (trong file
+        hoặc so với các file trước) bị bỏ trước khi encode/ghi, hoặc được đánh
+        dấu repeat_of (action 'flag').
+        
         Args:
             audio_path: Đường dẫn file audio gốc
             aligned_sentences: List các câu với timestamps
             output_dir: Thư mục output
+            timer: StageTimer (optional) - đo riêng stage decode và cut
+            source: Tên input ghi vào index dedup (mặc định audio_path; truyền
+                file gốc khi audio_path là file cache đã chuẩn hóa)
             
         Returns:
             List các segment info với đường dẫn file
@@ -47,45 +68,75 @@ class AudioCutter:
         # Tạo output directory
         os.makedirs(output_dir, exist_ok=True)
         
-        # Load audio
+        # Mở reader: chỉ đọc header, audio được stream theo block khi cắt
         print(f"Loading audio: {os.path.basename(audio_path)}")
-        audio = AudioSegment.from_file(audio_path)
-        
-        # Get audio info
-        original_sample_rate = audio.frame_rate
-        original_channels = audio.channels
-        
-        print(f"Audio info: {original_sample_rate}Hz, {original_channels} channel(s), "
-              f"{len(audio)/1000:.2f}s")
+        with timed(timer, 'decode'):
+            reader = AudioReader(audio_path, block_seconds=self.read_block_seconds)
         
-        # Process each segment
-        segments_info = []
-        
-        for i, sentence_info in enumerate(aligned_sentences):
-            segment_info = self._cut_segment(
-                audio,
-                sentence_info,
-                i,
-                output_dir,
-                original_sample_rate
-            )
+        # Đóng reader (và process ffmpeg của nó) cả khi lỗi
+        with reader:
+            if timer is not None:
+                timer.audio_duration = reader.duration
             
-            if segment_info:
-                segments_info.append(segment_info)
+            print(f"Audio info: {reader.sample_rate}Hz, {reader.channels} channel(s), "
+                  f"{reader.duration:.2f}s")
+            
+            # Tính biên (đã padding) cho từng câu, bỏ các segment quá ngắn
+            bounds = {}
+            for i, sentence_info in enumerate(aligned_sentences):
+                segment_bounds = self._segment_bounds(sentence_info, i, reader.duration)
+                if segment_bounds:
+                    bounds[i] = segment_bounds
+            
+            source = str(source or audio_path)
+            dedup = SegmentDeduper.from_config(self.config)
+            try:
+                if self._use_ffmpeg(reader):
+                    repeats = {}
+                    if dedup is not None:
+                        # ffmpeg encode thẳng ra file: fingerprint trước, chỉ cắt segment được giữ
+                        with timed(timer, 'dedup'):
+                            repeats = self._screen_repeats(reader, bounds, dedup, source)
+                        bounds = {i: b for i, b in bounds.items() if dedup.keep(repeats.get(i))}
+                    
+                    # Cắt + encode nhiều segment trong mỗi lệnh ffmpeg
+                    with timed(timer, 'cut'):
+                        segments_info = self._cut_with_ffmpeg(
+                            audio_path, reader, aligned_sentences, bounds, output_dir
+                        ) if bounds else []
+                    for info in segments_info:
+                        info.update(repeats.get(info['index'], {}))
+                else:
+                    # Process each segment (đọc tuần tự, memory giới hạn theo block)
+                    with timed(timer, 'cut'):
+                        segments_info = self._cut_with_reader(
+                            reader, aligned_sentences, bounds, output_dir, dedup, source
+                        )
+            finally:
+                if dedup is not None:
+                    dedup.close()
+        
+        self.dedup_report = dedup.report() if dedup is not None else None
         
         print(f"✓ Cut {len(segments_info)} segments to: {output_dir}")
+        if dedup is not None:
+            print(f"  Repeated segments: {dedup.repeats}/{dedup.checked} "
+                  f"({dedup.action}: {dedup.over_limit})")
         
         return segments_info
     
-    def _cut_segment(
+    def _segment_bounds(
         self,
-        audio: AudioSegment,
         sentence_info: Dict,
         index: int,
-        output_dir: str,
-        original_sample_rate: int
-    ) -> Dict:
-        """Cắt một segment từ audio"""
+        audio_duration: float
+    ) -> Optional[Tuple[float, float, float]]:
+        """
+        Tính (start, end, duration) đã padding của một segment
+        
+        Returns:
+            None nếu segment quá ngắn
+        """
         
         # Lấy timestamps
         start = sentence_info['start']
@@ -93,7 +144,7 @@ class AudioCutter:
         
         # Apply padding
         start_with_padding = max(0, start - self.padding_before)
-        end_with_padding = min(len(audio) / 1000, end + self.padding_after)
+        end_with_padding = min(audio_duration, end + self.padding_after)
         
         # Check duration
         duration = end_with_padding - start_with_padding
@@ -106,48 +157,180 @@ class AudioCutter:
             print(f"Warning: Segment {index} too long ({duration:.2f}s), truncating")
             end_with_padding = start_with_padding + self.max_duration
         
-        # Convert to milliseconds for pydub
-        start_ms = int(start_with_padding * 1000)
-        end_ms = int(end_with_padding * 1000)
-        
-        # Extract segment
-        segment = audio[start_ms:end_ms]
+        return start_with_padding, end_with_padding, duration
+    
+    def _use_ffmpeg(self, reader: AudioReader) -> bool:
+        """
+        Chọn backend cắt: 'reader' (numpy + ghi từng file) hoặc 'ffmpeg' (batch)
         
-        # Convert to mono if needed
-        if self.output_channels == 1 and segment.channels > 1:
-            segment = segment.set_channels(1)
+        auto dùng ffmpeg khi input không seek được (phải decode qua pipe, vd. m4a)
+        hoặc format output cần encoder (mp3, flac...) - các trường hợp mà mỗi
+        segment sẽ tốn một process ffmpeg riêng.
+        """
+        if self.cut_backend not in ('auto', 'reader', 'ffmpeg'):
+            raise ValueError(f"Unknown cut backend: {self.cut_backend}")
+        if self.cut_backend != 'auto':
+            return self.cut_backend == 'ffmpeg'
+        return not reader.seekable or self.output_format != 'wav'
+    
+    def _cut_with_reader(
+        self,
+        reader: AudioReader,
+        aligned_sentences: List[Dict],
+        bounds: Dict[int, Tuple[float, float, float]],
+        output_dir: str,
+        dedup: Optional[SegmentDeduper] = None,
+        source: Optional[str] = None
+    ) -> List[Dict]:
+        """Đọc từng segment qua AudioReader và ghi ra file (bỏ segment lặp nếu có dedup)"""
+        indices = list(bounds)
+        segments_info = {}
         
-        # Resample if needed
-        if self.output_sample_rate and segment.frame_rate != self.output_sample_rate:
-            segment = segment.set_frame_rate(self.output_sample_rate)
+        # WAV được ghi in-process (qua thread nền nếu write_queue_size > 0)
+        with WavWriteQueue(self.write_queue_size) as writer:
+            for k, samples in reader.extract([bounds[i][:2] for i in indices]):
+                i = indices[k]
+                repeat = None
+                if dedup is not None:
+                    with span('fingerprint', cat='segment', index=i):
+                        repeat = dedup.check(samples, reader.sample_rate, source, *bounds[i][:2])
+                    if not dedup.keep(repeat):
+                        continue
+                
+                with span('segment', cat='segment', index=i):
+                    segments_info[i] = self._write_segment(
+                        samples,
+                        reader.sample_rate,
+                        aligned_sentences[i],
+                        i,
+                        bounds[i][2],
+                        output_dir,
+                        writer
+                    )
+                if repeat:
+                    segments_info[i].update(repeat)
         
-        # Generate filename
-        naming_pattern = self.config['export']['naming_pattern']
-        filename = naming_pattern.format(index=index+1, name="segment")
-        filename = f"{filename}.{self.output_format}"
+        return [segments_info[i] for i in sorted(segments_info)]
+    
+    @staticmethod
+    def _screen_repeats(
+        reader: AudioReader,
+        bounds: Dict[int, Tuple[float, float, float]],
+        dedup: SegmentDeduper,
+        source: str
+    ) -> Dict[int, Dict]:
+        """Fingerprint tất cả segment (một lần đọc), trả về {index: repeat} của segment lặp"""
+        indices = list(bounds)
+        repeats = {}
+        for k, samples in reader.extract([bounds[i][:2] for i in indices]):
+            i = indices[k]
+            repeat = dedup.check(samples, reader.sample_rate, source, *bounds[i][:2])
+            if repeat:
+                repeats[i] = repeat
+        return repeats
+    
+    def _cut_with_ffmpeg(
+        self,
+        audio_path: str,
+        reader: AudioReader,
+        aligned_sentences: List[Dict],
+        bounds: Dict[int, Tuple[float, float, float]],
+        output_dir: str
+    ) -> List[Dict]:
+        """Cắt tất cả segment bằng vài lệnh ffmpeg multi-output"""
+        jobs = []
+        for i, (start, end, _) in bounds.items():
+            jobs.append((start, end, os.path.join(output_dir, self._segment_filename(i))))
         
-        output_path = os.path.join(output_dir, filename)
+        channels = 1 if self.output_channels == 1 else reader.channels
+        sample_rate = self.output_sample_rate or reader.sample_rate
+        codec_args = ["-b:a", "128k"] if self.output_format == "mp3" else []
         
-        # Export
-        segment.export(
-            output_path,
-            format=self.output_format,
-            bitrate="128k" if self.output_format == "mp3" else None
-        )
+        commands = cut_segments(audio_path, jobs, sample_rate, channels, codec_args)
+        print(f"ffmpeg: {len(jobs)} segments in {commands} command(s)")
         
+        return [
+            self._segment_info(
+                aligned_sentences[i], i, bounds[i][2], jobs[k][2], sample_rate, channels
+            )
+            for k, i in enumerate(bounds)
+        ]
+    
+    def _segment_filename(self, index: int) -> str:
+        naming_pattern = self.config['export']['naming_pattern']
+        filename = naming_pattern.format(index=index+1, name="segment")
+        return f"{filename}.{self.output_format}"
+    
+    def _segment_info(
+        self,
+        sentence_info: Dict,
+        index: int,
+        duration: float,
+        output_path: str,
+        sample_rate: int,
+        channels: int
+    ) -> Dict:
         return {
             'index': index,
-            'filename': filename,
+            'filename': os.path.basename(output_path),
             'path': output_path,
             'text': sentence_info['text'],
-            'start': start,
-            'end': end,
+            'start': sentence_info['start'],
+            'end': sentence_info['end'],
             'duration': duration,
-            'sample_rate': segment.frame_rate,
-            'channels': segment.channels,
+            'sample_rate': sample_rate,
+            'channels': channels,
             'confidence': sentence_info.get('confidence')
         }
     
+    def _write_segment(
+        self,
+        samples: np.ndarray,
+        sample_rate: int,
+        sentence_info: Dict,
+        index: int,
+        duration: float,
+        output_dir: str,
+        writer: WavWriteQueue
+    ) -> Dict:
+        """Chuyển đổi (mono/resample) và ghi một segment ra file"""
+        # Convert to mono if needed
+        if self.output_channels == 1 and samples.shape[1] > 1:
+            samples = samples.mean(axis=1, keepdims=True)
+        
+        # Resample if needed (windowed-sinc, in-process)
+        if self.output_sample_rate and sample_rate != self.output_sample_rate:
+            samples = resample(samples, sample_rate, self.output_sample_rate)
+            sample_rate = self.output_sample_rate
+        
+        samples = to_int16(samples)
+        
+        # Generate filename
+        output_path = os.path.join(output_dir, self._segment_filename(index))
+        
+        # Export: WAV ghi trực tiếp, format nén encode qua pydub/ffmpeg
+        if self.output_format == 'wav':
+            writer.submit(output_path, samples, sample_rate)
+        else:
+            from pydub import AudioSegment
+            
+            segment = AudioSegment(
+                data=samples.tobytes(),
+                sample_width=2,
+                frame_rate=sample_rate,
+                channels=samples.shape[1]
+            )
+            with span('encode_write', cat='segment'):
+                segment.export(
+                    output_path,
+                    format=self.output_format,
+                    bitrate="128k" if self.output_format == "mp3" else None
+                ).close()
+        
+        return self._segment_info(
+            sentence_info, index, duration, output_path, sample_rate, samples.shape[1]
+        )
+    
     def optimize_segment_boundaries(
         self,
         audio_path: str,
@@ -156,50 +339,46 @@ class AudioCutter:
         """
         Tối ưu hóa boundaries bằng cách detect silence
         (Optional enhancement)
-        """
-        audio = AudioSegment.from_file(audio_path)
         
-        optimized = []
+        audio_path có thể là file đã chuẩn hóa từ AudioCache.get() để không
+        phải decode lại file gốc.
+        """
+        silence_thresh = self.config['alignment']['silence_threshold']
         
-        for segment_info in segments_info:
-            start = segment_info['start']
-            end = segment_info['end']
-            
+        with AudioReader(audio_path, block_seconds=self.read_block_seconds) as reader:
             # Tìm silence trước và sau
-            search_window_ms = 500  # 0.5 second
+            search_window = 0.5  # 0.5 second
             
-            # Silence before
-            start_ms = int(start * 1000)
-            search_start = max(0, start_ms - search_window_ms)
-            before_chunk = audio[search_start:start_ms]
-            
-            silence_before = detect_silence(
-                before_chunk,
-                min_silence_len=50,
-                silence_thresh=self.config['alignment']['silence_threshold']
-            )
+            # Hai cửa sổ tìm kiếm cho mỗi segment, đọc trong một lần duyệt file
+            windows = []
+            for segment_info in segments_info:
+                start = segment_info['start']
+                end = segment_info['end']
+                windows.append((max(0.0, start - search_window), start))
+                windows.append((end, min(reader.duration, end + search_window)))
             
+            # Chỉ giữ kết quả silence của từng cửa sổ, không giữ audio
+            silences = {
+                w: silence_ranges(
+                    chunk, reader.sample_rate, min_silence_len=50,
+                    silence_thresh=silence_thresh, hop_ms=5
+                )
+                for w, chunk in reader.extract(windows)
+            }
+        
+        optimized = []
+        
+        for k, segment_info in enumerate(segments_info):
+            # Silence before
+            silence_before = silences[2 * k]
             if silence_before:
                 # Điều chỉnh start về vị trí silence cuối cùng
-                last_silence = silence_before[-1]
-                new_start = (search_start + last_silence[1]) / 1000
-                segment_info['start'] = new_start
+                segment_info['start'] = windows[2 * k][0] + silence_before[-1][1]
             
             # Tương tự cho end
-            end_ms = int(end * 1000)
-            search_end = min(len(audio), end_ms + search_window_ms)
-            after_chunk = audio[end_ms:search_end]
-            
-            silence_after = detect_silence(
-                after_chunk,
-                min_silence_len=50,
-                silence_thresh=self.config['alignment']['silence_threshold']
-            )
-            
+            silence_after = silences[2 * k + 1]
             if silence_after:
-                first_silence = silence_after[0]
-                new_end = (end_ms + first_silence[0]) / 1000
-                segment_info['end'] = new_end
+                segment_info['end'] = windows[2 * k + 1][0] + silence_after[0][0]
             
             optimized.append(segment_info)
         
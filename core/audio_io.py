@@ -0,0 +1,94 @@
+"""
+Audio I/O Helpers
+Decode audio thành mảng NumPy và đọc thông tin file (duration, sample rate)
+"""
+
+import os
+import json
+import subprocess
+from typing import Dict
+
+import numpy as np
+
+
+# Whisper làm việc ở 16kHz mono
+WHISPER_SAMPLE_RATE = 16000
+
+
+def load_audio(audio_path: str, sample_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode audio thành mảng float32 mono (giống whisper.load_audio)
+
+    Args:
+        audio_path: Đường dẫn file audio
+        sample_rate: Sample rate đầu ra
+
+    Returns:
+        np.ndarray float32 trong khoảng [-1, 1]
+    """
+    if not os.path.exists(audio_path):
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", audio_path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le",
+        "-ar", str(sample_rate),
+        "-"
+    ]
+
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='ignore')}") from e
+
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+def probe_audio(audio_path: str) -> Dict:
+    """
+    Đọc thông tin audio từ header, không decode toàn bộ file
+
+    Dùng soundfile cho WAV/FLAC/OGG, fallback sang ffprobe cho các format nén.
+
+    Returns:
+        Dict {duration, sample_rate, channels, format}
+    """
+    if not os.path.exists(audio_path):
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+
+    try:
+        import soundfile as sf
+
+        info = sf.info(audio_path)
+        return {
+            'duration': info.frames / info.samplerate if info.samplerate else 0.0,
+            'sample_rate': info.samplerate,
+            'channels': info.channels,
+            'format': info.format.lower()
+        }
+    except Exception:
+        pass
+
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "stream=sample_rate,channels:format=duration,format_name",
+        "-of", "json",
+        audio_path
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise RuntimeError(f"Failed to probe audio: {audio_path}") from e
+
+    data = json.loads(out or b'{}')
+    stream = (data.get('streams') or [{}])[0]
+    fmt = data.get('format', {})
+
+    return {
+        'duration': float(fmt.get('duration') or 0.0),
+        'sample_rate': int(stream.get('sample_rate') or 0),
+        'channels': int(stream.get('channels') or 0),
+        'format': fmt.get('format_name', 'unknown')
+    }
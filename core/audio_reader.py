@@ -0,0 +1,476 @@
+"""
+Windowed Audio Reader
+Đọc audio theo từng block để cắt segment và phân tích silence với memory
+giới hạn theo kích thước cửa sổ, không phụ thuộc độ dài file.
+
+Backend:
+    - memmap: WAV PCM/float, đọc trực tiếp vùng frame cần qua numpy.memmap
+    - soundfile: các format libsndfile đọc được (FLAC, OGG, AIFF...), dùng seek
+    - ffmpeg: stream PCM float32 qua pipe cho các format còn lại (mp3, m4a...)
+
+Với backend seek được (memmap, soundfile), chi phí mỗi segment tỷ lệ với độ
+dài segment chứ không phải độ dài file.
+"""
+
+import os
+import struct
+import subprocess
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .audio_io import probe_audio
+
+
+# Mỗi lần đọc một block 30 giây: memory ~ block + segment dài nhất
+DEFAULT_BLOCK_SECONDS = 30.0
+
+# Độ phân giải (ms) khi tính năng lượng cho silence detection
+SILENCE_HOP_MS = 10
+
+Span = Tuple[float, float]
+
+# WAVE format tags
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (format, bits) -> dtype đọc từ file
+_WAV_DTYPES = {
+    (_WAVE_FORMAT_PCM, 8): np.uint8,
+    (_WAVE_FORMAT_PCM, 16): np.dtype('<i2'),
+    (_WAVE_FORMAT_PCM, 24): np.uint8,  # 3 byte/sample, ghép lại khi decode
+    (_WAVE_FORMAT_PCM, 32): np.dtype('<i4'),
+    (_WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype('<f4'),
+    (_WAVE_FORMAT_IEEE_FLOAT, 64): np.dtype('<f8'),
+}
+
+
+def parse_wav_header(audio_path: str) -> Optional[Dict]:
+    """
+    Đọc layout của file WAV (RIFF) để memory-map vùng data
+
+    Returns:
+        Dict {format, bits, channels, sample_rate, data_offset, frames}
+        hoặc None nếu không phải WAV PCM/float được hỗ trợ (RF64, ADPCM...)
+    """
+    try:
+        with open(audio_path, 'rb') as f:
+            riff = f.read(12)
+            if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+                return None
+
+            fmt = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                chunk_id, chunk_size = header[:4], struct.unpack('<I', header[4:])[0]
+
+                if chunk_id == b'fmt ':
+                    body = f.read(chunk_size + chunk_size % 2)
+                    tag, channels, sample_rate, _, block_align, bits = struct.unpack('<HHIIHH', body[:16])
+                    if tag == _WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                        # 2 byte đầu của SubFormat GUID là format tag thật
+                        tag = struct.unpack('<H', body[24:26])[0]
+                    fmt = (tag, channels, sample_rate, block_align, bits)
+
+                elif chunk_id == b'data':
+                    if fmt is None:
+                        return None
+                    tag, channels, sample_rate, block_align, bits = fmt
+                    if (tag, bits) not in _WAV_DTYPES or block_align != channels * bits // 8:
+                        return None
+
+                    data_offset = f.tell()
+                    # File bị cắt cụt: chỉ lấy phần data thật sự có trên đĩa
+                    available = os.path.getsize(audio_path) - data_offset
+                    frames = min(chunk_size, available) // block_align
+                    return {
+                        'format': tag,
+                        'bits': bits,
+                        'channels': channels,
+                        'sample_rate': sample_rate,
+                        'data_offset': data_offset,
+                        'frames': frames
+                    }
+
+                else:
+                    f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+
+class AudioReader:
+    """
+    Đọc audio theo block, samples float32 dạng [frames, channels]
+
+    Usage:
+        with AudioReader('long.flac') as reader:
+            for index, samples in reader.extract([(1.0, 3.5), (4.0, 7.2)]):
+                ...
+    """
+
+    def __init__(
+        self,
+        audio_path: str,
+        block_seconds: float = DEFAULT_BLOCK_SECONDS,
+        backend: str = 'auto',
+        random_access: bool = True
+    ):
+        """
+        Args:
+            audio_path: Đường dẫn file audio
+            block_seconds: Độ dài mỗi block đọc (giây)
+            backend: 'auto', 'memmap', 'soundfile' hoặc 'ffmpeg'
+            random_access: Cho phép extract() đọc thẳng vùng frame cần (seek/memmap)
+                thay vì đọc tuần tự cả file
+        """
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+
+        self.audio_path = audio_path
+        self.block_seconds = block_seconds
+        self._process = None
+        self._wav = None
+        seekable = False
+
+        if backend in ('auto', 'memmap'):
+            self._wav = parse_wav_header(audio_path)
+            if self._wav is not None:
+                backend = 'memmap'
+            elif backend == 'memmap':
+                raise ValueError(f"Not a PCM/float WAV file, cannot memory-map: {audio_path}")
+        if backend == 'auto':
+            backend = 'soundfile' if self._soundfile_readable(audio_path) else 'ffmpeg'
+        if backend not in ('memmap', 'soundfile', 'ffmpeg'):
+            raise ValueError(f"Unknown audio reader backend: {backend}")
+        self.backend = backend
+
+        if backend == 'memmap':
+            self.sample_rate = self._wav['sample_rate']
+            self.channels = self._wav['channels']
+            self.frames = self._wav['frames']
+            seekable = True
+        elif backend == 'soundfile':
+            import soundfile as sf
+
+            with sf.SoundFile(audio_path) as f:
+                self.sample_rate = f.samplerate
+                self.channels = f.channels
+                self.frames = f.frames
+                seekable = f.seekable()
+        else:
+            info = probe_audio(audio_path)
+            if not info['sample_rate'] or not info['channels']:
+                raise RuntimeError(f"Cannot read audio stream info: {audio_path}")
+            self.sample_rate = info['sample_rate']
+            self.channels = info['channels']
+            # Duration từ container có thể lệch vài ms với số sample decode được
+            self.frames = int(round(info['duration'] * self.sample_rate))
+
+        self.seekable = seekable and random_access
+
+    @staticmethod
+    def _soundfile_readable(audio_path: str) -> bool:
+        try:
+            import soundfile as sf
+
+            sf.info(audio_path)
+            return True
+        except Exception:
+            return False
+
+    @property
+    def duration(self) -> float:
+        """Độ dài audio (giây)"""
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+    @property
+    def block_frames(self) -> int:
+        return max(1, int(self.block_seconds * self.sample_rate))
+
+    def blocks(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Đọc tuần tự từ đầu file
+
+        Yields:
+            (start_frame, samples) với samples float32 [frames, channels]
+        """
+        if self.backend == 'memmap':
+            with self._frame_source() as read:
+                for position in range(0, self.frames, self.block_frames):
+                    yield position, read(position, self.block_frames)
+        elif self.backend == 'soundfile':
+            yield from self._soundfile_blocks()
+        else:
+            yield from self._ffmpeg_blocks()
+
+    def read(self, start_frame: int, frames: int) -> np.ndarray:
+        """
+        Đọc trực tiếp một vùng frame (chỉ với backend seek được)
+
+        Returns:
+            samples float32 [frames, channels]
+        """
+        if self.backend == 'ffmpeg':
+            raise ValueError(f"Backend '{self.backend}' does not support random access")
+
+        with self._frame_source() as read:
+            return read(start_frame, frames)
+
+    @contextmanager
+    def _frame_source(self) -> Iterator[Callable[[int, int], np.ndarray]]:
+        """Hàm read(start, frames) trên một handle mở sẵn (memmap hoặc SoundFile)"""
+        if self.backend == 'memmap':
+            wav = self._wav
+            dtype = _WAV_DTYPES[(wav['format'], wav['bits'])]
+            shape = (wav['frames'], wav['channels'] * (3 if wav['bits'] == 24 else 1))
+            data = np.memmap(self.audio_path, dtype=dtype, mode='r',
+                             offset=wav['data_offset'], shape=shape) if wav['frames'] else None
+
+            def read(start: int, frames: int) -> np.ndarray:
+                start = min(max(start, 0), wav['frames'])
+                stop = min(start + frames, wav['frames'])
+                if data is None or stop <= start:
+                    return np.zeros((0, wav['channels']), dtype=np.float32)
+                return _pcm_to_float(data[start:stop], wav['bits'], wav['channels'])
+
+            try:
+                yield read
+            finally:
+                # Giải phóng mmap
+                del data
+        else:
+            import soundfile as sf
+
+            with sf.SoundFile(self.audio_path) as f:
+                def read(start: int, frames: int) -> np.ndarray:
+                    f.seek(min(max(start, 0), f.frames))
+                    return f.read(frames, dtype='float32', always_2d=True)
+
+                yield read
+
+    def _soundfile_blocks(self) -> Iterator[Tuple[int, np.ndarray]]:
+        import soundfile as sf
+
+        position = 0
+        with sf.SoundFile(self.audio_path) as f:
+            while True:
+                block = f.read(self.block_frames, dtype='float32', always_2d=True)
+                if not len(block):
+                    break
+                yield position, block
+                position += len(block)
+
+    def _ffmpeg_blocks(self) -> Iterator[Tuple[int, np.ndarray]]:
+        cmd = [
+            "ffmpeg", "-nostdin", "-v", "error",
+            "-i", self.audio_path,
+            "-f", "f32le", "-acodec", "pcm_f32le",
+            "-ac", str(self.channels), "-ar", str(self.sample_rate),
+            "-"
+        ]
+        frame_bytes = 4 * self.channels
+        block_bytes = self.block_frames * frame_bytes
+
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._process = process
+        position = 0
+        try:
+            while True:
+                data = process.stdout.read(block_bytes)
+                usable = len(data) - len(data) % frame_bytes
+                if not usable:
+                    break
+                block = np.frombuffer(data[:usable], dtype=np.float32).reshape(-1, self.channels)
+                yield position, block
+                position += len(block)
+        finally:
+            # close() đã dừng process (reader bị đóng giữa chừng) thì không còn gì để dọn
+            stopped = self._process is not process
+            self._process = None
+            if not stopped:
+                process.stdout.close()
+                if process.poll() is None:
+                    process.kill()
+                stderr = process.stderr.read()
+                process.stderr.close()
+                if process.wait() not in (0, -9) and position == 0:
+                    raise RuntimeError(f"Failed to decode audio: {stderr.decode(errors='ignore')}")
+
+        # Số frame thật sau khi decode hết (container có thể báo sai)
+        self.frames = position
+
+    def extract(self, spans: Sequence[Span]) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Lấy samples cho từng khoảng thời gian trong một lần đọc tuần tự
+
+        Với backend seek được, đọc thẳng vùng frame của từng span. Nếu không,
+        đọc tuần tự và chỉ giữ phần audio từ đầu span hiện tại trở đi, nên memory
+        bị chặn bởi block_seconds + độ dài span dài nhất. Span được xử lý theo
+        thứ tự start.
+
+        Args:
+            spans: List (start, end) theo giây, có thể chồng lấn
+
+        Yields:
+            (index trong spans, samples float32 [frames, channels])
+        """
+        order = sorted(range(len(spans)), key=lambda i: spans[i][0])
+
+        if self.seekable:
+            with self._frame_source() as read:
+                for index in order:
+                    start, end = self._frame_range(spans[index])
+                    yield index, read(start, end - start)
+            return
+
+        blocks = self.blocks()
+
+        buffer = np.zeros((0, self.channels), dtype=np.float32)
+        buffer_start = 0
+
+        try:
+            for index in order:
+                start, end = self._frame_range(spans[index])
+
+                while True:
+                    # Bỏ phần trước start (các span sau đều bắt đầu muộn hơn)
+                    drop = min(max(start - buffer_start, 0), len(buffer))
+                    if drop:
+                        buffer = buffer[drop:]
+                        buffer_start += drop
+                    if buffer_start + len(buffer) >= end:
+                        break
+
+                    block = next(blocks, None)
+                    if block is None:
+                        break
+                    buffer = np.concatenate((buffer, block[1])) if len(buffer) else block[1]
+
+                yield index, buffer[start - buffer_start:end - buffer_start].copy()
+        finally:
+            blocks.close()
+
+    def _frame_range(self, span: Span) -> Tuple[int, int]:
+        start = max(0, int(round(span[0] * self.sample_rate)))
+        end = max(start, int(round(span[1] * self.sample_rate)))
+        return start, end
+
+    def close(self):
+        """Dừng việc đọc đang dở (nếu có): kill ffmpeg, đóng pipe và thu process"""
+        process = self._process
+        if process is None:
+            return
+        self._process = None
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.stderr.close()
+        process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _pcm_to_float(data: np.ndarray, bits: int, channels: int) -> np.ndarray:
+    """Samples thô từ file WAV -> float32 [-1, 1], dạng [frames, channels]"""
+    if bits == 8:
+        return (data.astype(np.float32) - 128.0) / 128.0
+    if bits == 16:
+        return data.astype(np.float32) / 32768.0
+    if bits == 24:
+        raw = data.reshape(len(data), channels, 3).astype(np.int32)
+        values = raw[..., 0] | (raw[..., 1] << 8) | (raw[..., 2] << 16)
+        values = np.where(values >= 1 << 23, values - (1 << 24), values)
+        return values.astype(np.float32) / float(1 << 23)
+    if bits == 32 and data.dtype.kind == 'i':
+        return (data.astype(np.float64) / 2147483648.0).astype(np.float32)
+    return data.astype(np.float32)
+
+
+def to_int16(samples: np.ndarray) -> np.ndarray:
+    """Float32 [-1, 1] -> int16 PCM"""
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+def detect_silence(
+    source: Union[str, AudioReader],
+    min_silence_len: int,
+    silence_thresh: float,
+    hop_ms: int = SILENCE_HOP_MS
+) -> List[Span]:
+    """
+    Phát hiện khoảng lặng theo từng block (thay cho pydub.silence.detect_silence)
+
+    Cùng định nghĩa với pydub: một cửa sổ min_silence_len là im lặng nếu RMS
+    (dBFS) <= silence_thresh; các cửa sổ im lặng liền nhau được gộp. Cửa sổ
+    trượt theo bước hop_ms thay vì 1ms.
+
+    Args:
+        source: Đường dẫn file hoặc AudioReader
+        min_silence_len: Độ dài tối thiểu của khoảng lặng (ms)
+        silence_thresh: Ngưỡng dBFS
+        hop_ms: Bước trượt (ms)
+
+    Returns:
+        List (start, end) theo giây
+    """
+    reader = source if isinstance(source, AudioReader) else AudioReader(source)
+    hop = max(1, int(reader.sample_rate * hop_ms / 1000))
+
+    energies = []
+    rest = np.zeros(0, dtype=np.float32)
+    for _, block in reader.blocks():
+        power = np.concatenate((rest, np.square(block).mean(axis=1)))
+        usable = len(power) - len(power) % hop
+        energies.append(power[:usable].reshape(-1, hop).mean(axis=1))
+        rest = power[usable:]
+
+    energies = np.concatenate(energies) if energies else np.zeros(0)
+    return _silent_ranges(energies, hop / reader.sample_rate, min_silence_len / 1000, silence_thresh)
+
+
+def silence_ranges(
+    samples: np.ndarray,
+    sample_rate: int,
+    min_silence_len: int,
+    silence_thresh: float,
+    hop_ms: int = SILENCE_HOP_MS
+) -> List[Span]:
+    """detect_silence trên một mảng samples đã có trong memory (giây, tính từ đầu mảng)"""
+    hop = max(1, int(sample_rate * hop_ms / 1000))
+    power = np.square(samples).mean(axis=1) if samples.ndim > 1 else np.square(samples)
+    usable = len(power) - len(power) % hop
+    energies = power[:usable].reshape(-1, hop).mean(axis=1)
+    return _silent_ranges(energies, hop / sample_rate, min_silence_len / 1000, silence_thresh)
+
+
+def _silent_ranges(
+    energies: np.ndarray,
+    hop_seconds: float,
+    min_silence_seconds: float,
+    silence_thresh: float
+) -> List[Span]:
+    """Cửa sổ trượt trên năng lượng từng frame -> các khoảng lặng đã gộp"""
+    window = max(1, int(round(min_silence_seconds / hop_seconds)))
+    if len(energies) < window:
+        return []
+
+    cumulative = np.concatenate(([0.0], np.cumsum(energies, dtype=np.float64)))
+    mean_power = (cumulative[window:] - cumulative[:-window]) / window
+    silent = mean_power <= 10 ** (silence_thresh / 10)
+
+    # Biên các run True liên tiếp
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], silent.astype(np.int8), [0]))))
+    starts, ends = edges[::2], edges[1::2] - 1
+
+    return [
+        (round(float(s * hop_seconds), 3), round(float((e + window) * hop_seconds), 3))
+        for s, e in zip(starts, ends)
+    ]
@@ -0,0 +1,235 @@
+"""
+Batch Pipeline Module
+Pipeline asyncio xử lý nhiều file chồng lấn nhau giữa các stage.
+
+Mỗi stage là một nhóm coroutine worker đọc từ hàng đợi vào (asyncio.Queue có
+giới hạn) và đẩy sang hàng đợi của stage sau. Hàm blocking của stage chạy
+trong executor riêng của stage đó, nên khi model đang transcribe file N thì
+file N+1 đã được decode và file N-1 đang được cắt/export. Hàng đợi có giới
+hạn giữ số file đang nằm trong memory ở mức cố định (backpressure).
+
+Stage model dùng một worker duy nhất (một thread giữ model), các stage I/O có
+thể chạy nhiều worker.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .tracing import span
+
+
+# Đánh dấu hết input cho một worker
+_DONE = object()
+
+
+@dataclass
+class PipelineStage:
+    """
+    Một stage của pipeline
+
+    func nhận value của item và trả về value mới cho stage sau. Exception
+    được ghi vào item.error và các stage sau bỏ qua item đó.
+    """
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+
+
+@dataclass
+class PipelineItem:
+    index: int
+    value: Any
+    error: Optional[BaseException] = None
+    failed_stage: Optional[str] = None
+
+
+@dataclass
+class _StageStats:
+    items: int = 0
+    busy: float = 0.0
+    wait: float = 0.0  # chờ item từ stage trước (stage bị "đói")
+
+
+class BatchPipeline:
+    """
+    Chạy các item qua chuỗi stage, chồng lấn giữa các item
+
+    Usage:
+        pipeline = BatchPipeline([
+            PipelineStage('decode', decode, workers=2),
+            PipelineStage('transcribe', transcribe),
+            PipelineStage('export', export, workers=2),
+        ], queue_size=2)
+        items = pipeline.run(audio_files)
+    """
+
+    def __init__(self, stages: List[PipelineStage], queue_size: int = 2):
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self._stats: Dict[str, _StageStats] = {}
+        self._wall = 0.0
+
+    def run(self, values: Iterable[Any]) -> List[PipelineItem]:
+        """
+        Chạy pipeline tới khi mọi item đi qua hết các stage
+
+        Returns:
+            List PipelineItem theo đúng thứ tự input
+        """
+        return asyncio.run(self._run(list(values)))
+
+    async def _run(self, values: List[Any]) -> List[PipelineItem]:
+        self._stats = {stage.name: _StageStats() for stage in self.stages}
+        executors = [
+            ThreadPoolExecutor(max_workers=stage.workers, thread_name_prefix=stage.name)
+            for stage in self.stages
+        ]
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        results: List[PipelineItem] = []
+
+        start = time.perf_counter()
+        try:
+            tasks = [asyncio.create_task(self._produce(values, queues[0]))]
+            for k, stage in enumerate(self.stages):
+                outbox = queues[k + 1] if k + 1 < len(self.stages) else None
+                tasks.append(asyncio.create_task(
+                    self._run_stage(stage, executors[k], queues[k], outbox, results)
+                ))
+            await asyncio.gather(*tasks)
+        finally:
+            self._wall = time.perf_counter() - start
+            for executor in executors:
+                executor.shutdown(wait=True)
+
+        return sorted(results, key=lambda item: item.index)
+
+    async def _produce(self, values: List[Any], inbox: asyncio.Queue):
+        for index, value in enumerate(values):
+            await inbox.put(PipelineItem(index, value))
+        for _ in range(self.stages[0].workers):
+            await inbox.put(_DONE)
+
+    async def _run_stage(
+        self,
+        stage: PipelineStage,
+        executor: ThreadPoolExecutor,
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        results: List[PipelineItem]
+    ):
+        await asyncio.gather(*(
+            self._stage_worker(stage, executor, inbox, outbox, results)
+            for _ in range(stage.workers)
+        ))
+        # Mọi worker của stage đã xong: báo hết input cho stage sau
+        if outbox is not None:
+            next_stage = self.stages[self.stages.index(stage) + 1]
+            for _ in range(next_stage.workers):
+                await outbox.put(_DONE)
+
+    async def _stage_worker(
+        self,
+        stage: PipelineStage,
+        executor: ThreadPoolExecutor,
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        results: List[PipelineItem]
+    ):
+        loop = asyncio.get_running_loop()
+        stats = self._stats[stage.name]
+
+        while True:
+            wait_start = time.perf_counter()
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            stats.wait += time.perf_counter() - wait_start
+
+            if item.error is None:
+                started = time.perf_counter()
+                try:
+                    item.value = await loop.run_in_executor(
+                        executor, self._call, stage, item
+                    )
+                except Exception as e:
+                    item.error = e
+                    item.failed_stage = stage.name
+                stats.busy += time.perf_counter() - started
+                stats.items += 1
+
+            if outbox is not None:
+                await outbox.put(item)
+            else:
+                results.append(item)
+
+    @staticmethod
+    def _call(stage: PipelineStage, item: PipelineItem) -> Any:
+        with span(f"pipeline.{stage.name}", cat='pipeline', index=item.index):
+            return stage.func(item.value)
+
+    def stats(self) -> Dict:
+        """
+        Thống kê lần chạy gần nhất
+
+        utilization = thời gian bận / wall của cả pipeline. Stage chậm nhất
+        (thường là model) có utilization gần 1 khi các stage khác được che
+        khuất hoàn toàn.
+        """
+        wall = self._wall
+        return {
+            'wall': round(wall, 4),
+            'stages': {
+                name: {
+                    'items': s.items,
+                    'busy': round(s.busy, 4),
+                    'starved': round(s.wait, 4),
+                    'utilization': round(s.busy / wall, 3) if wall else None
+                }
+                for name, s in self._stats.items()
+            }
+        }
+
+
+def format_pipeline_stats(stats: Dict) -> str:
+    """Bảng utilization theo stage để in ra console/log"""
+    lines = [f"{'pipeline stage':<16}{'items':>7}{'busy (s)':>11}{'util':>8}"]
+    for name, s in stats['stages'].items():
+        utilization = f"{s['utilization']:.0%}" if s['utilization'] is not None else '-'
+        lines.append(f"{name:<16}{s['items']:>7}{s['busy']:>11.2f}{utilization:>8}")
+    lines.append(f"{'wall':<16}{'':>7}{stats['wall']:>11.2f}")
+    return "\n".join(lines)
+
+
+def test_batch_pipeline():
+    """Test function"""
+    def decode(x):
+        time.sleep(0.05)
+        return x
+
+    def transcribe(x):
+        time.sleep(0.1)
+        return x * 2
+
+    def export(x):
+        time.sleep(0.05)
+        return x + 1
+
+    pipeline = BatchPipeline([
+        PipelineStage('decode', decode, workers=2),
+        PipelineStage('transcribe', transcribe),
+        PipelineStage('export', export, workers=2),
+    ])
+    items = pipeline.run(range(10))
+
+    print([item.value for item in items])
+    print(format_pipeline_stats(pipeline.stats()))
+    print("(sequential would take 2.00s)")
+
+
+if __name__ == "__main__":
+    test_batch_pipeline()
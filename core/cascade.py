@@ -0,0 +1,215 @@
+"""
+Model Cascade
+Transcribe bằng model nhỏ trước, chỉ decode lại bằng model lớn những đoạn
+model nhỏ không chắc chắn.
+
+- Segment yếu: avg_logprob (confidence) dưới ngưỡng, hoặc quá nhiều từ có
+  probability thấp.
+- Các segment yếu liền nhau được gộp thành một span; span được nới thêm một
+  ít context nhưng không lấn vào segment tốt bên cạnh, nên text decode lại
+  không trùng với phần đã giữ.
+- Segment của model lớn được dời về timeline của file và thay thế các segment
+  yếu của span. Model lớn không trả về gì thì giữ kết quả của model nhỏ.
+"""
+
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+SAMPLE_RATE = 16000
+
+# Ngưỡng mặc định (Whisper tự fallback ở avg_logprob < -1.0)
+DEFAULT_MIN_AVG_LOGPROB = -0.7
+DEFAULT_MIN_WORD_PROBABILITY = 0.5
+DEFAULT_MAX_WEAK_WORD_RATIO = 0.25
+
+# Context thêm mỗi bên span khi decode lại (giây)
+DEFAULT_CONTEXT = 0.5
+
+
+class ModelCascade:
+    """
+    Chọn segment yếu và ghép kết quả decode lại vào timeline
+
+    Usage:
+        cascade = ModelCascade(redecode=lambda audio: large.transcribe(audio)['segments'])
+        segments = list(cascade.refine(small_segments, audio))
+        print(cascade.stats)
+    """
+
+    def __init__(
+        self,
+        redecode: Optional[Callable[[np.ndarray], List[Dict]]] = None,
+        model: Optional[str] = None,
+        min_avg_logprob: float = DEFAULT_MIN_AVG_LOGPROB,
+        min_word_probability: float = DEFAULT_MIN_WORD_PROBABILITY,
+        max_weak_word_ratio: float = DEFAULT_MAX_WEAK_WORD_RATIO,
+        context: float = DEFAULT_CONTEXT
+    ):
+        """
+        Args:
+            redecode: Hàm transcribe một đoạn audio (float32 16kHz mono) bằng
+                model lớn, trả về segment dict với timestamp tính từ đầu đoạn
+            model: Tên model lớn (ghi vào segment đã decode lại)
+            min_avg_logprob: Segment có confidence (avg_logprob) thấp hơn là yếu
+            min_word_probability: Từ có probability thấp hơn là từ yếu
+            max_weak_word_ratio: Segment có tỷ lệ từ yếu lớn hơn là yếu
+            context: Giây audio thêm mỗi bên span khi decode lại
+        """
+        self.redecode = redecode
+        self.model = model
+        self.min_avg_logprob = min_avg_logprob
+        self.min_word_probability = min_word_probability
+        self.max_weak_word_ratio = max_weak_word_ratio
+        self.context = context
+        self.stats = self._new_stats()
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional['ModelCascade']:
+        """Tạo cascade từ section stt.cascade của config.yaml (None nếu tắt)"""
+        cascade_config = config.get('stt', {}).get('cascade', {})
+        if not cascade_config.get('enabled', False):
+            return None
+        return cls(
+            model=cascade_config.get('model', 'large'),
+            min_avg_logprob=cascade_config.get('min_avg_logprob', DEFAULT_MIN_AVG_LOGPROB),
+            min_word_probability=cascade_config.get('min_word_probability', DEFAULT_MIN_WORD_PROBABILITY),
+            max_weak_word_ratio=cascade_config.get('max_weak_word_ratio', DEFAULT_MAX_WEAK_WORD_RATIO),
+            context=cascade_config.get('context', DEFAULT_CONTEXT)
+        )
+
+    @staticmethod
+    def _new_stats() -> Dict:
+        return {
+            'segments': 0,
+            'weak_segments': 0,
+            'spans': 0,
+            'replaced_segments': 0,
+            'redecoded_seconds': 0.0
+        }
+
+    def is_weak(self, segment: Dict) -> bool:
+        """Segment cần decode lại bằng model lớn"""
+        confidence = segment.get('confidence')
+        if confidence is not None and confidence < self.min_avg_logprob:
+            return True
+
+        probabilities = [
+            word['probability'] for word in segment.get('words') or []
+            if word.get('probability') is not None
+        ]
+        if not probabilities:
+            return False
+        weak_words = sum(1 for p in probabilities if p < self.min_word_probability)
+        return weak_words / len(probabilities) > self.max_weak_word_ratio
+
+    def refine(self, segments: Iterable[Dict], audio: np.ndarray) -> Iterator[Dict]:
+        """
+        Thay các span yếu bằng kết quả của model lớn
+
+        Là generator: segment tốt được yield ngay, span yếu được decode lại khi
+        gặp segment tốt tiếp theo (dùng được với transcribe_stream). self.stats
+        được reset mỗi lần gọi.
+
+        Args:
+            segments: Segment dict của model nhỏ, theo thứ tự thời gian
+            audio: Audio của cả file (float32 16kHz mono)
+
+        Yields:
+            Segment dict; segment decode lại có thêm 'model'
+        """
+        self.stats = self._new_stats()
+        duration = len(audio) / SAMPLE_RATE
+        previous_end = 0.0
+        weak = []
+
+        for segment in segments:
+            self.stats['segments'] += 1
+            if self.is_weak(segment):
+                weak.append(segment)
+                continue
+            if weak:
+                yield from self._redecode_span(weak, audio, previous_end, segment['start'])
+                weak = []
+            yield segment
+            previous_end = segment['end']
+
+        if weak:
+            yield from self._redecode_span(weak, audio, previous_end, duration)
+
+    def _redecode_span(
+        self,
+        weak: List[Dict],
+        audio: np.ndarray,
+        lower: float,
+        upper: float
+    ) -> List[Dict]:
+        """Decode lại các segment yếu liền nhau, giới hạn trong [lower, upper]"""
+        start = max(lower, weak[0]['start'] - self.context, 0.0)
+        end = min(upper, weak[-1]['end'] + self.context, len(audio) / SAMPLE_RATE)
+        self.stats['weak_segments'] += len(weak)
+        if end <= start:
+            return weak
+
+        self.stats['spans'] += 1
+        self.stats['redecoded_seconds'] += float(end - start)
+        replacement = self.redecode(audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)])
+        replacement = [seg for seg in replacement if seg.get('text', '').strip()]
+        if not replacement:
+            return weak
+
+        self.stats['replaced_segments'] += len(weak)
+        return [self._shift(seg, start, end) for seg in replacement]
+
+    def _shift(self, segment: Dict, offset: float, limit: float) -> Dict:
+        """Dời timestamp của segment (tính từ đầu span) về timeline của file"""
+        def clip(t: float) -> float:
+            return min(limit, offset + max(0.0, t))
+
+        shifted = {**segment, 'start': clip(segment['start']), 'end': clip(segment['end'])}
+        if segment.get('words'):
+            shifted['words'] = [
+                {**word, 'start': clip(word['start']), 'end': clip(word['end'])}
+                for word in segment['words']
+            ]
+        if self.model:
+            shifted['model'] = self.model
+        return shifted
+
+    def report(self, audio_seconds: float) -> Dict:
+        """Thống kê lần refine gần nhất, kèm tỷ lệ audio đã decode lại"""
+        return {
+            **self.stats,
+            'model': self.model,
+            'redecoded_seconds': round(self.stats['redecoded_seconds'], 3),
+            'redecoded_ratio': round(self.stats['redecoded_seconds'] / audio_seconds, 4)
+            if audio_seconds > 0 else 0.0
+        }
+
+
+def test_cascade():
+    """Test function"""
+    audio = np.zeros(20 * SAMPLE_RATE, dtype=np.float32)
+    segments = [
+        {'start': 0.0, 'end': 4.0, 'text': 'xin chào', 'confidence': -0.2},
+        {'start': 4.5, 'end': 8.0, 'text': 'sin trao', 'confidence': -1.3},
+        {'start': 8.0, 'end': 11.0, 'text': 'các bẹn', 'confidence': -0.3,
+         'words': [{'word': 'các', 'start': 8.0, 'end': 9.0, 'probability': 0.9},
+                   {'word': 'bẹn', 'start': 9.0, 'end': 11.0, 'probability': 0.2}]},
+        {'start': 12.0, 'end': 16.0, 'text': 'hôm nay', 'confidence': -0.1},
+    ]
+
+    def redecode(chunk):
+        seconds = len(chunk) / SAMPLE_RATE
+        print(f"  redecode {seconds:.2f}s")
+        return [{'start': 0.3, 'end': seconds - 0.3, 'text': 'xin chào các bạn', 'confidence': -0.15}]
+
+    cascade = ModelCascade(redecode, model='large')
+    for segment in cascade.refine(segments, audio):
+        print(f"  [{segment['start']:.2f} - {segment['end']:.2f}] {segment['text']} {segment.get('model', '')}")
+    print(cascade.report(len(audio) / SAMPLE_RATE))
+
+
+if __name__ == "__main__":
+    test_cascade()
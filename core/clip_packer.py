@@ -0,0 +1,259 @@
+"""
+Clip Packing Module
+Ghép nhiều clip ngắn thành một cửa sổ ~30s để chạy ASR một lần,
+sau đó chia word timestamps trở lại cho từng clip gốc
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .audio_io import load_audio, probe_audio, WHISPER_SAMPLE_RATE
+
+
+class ClipPacker:
+    """Ghép các clip ngắn (< vài giây) để giảm số lần gọi model"""
+
+    def __init__(self, config: Dict, transcriber=None):
+        self.config = config
+        self.transcriber = transcriber
+
+        packing_config = config.get('clip_packing', {})
+        self.max_clip_duration = packing_config.get('max_clip_duration', 5.0)
+        self.window_duration = packing_config.get('window_duration', 28.0)
+        self.gap_duration = packing_config.get('gap_duration', 1.0)
+
+        if not config['stt'].get('word_timestamps', True):
+            raise ValueError("Clip packing requires stt.word_timestamps to be enabled")
+
+    def select_clips(
+        self,
+        audio_paths: List[str],
+        probe: Callable[[str], Optional[Dict]] = probe_audio
+    ) -> List[str]:
+        """
+        Lọc các file đủ ngắn để ghép (dựa vào header, không decode)
+
+        Args:
+            audio_paths: Các file audio
+            probe: Hàm đọc info header, vd. ProbeIndex.get (None = không probe được)
+
+        Returns:
+            List đường dẫn các clip ngắn
+        """
+        clips = []
+        for audio_path in audio_paths:
+            try:
+                info = probe(audio_path)
+                if info is None:
+                    raise RuntimeError("header not readable")
+                duration = info['duration']
+            except Exception as e:
+                print(f"Warning: Could not probe {audio_path}: {e}")
+                continue
+
+            if 0 < duration <= self.max_clip_duration:
+                clips.append(audio_path)
+
+        return clips
+
+    def pack(self, clips: List[Tuple[str, np.ndarray]]) -> List[Dict]:
+        """
+        Ghép các clip đã decode thành các cửa sổ
+
+        Args:
+            clips: List (audio_path, samples 16kHz mono)
+
+        Returns:
+            List các window {audio, clips: [{path, offset, duration}]}
+        """
+        gap = np.zeros(int(self.gap_duration * WHISPER_SAMPLE_RATE), dtype=np.float32)
+
+        windows = []
+        parts = []
+        placements = []
+        position = 0
+
+        for audio_path, samples in clips:
+            needed = len(samples) + (len(gap) if parts else 0)
+            if parts and (position + needed) / WHISPER_SAMPLE_RATE > self.window_duration:
+                windows.append({'audio': np.concatenate(parts), 'clips': placements})
+                parts, placements, position = [], [], 0
+
+            if parts:
+                parts.append(gap)
+                position += len(gap)
+
+            placements.append({
+                'path': audio_path,
+                'offset': position / WHISPER_SAMPLE_RATE,
+                'duration': len(samples) / WHISPER_SAMPLE_RATE
+            })
+            parts.append(samples)
+            position += len(samples)
+
+        if parts:
+            windows.append({'audio': np.concatenate(parts), 'clips': placements})
+
+        return windows
+
+    def transcribe_clips(self, audio_paths: List[str]) -> Dict[str, Dict]:
+        """
+        Transcribe nhiều clip ngắn bằng các cửa sổ ghép
+
+        Args:
+            audio_paths: List đường dẫn clip (nên lọc trước bằng select_clips)
+
+        Returns:
+            Dict audio_path -> transcription (cùng format với Transcriber.transcribe)
+        """
+        if self.transcriber is None:
+            raise ValueError("ClipPacker needs a transcriber to transcribe clips")
+
+        clips = []
+        for audio_path in audio_paths:
+            samples = load_audio(audio_path)
+            if len(samples):
+                clips.append((audio_path, samples))
+
+        windows = self.pack(clips)
+        print(f"Packed {len(clips)} clips into {len(windows)} ASR windows")
+
+        results = {}
+        for window_index, window in enumerate(windows):
+            transcription = self.transcriber.transcribe(window['audio'])
+            results.update(self.split_transcription(transcription, window['clips'], window_index))
+
+        return results
+
+    def split_transcription(
+        self,
+        transcription: Dict,
+        placements: List[Dict],
+        window_index: int = 0
+    ) -> Dict[str, Dict]:
+        """
+        Chia transcription của một cửa sổ về từng clip theo offset
+
+        Mỗi từ được gán cho clip có overlap lớn nhất. Từ nằm hoàn toàn trong
+        khoảng lặng chỉ được giữ nếu đủ gần một clip (≤ nửa gap), và timestamps
+        luôn bị kẹp trong biên của clip.
+        """
+        tolerance = self.gap_duration / 2
+        per_clip = [[] for _ in placements]
+        straddling = 0
+
+        for segment in transcription['segments']:
+            # Gom các từ của segment này theo clip
+            groups = {}
+            for word in segment.get('words', []):
+                clip_index, overlap = self._assign_word(word, placements, tolerance)
+                if clip_index is None:
+                    continue
+
+                placement = placements[clip_index]
+                word_duration = word['end'] - word['start']
+                if word_duration > 0 and overlap < word_duration:
+                    straddling += 1
+
+                start = min(max(word['start'] - placement['offset'], 0.0), placement['duration'])
+                end = min(max(word['end'] - placement['offset'], start), placement['duration'])
+
+                groups.setdefault(clip_index, []).append({
+                    'word': word['word'],
+                    'start': start,
+                    'end': end,
+                    'probability': word.get('probability')
+                })
+
+            for clip_index, words in groups.items():
+                per_clip[clip_index].append({
+                    'start': words[0]['start'],
+                    'end': words[-1]['end'],
+                    'text': ''.join(w['word'] for w in words).strip(),
+                    'confidence': segment.get('confidence'),
+                    'words': words
+                })
+
+        if straddling:
+            print(f"Warning: {straddling} words straddled a clip boundary in window {window_index}")
+
+        results = {}
+        for placement, segments in zip(placements, per_clip):
+            results[placement['path']] = {
+                'text': ' '.join(seg['text'] for seg in segments),
+                'segments': segments,
+                'language': transcription['language'],
+                'duration': placement['duration'],
+                'packed_window': window_index
+            }
+
+        return results
+
+    def _assign_word(
+        self,
+        word: Dict,
+        placements: List[Dict],
+        tolerance: float
+    ) -> Tuple[Optional[int], float]:
+        """Tìm clip có overlap lớn nhất với từ (hoặc clip gần nhất trong tolerance)"""
+        best_index, best_overlap = None, 0.0
+        nearest_index, nearest_distance = None, float('inf')
+
+        for i, placement in enumerate(placements):
+            clip_start = placement['offset']
+            clip_end = clip_start + placement['duration']
+
+            overlap = min(word['end'], clip_end) - max(word['start'], clip_start)
+            if overlap > best_overlap:
+                best_index, best_overlap = i, overlap
+
+            distance = max(clip_start - word['end'], word['start'] - clip_end, 0.0)
+            if distance < nearest_distance:
+                nearest_index, nearest_distance = i, distance
+
+        if best_index is not None:
+            return best_index, best_overlap
+
+        if nearest_distance <= tolerance:
+            return nearest_index, 0.0
+
+        return None, 0.0
+
+
+def test_clip_packer():
+    """Test function"""
+    config = {
+        'stt': {'word_timestamps': True},
+        'clip_packing': {
+            'max_clip_duration': 5.0,
+            'window_duration': 28.0,
+            'gap_duration': 1.0
+        }
+    }
+
+    packer = ClipPacker(config)
+
+    # Mock: 3 clip 2 giây
+    clips = [(f"clip_{i}.wav", np.zeros(2 * WHISPER_SAMPLE_RATE, dtype=np.float32)) for i in range(3)]
+    windows = packer.pack(clips)
+    print(f"Windows: {len(windows)}, clips in first: {len(windows[0]['clips'])}")
+
+    transcription = {
+        'language': 'vi',
+        'segments': [{
+            'start': 0.1, 'end': 5.5, 'text': 'Xin chào bạn', 'confidence': -0.2,
+            'words': [
+                {'word': ' Xin', 'start': 0.1, 'end': 0.5, 'probability': 0.9},
+                {'word': ' chào', 'start': 0.5, 'end': 1.9, 'probability': 0.9},
+                {'word': ' bạn', 'start': 3.1, 'end': 3.6, 'probability': 0.8}
+            ]
+        }]
+    }
+
+    for path, result in packer.split_transcription(transcription, windows[0]['clips']).items():
+        print(f"{path}: {result['text']!r}")
+
+
+if __name__ == "__main__":
+    test_clip_packer()
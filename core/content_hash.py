@@ -0,0 +1,63 @@
+"""
+Content Hash
+Hash nội dung file audio (blake2b), dùng làm key cho cache và ledger: đổi
+tên/di chuyển file không đổi key, đổi nội dung thì đổi key.
+"""
+
+import hashlib
+import os
+
+
+_HASH_CHUNK = 4 * 1024 * 1024
+
+# Số byte đọc ở mỗi vị trí (đầu, giữa, cuối) cho partial hash
+PARTIAL_SAMPLE_BYTES = 64 * 1024
+
+
+def file_digest(path: str, digest_size: int = 16) -> str:
+    """Hash blake2b của toàn bộ nội dung file (hex)"""
+    digest = hashlib.blake2b(digest_size=digest_size)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def partial_digest(path: str, sample_bytes: int = PARTIAL_SAMPLE_BYTES) -> str:
+    """
+    Hash nhanh từ kích thước file và ba đoạn đầu/giữa/cuối
+
+    Chỉ đọc tối đa 3 x sample_bytes: hai file khác partial digest chắc chắn
+    khác nội dung, trùng partial digest thì cần so full digest.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+
+    with open(path, 'rb') as f:
+        if size <= 3 * sample_bytes:
+            digest.update(f.read())
+        else:
+            for offset in (0, (size - sample_bytes) // 2, size - sample_bytes):
+                f.seek(offset)
+                digest.update(f.read(sample_bytes))
+
+    return digest.hexdigest()
+
+
+def test_content_hash():
+    """Test function"""
+    import sys
+    import time
+
+    for path in sys.argv[1:] or [__file__]:
+        start = time.perf_counter()
+        key = file_digest(path)
+        full = time.perf_counter() - start
+        start = time.perf_counter()
+        partial = partial_digest(path)
+        print(f"{path}: full {key} ({full:.3f}s), partial {partial} "
+              f"({time.perf_counter() - start:.4f}s)")
+
+
+if __name__ == "__main__":
+    test_content_hash()
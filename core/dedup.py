@@ -0,0 +1,295 @@
+"""
+Input Deduplication
+Phát hiện các input có nội dung giống hệt nhau (cùng bản ghi nằm ở nhiều tên /
+thư mục) để chỉ transcribe một lần.
+
+- Batch: nhóm theo kích thước, rồi partial hash (đầu/giữa/cuối file), chỉ
+  file trùng partial hash mới được hash toàn bộ.
+- Worker: ContentRegistry trong shared output dir, key = partial hash, full
+  hash chỉ được tính khi partial hash trùng.
+- Output của bản trùng được tạo bằng hardlink tới output đã có (không tốn thêm
+  dung lượng); nếu không hardlink được (khác filesystem...) thì ghi file tham
+  chiếu duplicate_of.json.
+"""
+
+import json
+import os
+import shutil
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .content_hash import file_digest, partial_digest
+
+
+REFERENCE_FILE = 'duplicate_of.json'
+
+
+def find_duplicates(
+    paths: Iterable,
+    full_digest: Callable[[str], str] = file_digest
+) -> Tuple[List, Dict[str, List]]:
+    """
+    Tách các file trùng nội dung
+
+    Args:
+        paths: Các file (str hoặc Path, giữ nguyên kiểu), bản đầu tiên trong
+            thứ tự này của mỗi nhóm là bản được xử lý
+        full_digest: Hàm hash toàn bộ file, vd. ProcessedLedger.content_key
+            (đã ghi nhớ theo path/size/mtime)
+
+    Returns:
+        (các file cần xử lý, {str(bản gốc): [các bản trùng]})
+    """
+    paths = list(paths)
+
+    def split(group: List, key: Callable) -> List[List]:
+        buckets = defaultdict(list)
+        for path in group:
+            buckets[key(str(path))].append(path)
+        return list(buckets.values())
+
+    groups = [paths]
+    for key in (os.path.getsize, partial_digest, full_digest):
+        groups = [
+            sub for group in groups if len(group) > 1
+            for sub in split(group, key)
+        ]
+
+    duplicates = {}
+    duplicate_set = set()
+    for group in groups:
+        if len(group) > 1:
+            duplicates[str(group[0])] = group[1:]
+            duplicate_set.update(str(p) for p in group[1:])
+
+    unique = [p for p in paths if str(p) not in duplicate_set]
+    return unique, duplicates
+
+
+def link_output(src_dir: str, dst_dir: str, source_input: str) -> str:
+    """
+    Tạo output của một input trùng từ output đã có
+
+    Hardlink từng file của src_dir sang dst_dir; nếu không được thì chỉ ghi
+    duplicate_of.json trỏ tới src_dir. Cả hai trường hợp đều có
+    duplicate_of.json trong dst_dir.
+
+    Returns:
+        'hardlink', 'reference', hoặc 'same' nếu dst_dir trùng src_dir
+    """
+    src_dir = os.path.abspath(str(src_dir))
+    dst_dir = os.path.abspath(str(dst_dir))
+    if src_dir == dst_dir:
+        return 'same'
+
+    method = 'hardlink'
+    try:
+        for root, _, files in os.walk(src_dir):
+            target_root = os.path.join(dst_dir, os.path.relpath(root, src_dir))
+            os.makedirs(target_root, exist_ok=True)
+            for name in files:
+                if name == REFERENCE_FILE:
+                    continue
+                target = os.path.join(target_root, name)
+                if os.path.lexists(target):
+                    os.remove(target)
+                os.link(os.path.join(root, name), target)
+    except OSError:
+        # Filesystem không hỗ trợ hardlink / khác device: chỉ giữ tham chiếu
+        shutil.rmtree(dst_dir, ignore_errors=True)
+        method = 'reference'
+
+    os.makedirs(dst_dir, exist_ok=True)
+    with open(os.path.join(dst_dir, REFERENCE_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            'duplicate_of': str(source_input),
+            'output_dir': src_dir,
+            'method': method,
+            'linked_at': datetime.now().isoformat()
+        }, f, ensure_ascii=False, indent=2)
+
+    return method
+
+
+def duplicate_result(path, source_input, result: Dict, dst_dir: Optional[str]) -> Dict:
+    """
+    Kết quả của một input trùng, tạo output từ kết quả của bản gốc
+
+    Args:
+        path: Input trùng
+        source_input: Bản gốc đã xử lý
+        result: Dict kết quả của bản gốc (status, output_dir, ...)
+        dst_dir: Output directory của input trùng (None = dùng chung output gốc)
+    """
+    if result.get('status') != 'success':
+        return {
+            'status': 'failed',
+            'input_file': str(path),
+            'duplicate_of': str(source_input),
+            'error': f"Source of duplicate failed: {result.get('error') or result.get('reason')}"
+        }
+
+    src_dir = result['output_dir']
+    method = link_output(src_dir, dst_dir, source_input) if dst_dir else 'same'
+    return {
+        'status': 'duplicate',
+        'input_file': str(path),
+        'duplicate_of': str(source_input),
+        'output_dir': str(dst_dir if method == 'hardlink' else src_dir),
+        'link': method,
+        'total_segments': result.get('total_segments')
+    }
+
+
+def savings_report(
+    duplicates: Dict[str, List],
+    durations: Dict[str, float],
+    rtf: Optional[float]
+) -> Dict:
+    """
+    Lượng audio / thời gian xử lý tiết kiệm được nhờ bỏ qua bản trùng
+
+    Args:
+        duplicates: {bản gốc: [bản trùng]} từ find_duplicates
+        durations: {str(path): duration} (giây)
+        rtf: Real-time factor đo được của batch (None = chưa biết)
+    """
+    files = sum(len(dups) for dups in duplicates.values())
+    audio = sum(
+        durations.get(str(dup), durations.get(source, 0.0))
+        for source, dups in duplicates.items()
+        for dup in dups
+    )
+    return {
+        'duplicate_files': files,
+        'audio_hours_saved': round(audio / 3600, 4),
+        'compute_hours_saved': round(audio * rtf / 3600, 4) if rtf else None
+    }
+
+
+class ContentRegistry:
+    """
+    Registry nội dung đã xử lý trong shared output dir (dùng cho worker)
+
+    Mỗi partial hash là một file JSON nhỏ trong <dir>/.content/, chứa các
+    input đã xử lý có cùng partial hash. register() không đọc cả file; full
+    hash chỉ được tính khi find() gặp entry trùng partial hash - cho cả path
+    và input của entry (nếu input chưa thay đổi từ lúc register), và được ghi
+    lại vào entry.
+
+    Usage:
+        registry = ContentRegistry('/shared/output')
+        entry = registry.find('/shared/input/copy.wav')
+        if entry is None:
+            ... xử lý ...
+            registry.register('/shared/input/copy.wav', output_dir)
+    """
+
+    def __init__(self, directory: str):
+        self.directory = os.path.join(str(directory), '.content')
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load(self, key: str) -> List[Dict]:
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def find(self, path: str) -> Optional[Dict]:
+        """
+        Entry {input_file, output_dir, digest} đã xử lý có cùng nội dung với path
+
+        Entry có output_dir đã bị xóa được bỏ qua, entry chưa có full hash mà
+        input đã bị xóa/thay đổi cũng vậy (không còn kiểm tra được nội dung).
+        """
+        key = partial_digest(str(path))
+        entries = [e for e in self._load(key) if os.path.isdir(e['output_dir'])]
+        if not entries:
+            return None
+
+        digest = file_digest(str(path))
+        match = None
+        hashed = []
+        for entry in entries:
+            if 'digest' not in entry:
+                entry_digest = self._entry_digest(entry)
+                if entry_digest is None:
+                    continue
+                entry['digest'] = entry_digest
+                hashed.append(entry)
+            if entry['digest'] == digest:
+                match = entry
+                break
+
+        if hashed:
+            self._update(key, hashed)
+        return match
+
+    @staticmethod
+    def _entry_digest(entry: Dict) -> Optional[str]:
+        """Full hash input của entry, None nếu input đã bị xóa/thay đổi từ lúc register"""
+        try:
+            stat = os.stat(entry['input_file'])
+        except OSError:
+            return None
+        if stat.st_size != entry.get('size') or stat.st_mtime_ns != entry.get('mtime_ns'):
+            return None
+        return file_digest(entry['input_file'])
+
+    def register(self, path: str, output_dir: str):
+        """Ghi nhận nội dung của path đã được xử lý vào output_dir"""
+        stat = os.stat(str(path))
+        self._update(partial_digest(str(path)), [{
+            'input_file': os.path.abspath(str(path)),
+            'output_dir': os.path.abspath(str(output_dir)),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns
+        }])
+
+    def _update(self, key: str, updates: List[Dict]):
+        """Thêm/thay entry (theo input_file) trong file của partial hash key"""
+        with self._lock:
+            inputs = {e['input_file'] for e in updates}
+            entries = [e for e in self._load(key) if e['input_file'] not in inputs]
+            entries.extend(updates)
+            tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+
+
+def test_dedup():
+    """Test function"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        content = os.urandom(512 * 1024)
+        paths = []
+        for name in ('a.wav', 'sub_b.wav', 'c.wav'):
+            path = os.path.join(tmp, name)
+            with open(path, 'wb') as f:
+                f.write(content if name != 'c.wav' else content[:-1] + b'x')
+            paths.append(path)
+
+        unique, duplicates = find_duplicates(paths)
+        print(f"unique: {[os.path.basename(p) for p in unique]}")
+        print(f"duplicates: { {os.path.basename(k): [os.path.basename(p) for p in v] for k, v in duplicates.items()} }")
+
+        src_dir = os.path.join(tmp, 'out', 'a')
+        os.makedirs(src_dir)
+        with open(os.path.join(src_dir, 'segment_0000.txt'), 'w') as f:
+            f.write('xin chào')
+        result = {'status': 'success', 'output_dir': src_dir, 'total_segments': 1}
+        print(duplicate_result(paths[1], paths[0], result, os.path.join(tmp, 'out', 'sub_b')))
+        print(savings_report(duplicates, {p: 3600.0 for p in paths}, rtf=0.25))
+
+
+if __name__ == "__main__":
+    test_dedup()
@@ -25,7 +25,8 @@ class Exporter:
         segments_info: List[Dict],
         output_dir: str,
         audio_filename: str,
-        transcription: Dict
+        transcription: Dict,
+        extra_metadata: Dict = None
     ):
         """
         Xuất tất cả các định dạng output
@@ -35,6 +36,7 @@ class Exporter:
             output_dir: Thư mục output
             audio_filename: Tên file audio gốc
             transcription: Kết quả transcription đầy đủ
+            extra_metadata: Thông tin thêm vào manifest['metadata'] (optional)
         """
         print("\nExporting results...")
         
@@ -51,7 +53,8 @@ class Exporter:
                 segments_info,
                 output_dir,
                 audio_filename,
-                transcription
+                transcription,
+                extra_metadata
             )
         
         # Export metadata.csv
@@ -84,7 +87,8 @@ class Exporter:
         segments_info: List[Dict],
         output_dir: str,
         audio_filename: str,
-        transcription: Dict
+        transcription: Dict,
+        extra_metadata: Dict = None
     ):
         """Xuất manifest.json với metadata đầy đủ"""
         
@@ -100,6 +104,9 @@ class Exporter:
             'segments': []
         }
         
+        if extra_metadata:
+            manifest['metadata'].update(extra_metadata)
+        
         for segment in segments_info:
             segment_data = {
                 'index': segment['index'],
@@ -117,6 +124,11 @@ class Exporter:
             if self.include_confidence and segment.get('confidence') is not None:
                 segment_data['confidence'] = round(segment['confidence'], 3)
             
+            # Segment lặp lại (segment_dedup action 'flag')
+            if segment.get('repeat_of'):
+                segment_data['repeat_of'] = segment['repeat_of']
+                segment_data['occurrence'] = segment['occurrence']
+            
             manifest['segments'].append(segment_data)
         
         manifest_path = os.path.join(output_dir, 'manifest.json')
@@ -125,6 +137,18 @@ class Exporter:
         
         print(f"✓ Exported manifest.json")
     
+    def update_manifest_metadata(self, output_dir: str, metadata: Dict):
+        """Cập nhật manifest.json đã xuất với thông tin có được sau khi export (ví dụ timing)"""
+        manifest_path = os.path.join(output_dir, 'manifest.json')
+        
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        
+        manifest['metadata'].update(metadata)
+        
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+    
     def _export_csv(self, segments_info: List[Dict], output_dir: str):
         """Xuất metadata.csv"""
         
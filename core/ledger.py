@@ -0,0 +1,226 @@
+"""
+Processed-Input Ledger
+Ghi lại các input đã xử lý xong vào một output directory, để chạy lại batch
+trên thư mục input đang lớn dần chỉ xử lý file mới hoặc đã thay đổi.
+
+- Key = hash nội dung file + fingerprint của các setting ảnh hưởng tới output.
+  Đổi tên/di chuyển file không làm xử lý lại; đổi model, cách tách câu, format
+  output... thì xử lý lại.
+- Bản copy/đổi tên đã được link tới output của input gốc được ghi vào entry
+  (record_copy), lần chạy sau tra path đó như file đã xử lý.
+- Hash nội dung được ghi nhớ theo (path, size, mtime): file không đổi chỉ tốn
+  một os.stat và một lần tra dict, không đọc lại file.
+- Entry bị bỏ qua nếu output directory của nó đã bị xóa.
+- Ledger được ghi ra đĩa theo lô (mỗi SAVE_EVERY file hoặc SAVE_INTERVAL giây),
+  không phải sau mỗi file: ghi cả ledger mỗi lần là O(n²) với batch lớn. Run
+  bị kill giữa chừng chỉ xử lý lại tối đa một lô.
+- Khi load, hash nội dung của file đã bị xóa/thay đổi bị loại khỏi ledger.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from .content_hash import file_digest
+
+
+LEDGER_FILE = '.processed_ledger.json'
+
+# Đổi khi format ledger thay đổi (ledger cũ bị bỏ qua)
+LEDGER_VERSION = 1
+
+# Ghi ledger ra đĩa sau mỗi SAVE_EVERY record hoặc SAVE_INTERVAL giây
+SAVE_EVERY = 50
+SAVE_INTERVAL = 5.0
+
+
+def config_fingerprint(settings: Dict) -> str:
+    """
+    Fingerprint ngắn của các setting ảnh hưởng tới output
+
+    Args:
+        settings: Dict (lồng nhau) chỉ gồm các setting quyết định kết quả -
+            không đưa vào các tùy chọn chỉ ảnh hưởng tốc độ (worker, cache...)
+    """
+    payload = json.dumps(settings, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class ProcessedLedger:
+    """
+    Ledger các input đã xử lý thành công, lưu trong output directory
+
+    Thread-safe (batch pipeline ghi từ nhiều thread). record() ghi ledger ra
+    đĩa (atomic) theo lô; gọi save() khi kết thúc batch (kể cả khi lỗi).
+
+    Usage:
+        ledger = ProcessedLedger('./results', fingerprint)
+        if ledger.lookup('a.wav') is None:
+            result = process('a.wav')
+            ledger.record('a.wav', result)
+        ledger.save()
+    """
+
+    def __init__(self, output_dir: str, fingerprint: str):
+        self.path = os.path.join(str(output_dir), LEDGER_FILE)
+        self.fingerprint = fingerprint
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._stamps: Dict[str, str] = {}
+        self._pending = 0
+        self._saved_at = time.monotonic()
+        self._load()
+
+    @staticmethod
+    def _stamp(path: str) -> str:
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+    def content_key(self, path: str) -> str:
+        """Hash nội dung file, ghi nhớ theo (path, size, mtime)"""
+        stamp = self._stamp(path)
+        key = self._stamps.get(stamp)
+        if key is None:
+            key = file_digest(path)
+            with self._lock:
+                self._stamps[stamp] = key
+        return key
+
+    def _key(self, path: str) -> str:
+        return f"{self.content_key(path)}:{self.fingerprint}"
+
+    def lookup(self, path: str) -> Optional[Dict]:
+        """
+        Entry của path nếu đã xử lý với cùng nội dung và cùng setting
+
+        Returns:
+            Dict {input_file, output_dir, total_segments, processed_at}, hoặc
+            None nếu cần xử lý (mới, đã đổi, đổi setting, output đã bị xóa).
+            input_file khác path: cùng nội dung với input đã xử lý ở path khác,
+            output của path chưa được tạo (hoặc đã bị xóa).
+        """
+        entry = self._entries.get(self._key(path))
+        if entry is None:
+            return None
+        if entry.get('output_dir') and not os.path.isdir(entry['output_dir']):
+            return None
+
+        copy = entry.get('copies', {}).get(os.path.abspath(path))
+        if copy is not None and os.path.isdir(copy['output_dir']):
+            return {
+                **{k: v for k, v in entry.items() if k != 'copies'},
+                'input_file': str(path),
+                'output_dir': copy['output_dir'],
+                'processed_at': copy['linked_at']
+            }
+        return entry
+
+    def record(self, path: str, result: Dict):
+        """Ghi nhận path đã xử lý thành công (result: dict kết quả của file)"""
+        entry = {
+            'input_file': str(path),
+            'output_dir': str(result.get('output_dir', '')),
+            'total_segments': result.get('total_segments'),
+            'processed_at': datetime.now().isoformat()
+        }
+        key = self._key(path)
+        with self._lock:
+            self._entries[key] = entry
+            self._save_batched()
+
+    def record_copy(self, path: str, result: Dict):
+        """
+        Ghi nhận path (bản copy/đổi tên của một input đã có trong ledger) đã có
+        output, vd. result của dedup.duplicate_result
+        """
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.setdefault('copies', {})[os.path.abspath(path)] = {
+                'output_dir': str(result.get('output_dir', '')),
+                'linked_at': datetime.now().isoformat()
+            }
+            self._save_batched()
+
+    def _save_batched(self):
+        """Ghi ra đĩa theo lô (gọi khi đang giữ lock)"""
+        self._pending += 1
+        if (self._pending >= SAVE_EVERY
+                or time.monotonic() - self._saved_at >= SAVE_INTERVAL):
+            self._save()
+
+    def save(self):
+        """Ghi ledger ra đĩa (lưu cả hash nội dung đã tính cho lần chạy sau)"""
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': LEDGER_VERSION,
+                'entries': self._entries,
+                'stamps': self._stamps
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._pending = 0
+        self._saved_at = time.monotonic()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get('version') != LEDGER_VERSION:
+            return
+        self._entries = data.get('entries', {})
+        self._stamps = {
+            stamp: key for stamp, key in data.get('stamps', {}).items()
+            if self._is_current(stamp)
+        }
+
+    @classmethod
+    def _is_current(cls, stamp: str) -> bool:
+        """Stamp còn khớp với file trên đĩa (chưa bị xóa/thay đổi)"""
+        path = stamp.rsplit('|', 2)[0]
+        try:
+            return cls._stamp(path) == stamp
+        except OSError:
+            return False
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def test_ledger():
+    """Test function"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_path = os.path.join(tmp, 'a.wav')
+        with open(audio_path, 'wb') as f:
+            f.write(os.urandom(1024))
+
+        fingerprint = config_fingerprint({'model': 'base', 'format': 'wav'})
+        ledger = ProcessedLedger(tmp, fingerprint)
+        print(f"before: {ledger.lookup(audio_path)}")
+        ledger.record(audio_path, {'output_dir': tmp, 'total_segments': 3})
+        ledger.save()
+
+        reloaded = ProcessedLedger(tmp, fingerprint)
+        print(f"after: {reloaded.lookup(audio_path)}")
+
+        other = ProcessedLedger(tmp, config_fingerprint({'model': 'small', 'format': 'wav'}))
+        print(f"other settings: {other.lookup(audio_path)}")
+
+
+if __name__ == "__main__":
+    test_ledger()
@@ -0,0 +1,289 @@
+"""
+Memory Profiling Module
+Đo peak memory (tracemalloc + RSS) và top allocators cho từng stage,
+dùng để tìm stage gây OOM trên file dài. Chỉ bật khi cần (--profile-memory)
+vì tracemalloc làm chậm pipeline đáng kể.
+"""
+
+import json
+import os
+import sys
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+MB = 1024 * 1024
+
+# Heuristic cho một file: stage giữ >= 1 MB/phút audio (PCM16 16kHz mono ~1.9 MB/phút)
+# và đủ lớn về tuyệt đối thì coi như memory tăng theo độ dài audio
+SCALING_MB_PER_MINUTE = 1.0
+SCALING_MIN_PEAK_MB = 16.0
+
+# Cho cả batch: hồi quy peak theo duration
+SCALING_MIN_SLOPE_MB_PER_HOUR = 50.0
+SCALING_MIN_CORRELATION = 0.8
+
+# Bỏ qua allocation của chính tracemalloc/import system
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+]
+
+
+def current_rss_mb() -> Optional[float]:
+    """RSS hiện tại của process (Linux /proc), None nếu không đọc được"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / MB
+
+
+def max_rss_mb() -> Optional[float]:
+    """Peak RSS từ lúc process bắt đầu (ru_maxrss), None trên Windows"""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về bytes
+    return max_rss / MB if sys.platform == 'darwin' else max_rss / 1024
+
+
+class MemoryProfiler:
+    """
+    Ghi lại memory theo stage, dùng cùng StageTimer:
+
+        profiler = MemoryProfiler()
+        timer = StageTimer(profiler=profiler)
+        with timer.stage('decode'):
+            ...
+        report = profiler.report(audio_duration=3600)
+
+    Với mỗi stage:
+        - peak_traced_mb: peak của Python heap (tracemalloc, gồm buffer numpy/bytes)
+        - retained_mb: memory còn giữ lại sau stage so với lúc bắt đầu
+        - rss_end_mb / rss_growth_mb: RSS sau stage và mức tăng high-water mark
+          của process trong stage (gồm cả allocation native như model)
+        - top_allocators: các dòng code giữ nhiều memory nhất khi kết thúc
+          lần gọi đầu tiên của stage
+    """
+
+    def __init__(self, top_n: int = 10):
+        """
+        Args:
+            top_n: Số allocator lớn nhất ghi lại cho mỗi stage
+        """
+        self.top_n = top_n
+        self.stages: Dict[str, Dict] = {}
+        self._stack: List[Dict] = []
+        self._started_tracing = False
+
+    def start(self):
+        """Bật tracemalloc (nếu chưa bật)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        """Tắt tracemalloc nếu chính profiler này đã bật"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Đo memory của một stage; gọi nhiều lần cùng tên thì lấy peak lớn nhất
+
+        Stage lồng nhau được hỗ trợ: peak của stage con được tính cho cả stage cha.
+        """
+        self.start()
+
+        # tracemalloc chỉ có một peak chung: lưu peak hiện tại cho các stage
+        # đang mở trước khi reset
+        _, peak = tracemalloc.get_traced_memory()
+        for frame in self._stack:
+            frame['peak'] = max(frame['peak'], peak)
+        tracemalloc.reset_peak()
+
+        # Snapshot (chậm) chỉ ở lần gọi đầu tiên của stage: stage gọi theo từng
+        # segment vẫn được đo peak mà không tốn snapshot mỗi lần
+        first_call = name not in self.stages and all(f['name'] != name for f in self._stack)
+        frame = {
+            'name': name,
+            'peak': 0,
+            'snapshot': (
+                tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS) if first_call else None
+            ),
+            'current': tracemalloc.get_traced_memory()[0],
+            'max_rss': max_rss_mb()
+        }
+        self._stack.append(frame)
+
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            current, peak = tracemalloc.get_traced_memory()
+            frame['peak'] = max(frame['peak'], peak)
+            for parent in self._stack:
+                parent['peak'] = max(parent['peak'], frame['peak'])
+
+            snapshot = None
+            if frame['snapshot'] is not None:
+                snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            self._record(name, frame, current, snapshot)
+
+    def _record(self, name: str, frame: Dict, current: int, snapshot):
+        """Cộng dồn kết quả đo của một lần gọi stage"""
+        max_rss_after = max_rss_mb()
+        peak_mb = frame['peak'] / MB
+
+        top_allocators = None if snapshot is None else [
+            {
+                'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                'size_mb': round(stat.size / MB, 3),
+                'size_diff_mb': round(stat.size_diff / MB, 3),
+                'count': stat.count
+            }
+            for stat in [
+                stat for stat in snapshot.compare_to(frame['snapshot'], 'lineno') if stat.size_diff > 0
+            ][:self.top_n]
+        ]
+
+        record = self.stages.get(name)
+        if record is None:
+            record = self.stages[name] = {
+                'calls': 0, 'peak_traced_mb': 0.0, 'retained_mb': 0.0,
+                'rss_end_mb': None, 'rss_growth_mb': None, 'top_allocators': []
+            }
+
+        record['calls'] += 1
+        record['retained_mb'] += (current - frame['current']) / MB
+        record['rss_end_mb'] = current_rss_mb()
+
+        if frame['max_rss'] is not None and max_rss_after is not None:
+            record['rss_growth_mb'] = (record['rss_growth_mb'] or 0.0) + max_rss_after - frame['max_rss']
+
+        record['peak_traced_mb'] = max(record['peak_traced_mb'], peak_mb)
+        if top_allocators is not None:
+            record['top_allocators'] = top_allocators
+
+    def report(self, audio_duration: Optional[float] = None) -> Dict:
+        """
+        Tổng hợp memory report cho một file
+
+        Args:
+            audio_duration: Độ dài audio (giây), dùng để tính MB/phút audio
+
+        Returns:
+            Dict {audio_duration, peak_rss_mb, stages, scaling_stages}
+        """
+        minutes = audio_duration / 60 if audio_duration else None
+
+        stages = {}
+        for name, record in self.stages.items():
+            stage = {
+                key: round(value, 3) if isinstance(value, float) else value
+                for key, value in record.items()
+            }
+            if minutes:
+                per_minute = record['peak_traced_mb'] / minutes
+                stage['mb_per_audio_minute'] = round(per_minute, 3)
+                stage['scales_with_duration'] = (
+                    per_minute >= SCALING_MB_PER_MINUTE
+                    and record['peak_traced_mb'] >= SCALING_MIN_PEAK_MB
+                )
+            stages[name] = stage
+
+        return {
+            'audio_duration': audio_duration,
+            'peak_rss_mb': round(max_rss_mb(), 1) if max_rss_mb() is not None else None,
+            'stages': stages,
+            'scaling_stages': [name for name, s in stages.items() if s.get('scales_with_duration')]
+        }
+
+    def write_report(self, path: str, audio_duration: Optional[float] = None, **extra) -> Dict:
+        """Ghi report ra JSON (memory_report.json), trả về report"""
+        report = self.report(audio_duration)
+        report.update(extra)
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        return report
+
+
+def find_scaling_stages(
+    reports: List[Dict],
+    min_slope_mb_per_hour: float = SCALING_MIN_SLOPE_MB_PER_HOUR,
+    min_correlation: float = SCALING_MIN_CORRELATION
+) -> Dict[str, Dict]:
+    """
+    Tìm stage có peak memory tăng tuyến tính theo độ dài audio trên cả batch
+
+    Cần ít nhất 3 file với duration khác nhau; ít hơn thì trả về rỗng.
+
+    Args:
+        reports: List kết quả MemoryProfiler.report()
+
+    Returns:
+        Dict {stage: {slope_mb_per_hour, correlation, files}} của các stage bị flag
+    """
+    points: Dict[str, List] = {}
+    for report in reports:
+        if not report or not report.get('audio_duration'):
+            continue
+        for name, stage in report['stages'].items():
+            points.setdefault(name, []).append((report['audio_duration'] / 3600, stage['peak_traced_mb']))
+
+    flagged = {}
+    for name, values in points.items():
+        if len(set(x for x, _ in values)) < 3:
+            continue
+
+        n = len(values)
+        mean_x = sum(x for x, _ in values) / n
+        mean_y = sum(y for _, y in values) / n
+        cov = sum((x - mean_x) * (y - mean_y) for x, y in values)
+        var_x = sum((x - mean_x) ** 2 for x, _ in values)
+        var_y = sum((y - mean_y) ** 2 for _, y in values)
+
+        slope = cov / var_x
+        correlation = cov / (var_x * var_y) ** 0.5 if var_y else 0.0
+
+        if slope >= min_slope_mb_per_hour and correlation >= min_correlation:
+            flagged[name] = {
+                'slope_mb_per_hour': round(slope, 1),
+                'correlation': round(correlation, 3),
+                'files': n
+            }
+
+    return flagged
+
+
+def test_memprofile():
+    """Test function"""
+    from core.metrics import StageTimer
+
+    profiler = MemoryProfiler(top_n=3)
+    timer = StageTimer(profiler=profiler)
+
+    with timer.stage('decode'):
+        audio = bytearray(40 * MB)
+    with timer.stage('cut'):
+        segments = [bytes(audio[i:i + MB]) for i in range(0, len(audio), 4 * MB)]
+    del audio, segments
+
+    profiler.stop()
+    print(json.dumps(profiler.report(audio_duration=600), indent=2))
+
+
+if __name__ == "__main__":
+    test_memprofile()
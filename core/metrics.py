@@ -0,0 +1,184 @@
+"""
+Processing Metrics Module
+Đo thời gian (wall + CPU) cho từng stage của pipeline, real-time factor
+và tổng hợp theo batch
+"""
+
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+from .tracing import span
+
+
+class StageTimer:
+    """
+    Ghi lại wall time và CPU time của từng stage khi xử lý một file
+
+    CPU time là của thread chạy stage (time.thread_time), không phải của cả
+    process: batch pipeline chạy decode/transcribe/finish của các file khác
+    nhau song song trên nhiều thread. Mỗi stage chạy trên một thread; CPU của
+    thread pool native (vd. CTranslate2, BLAS) và subprocess ffmpeg không được
+    tính.
+    """
+
+    def __init__(self, profiler=None):
+        """
+        Args:
+            profiler: MemoryProfiler (optional) đo memory cho cùng các stage
+        """
+        self.stages: Dict[str, Dict] = {}
+        self.profiler = profiler
+        # Có thể được set bởi stage decode nếu transcription không biết duration
+        self.audio_duration: Optional[float] = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Đo một stage; gọi nhiều lần cùng tên thì cộng dồn
+
+        Usage:
+            with timer.stage('transcribe'):
+                ...
+        """
+        # Profiler bọc ngoài để thời gian snapshot không tính vào stage
+        with (self.profiler.stage(name) if self.profiler is not None else nullcontext()), span(name):
+            wall_start = time.perf_counter()
+            cpu_start = time.thread_time()
+            try:
+                yield
+            finally:
+                record = self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+                record['wall'] += time.perf_counter() - wall_start
+                record['cpu'] += time.thread_time() - cpu_start
+                record['calls'] += 1
+
+    def summary(
+        self,
+        audio_duration: Optional[float] = None,
+        num_segments: Optional[int] = None
+    ) -> Dict:
+        """
+        Tổng hợp kết quả đo
+
+        Args:
+            audio_duration: Độ dài audio (giây), mặc định dùng self.audio_duration
+            num_segments: Số segment đã xuất
+
+        Returns:
+            Dict {stages, total_wall, total_cpu, audio_duration,
+                  real_time_factor, segments_per_second}
+        """
+        if audio_duration is None:
+            audio_duration = self.audio_duration
+
+        total_wall = sum(s['wall'] for s in self.stages.values())
+        total_cpu = sum(s['cpu'] for s in self.stages.values())
+
+        return {
+            'stages': {
+                name: {'wall': round(s['wall'], 4), 'cpu': round(s['cpu'], 4), 'calls': s['calls']}
+                for name, s in self.stages.items()
+            },
+            'total_wall': round(total_wall, 4),
+            'total_cpu': round(total_cpu, 4),
+            'audio_duration': round(audio_duration, 3) if audio_duration else None,
+            # RTF < 1: nhanh hơn thời gian thực
+            'real_time_factor': round(total_wall / audio_duration, 4) if audio_duration else None,
+            'num_segments': num_segments,
+            'segments_per_second': (
+                round(num_segments / total_wall, 3) if num_segments and total_wall else None
+            )
+        }
+
+
+def timed(timer: Optional[StageTimer], name: str):
+    """Context manager đo stage, không làm gì nếu timer là None"""
+    return timer.stage(name) if timer is not None else nullcontext()
+
+
+def aggregate_timings(summaries: List[Dict]) -> Dict:
+    """
+    Gộp timing của nhiều file thành thống kê cho cả batch
+
+    Args:
+        summaries: List kết quả StageTimer.summary()
+
+    Returns:
+        Dict cùng format với summary, stages có thêm mean_wall và share
+    """
+    summaries = [s for s in summaries if s]
+
+    stages: Dict[str, Dict] = {}
+    for summary in summaries:
+        for name, s in summary['stages'].items():
+            record = stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0, 'files': 0})
+            record['wall'] += s['wall']
+            record['cpu'] += s['cpu']
+            record['calls'] += s['calls']
+            record['files'] += 1
+
+    total_wall = sum(s['wall'] for s in stages.values())
+    total_cpu = sum(s['cpu'] for s in stages.values())
+    audio_duration = sum(s['audio_duration'] or 0 for s in summaries)
+    num_segments = sum(s['num_segments'] or 0 for s in summaries)
+
+    for record in stages.values():
+        record['mean_wall'] = record['wall'] / record['files']
+        record['share'] = record['wall'] / total_wall if total_wall else 0.0
+
+    return {
+        'files': len(summaries),
+        'stages': {
+            name: {k: round(v, 4) if isinstance(v, float) else v for k, v in record.items()}
+            for name, record in stages.items()
+        },
+        'total_wall': round(total_wall, 4),
+        'total_cpu': round(total_cpu, 4),
+        'audio_duration': round(audio_duration, 3),
+        'real_time_factor': round(total_wall / audio_duration, 4) if audio_duration else None,
+        'num_segments': num_segments,
+        'segments_per_second': round(num_segments / total_wall, 3) if total_wall else None
+    }
+
+
+def format_timing_table(aggregate: Dict) -> str:
+    """Bảng timing theo stage để in ra console/log"""
+    lines = [
+        f"{'stage':<14}{'wall (s)':>11}{'cpu (s)':>11}{'mean (s)':>11}{'share':>8}",
+        '-' * 55
+    ]
+
+    for name, s in sorted(aggregate['stages'].items(), key=lambda item: -item[1]['wall']):
+        lines.append(
+            f"{name:<14}{s['wall']:>11.2f}{s['cpu']:>11.2f}{s['mean_wall']:>11.2f}{s['share']:>8.1%}"
+        )
+
+    lines.append('-' * 55)
+    lines.append(f"{'total':<14}{aggregate['total_wall']:>11.2f}{aggregate['total_cpu']:>11.2f}")
+
+    if aggregate['real_time_factor'] is not None:
+        lines.append(
+            f"audio {aggregate['audio_duration']:.1f}s | RTF {aggregate['real_time_factor']:.3f} | "
+            f"{aggregate['segments_per_second'] or 0:.2f} segments/s"
+        )
+
+    return '\n'.join(lines)
+
+
+def test_metrics():
+    """Test function"""
+    timer = StageTimer()
+
+    with timer.stage('transcribe'):
+        time.sleep(0.02)
+    with timer.stage('cut'):
+        sum(range(100000))
+
+    summary = timer.summary(audio_duration=10.0, num_segments=4)
+    print(summary)
+    print(format_timing_table(aggregate_timings([summary, summary])))
+
+
+if __name__ == "__main__":
+    test_metrics()
@@ -0,0 +1,217 @@
+"""
+Probe Index
+Chỉ mục thông tin audio (duration, sample rate, channels, format) đọc từ
+header, lưu thành file JSON nhỏ.
+
+- Probe chỉ đọc header: soundfile cho WAV/FLAC/OGG/MP3, ffprobe cho các
+  format nén còn lại (probe_audio), không decode file.
+- Các file chưa có / đã thay đổi được probe song song bằng thread pool.
+- Entry được đánh dấu theo (path, size, mtime): tra cứu chỉ tốn một os.stat
+  và một lần tra dict, file đổi nội dung thì tự probe lại.
+- File probe lỗi cũng được ghi lại (không probe lại tới khi file thay đổi).
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from .audio_io import probe_audio
+
+
+# Đổi khi format entry thay đổi (index cũ bị bỏ qua)
+INDEX_VERSION = 1
+
+DEFAULT_PROBE_WORKERS = 8
+
+
+class ProbeIndex:
+    """
+    Thông tin header của các file audio, persist theo (path, size, mtime)
+
+    Usage:
+        index = ProbeIndex('.cache/probe_index.json')
+        index.probe_all(audio_files)      # probe song song các file mới
+        info = index.get('long.mp3')      # {duration, sample_rate, channels, format}
+    """
+
+    def __init__(self, index_path: Optional[str] = None, workers: int = DEFAULT_PROBE_WORKERS):
+        """
+        Args:
+            index_path: File JSON lưu index (None = chỉ giữ trong memory)
+            workers: Số thread probe song song
+        """
+        self.index_path = str(index_path) if index_path else None
+        self.workers = max(1, workers)
+        self.probed = 0
+        self._entries: Dict[str, Dict] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+        if self.index_path:
+            self._entries = self._load()
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'ProbeIndex':
+        """Tạo index từ section probe_index của config.yaml"""
+        index_config = config.get('probe_index', {})
+        return cls(
+            index_config.get('path', '.cache/probe_index.json'),
+            workers=index_config.get('workers', DEFAULT_PROBE_WORKERS)
+        )
+
+    @staticmethod
+    def _stamp(path: str):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _fresh(self, key: str, stamp) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is not None and (entry['size'], entry['mtime_ns']) == tuple(stamp):
+            return entry
+        return None
+
+    def get(self, path: str) -> Optional[Dict]:
+        """
+        Thông tin header đã index của path (không probe)
+
+        Returns:
+            Dict {duration, sample_rate, channels, format}, hoặc None nếu chưa
+            index, file đã thay đổi hoặc probe lỗi
+        """
+        key = os.path.abspath(path)
+        try:
+            entry = self._fresh(key, self._stamp(path))
+        except FileNotFoundError:
+            return None
+        if entry is None or 'error' in entry:
+            return None
+        return entry['info']
+
+    def probe(self, path: str) -> Optional[Dict]:
+        """Như get(), probe ngay nếu chưa có trong index"""
+        self.probe_all([path])
+        return self.get(path)
+
+    def probe_all(self, paths: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Probe song song các file chưa có trong index hoặc đã thay đổi, rồi lưu index
+
+        Returns:
+            Dict {path: info} cho các file probe được (key giữ nguyên như input)
+        """
+        paths = [str(path) for path in paths]
+        stale = {}
+        for path in paths:
+            try:
+                stamp = self._stamp(path)
+            except FileNotFoundError:
+                continue
+            if self._fresh(os.path.abspath(path), stamp) is None:
+                stale[path] = stamp
+
+        if stale:
+            workers = min(self.workers, len(stale))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='probe') as executor:
+                for path, entry in zip(stale, executor.map(_probe_entry, stale, stale.values())):
+                    with self._lock:
+                        self._entries[os.path.abspath(path)] = entry
+                        self._dirty = True
+            self.probed += len(stale)
+            self.save()
+
+        results = {}
+        for path in paths:
+            info = self.get(path)
+            if info is not None:
+                results[path] = info
+        return results
+
+    def save(self):
+        """Ghi index ra đĩa (atomic) nếu có thay đổi"""
+        if not self.index_path or not self._dirty:
+            return
+
+        with self._lock:
+            directory = os.path.dirname(self.index_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'entries': self._entries}, f)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+
+    def prune(self) -> int:
+        """
+        Bỏ entry của các file không còn tồn tại
+
+        Returns:
+            Số entry đã bỏ
+        """
+        with self._lock:
+            missing = [key for key in self._entries if not os.path.exists(key)]
+            for key in missing:
+                del self._entries[key]
+            if missing:
+                self._dirty = True
+        self.save()
+        return len(missing)
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        if data.get('version') != INDEX_VERSION:
+            return {}
+        return data.get('entries', {})
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _probe_entry(path: str, stamp) -> Dict:
+    size, mtime_ns = stamp
+    entry = {'size': size, 'mtime_ns': mtime_ns}
+    try:
+        entry['info'] = probe_audio(path)
+    except Exception as e:
+        entry['error'] = str(e)
+    return entry
+
+
+def test_probe_index():
+    """Test function"""
+    import glob
+    import sys
+    import tempfile
+    import time
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else '.'
+    paths = [
+        p for p in glob.glob(os.path.join(directory, '*'))
+        if p.lower().endswith(('.wav', '.mp3', '.flac', '.m4a', '.ogg'))
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = os.path.join(tmp, 'probe_index.json')
+
+        start = time.perf_counter()
+        ProbeIndex(index_path).probe_all(paths)
+        print(f"cold: {len(paths)} files in {time.perf_counter() - start:.3f}s")
+
+        index = ProbeIndex(index_path)
+        start = time.perf_counter()
+        infos = [index.get(p) for p in paths]
+        elapsed = time.perf_counter() - start
+        print(f"warm: {elapsed / max(1, len(paths)) * 1e6:.1f} µs per lookup")
+
+        for path, info in zip(paths[:5], infos):
+            print(os.path.basename(path), info)
+
+
+if __name__ == "__main__":
+    test_probe_index()
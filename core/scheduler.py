@@ -0,0 +1,217 @@
+"""
+Batch Scheduler
+Sắp xếp thứ tự xử lý file theo độ dài audio và ước lượng thời gian còn lại.
+
+Độ dài được đọc từ header (probe_audio / ProbeIndex), không decode file. Policy:
+- longest: file dài trước - giảm makespan khi nhiều worker chia nhau một
+  hàng đợi (file dài nhất không bị dồn về cuối, giữ một worker chạy một mình)
+- shortest: file ngắn trước - giảm latency trung bình, có kết quả sớm
+- name: theo tên file (hành vi cũ)
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .audio_io import probe_audio
+
+
+SCHEDULE_POLICIES = ('longest', 'shortest', 'name')
+
+# Ước lượng duration khi không đọc được header: ~128 kbps
+_FALLBACK_BYTES_PER_SECOND = 16000
+
+
+def probe_durations(
+    paths: Iterable[str],
+    probe: Callable[[str], Optional[Dict]] = probe_audio
+) -> Dict[str, float]:
+    """
+    Độ dài (giây) của từng file, đọc từ header
+
+    File không probe được được ước lượng theo kích thước, dùng bitrate trung
+    bình của các file probe được (hoặc ~128 kbps nếu không có file nào).
+
+    Args:
+        paths: Các file audio
+        probe: Hàm trả về info {duration, ...} hoặc None, vd. ProbeIndex.get
+            để tra index đã probe sẵn thay vì đọc header lại
+
+    Returns:
+        Dict {path: duration}
+    """
+    durations = {}
+    unknown = []
+    total_bytes = 0
+    total_seconds = 0.0
+
+    for path in paths:
+        path = str(path)
+        try:
+            info = probe(path)
+        except Exception:
+            info = None
+        duration = info['duration'] if info else 0.0
+
+        if duration > 0:
+            durations[path] = duration
+            total_bytes += os.path.getsize(path)
+            total_seconds += duration
+        else:
+            unknown.append(path)
+
+    bytes_per_second = total_bytes / total_seconds if total_seconds else _FALLBACK_BYTES_PER_SECOND
+    for path in unknown:
+        try:
+            durations[path] = os.path.getsize(path) / bytes_per_second
+        except OSError:
+            durations[path] = 0.0
+
+    return durations
+
+
+def order_files(
+    paths: Iterable,
+    policy: str = 'longest',
+    durations: Optional[Dict[str, float]] = None
+) -> List:
+    """
+    Sắp xếp file theo policy
+
+    Args:
+        paths: List đường dẫn (str hoặc Path, giữ nguyên kiểu)
+        policy: 'longest', 'shortest' hoặc 'name'
+        durations: {str(path): duration}, None = probe ngay
+
+    Returns:
+        List paths theo thứ tự xử lý (cùng độ dài thì theo tên)
+    """
+    if policy not in SCHEDULE_POLICIES:
+        raise ValueError(f"Unknown schedule policy: {policy} (expected one of {SCHEDULE_POLICIES})")
+
+    paths = sorted(paths, key=str)
+    if policy == 'name':
+        return paths
+
+    if durations is None:
+        durations = probe_durations(paths)
+
+    # sorted ổn định: cùng độ dài giữ thứ tự tên
+    return sorted(
+        paths,
+        key=lambda p: durations.get(str(p), 0.0),
+        reverse=policy == 'longest'
+    )
+
+
+class EtaEstimator:
+    """
+    Ước lượng thời gian còn lại từ real-time factor đo được
+
+    RTF = wall từ lúc bắt đầu / tổng audio đã xong. Đo theo throughput của cả
+    batch nên đúng cả khi các file chạy chồng lấn (batch pipeline). Nếu
+    complete() nhận wall của từng file thì RTF = tổng wall các file / audio
+    (worker có thời gian chờ file mới không tính vào). Thread-safe.
+
+    Usage:
+        eta = EtaEstimator(durations.values())
+        ...
+        eta.complete(duration)
+        print(format_eta(eta.remaining_seconds()))
+    """
+
+    def __init__(self, durations: Iterable[float] = (), rtf: Optional[float] = None):
+        """
+        Args:
+            durations: Độ dài các file trong batch
+            rtf: RTF ban đầu (vd. từ lần chạy trước) dùng khi chưa có file nào xong
+        """
+        self.total_audio = float(sum(durations))
+        self.done_audio = 0.0
+        self.done_files = 0
+        self.done_wall = 0.0
+        self.initial_rtf = rtf
+        self.started_at = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, duration: float):
+        """Thêm file mới vào hàng đợi"""
+        with self._lock:
+            self.total_audio += duration
+
+    def complete(self, duration: float, wall: Optional[float] = None):
+        """Đánh dấu một file (độ dài duration giây, xử lý mất wall giây) đã xong"""
+        with self._lock:
+            self.done_audio += duration
+            self.done_files += 1
+            if wall is not None:
+                self.done_wall += wall
+
+    @property
+    def rtf(self) -> Optional[float]:
+        if self.done_audio > 0:
+            wall = self.done_wall or time.perf_counter() - self.started_at
+            return wall / self.done_audio
+        return self.initial_rtf
+
+    def remaining_seconds(self, remaining_audio: Optional[float] = None) -> Optional[float]:
+        """
+        Số giây wall còn lại (None khi chưa có RTF)
+
+        Args:
+            remaining_audio: Audio còn lại (giây), mặc định total - done
+        """
+        rtf = self.rtf
+        if rtf is None:
+            return None
+        if remaining_audio is None:
+            remaining_audio = max(0.0, self.total_audio - self.done_audio)
+        return remaining_audio * rtf
+
+    def summary(self) -> Dict:
+        remaining = self.remaining_seconds()
+        rtf = self.rtf
+        return {
+            'files_done': self.done_files,
+            'audio_done': round(self.done_audio, 3),
+            'audio_total': round(self.total_audio, 3),
+            'rtf': round(rtf, 4) if rtf is not None else None,
+            'eta_seconds': round(remaining, 1) if remaining is not None else None
+        }
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    """Định dạng ETA: 1h02m, 3m05s, 42s"""
+    if seconds is None:
+        return '?'
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def test_scheduler():
+    """Test function"""
+    import glob
+    import sys
+
+    paths = glob.glob(os.path.join(sys.argv[1] if len(sys.argv) > 1 else '.', '*.*'))
+    start = time.perf_counter()
+    durations = probe_durations(paths)
+    print(f"Probed {len(durations)} files in {time.perf_counter() - start:.3f}s")
+
+    for policy in SCHEDULE_POLICIES:
+        ordered = order_files(paths, policy, durations)
+        print(policy, [f"{os.path.basename(p)}:{durations[p]:.0f}s" for p in ordered[:5]])
+
+    eta = EtaEstimator([60.0, 120.0, 600.0])
+    time.sleep(0.1)
+    eta.complete(60.0)
+    print(eta.summary(), format_eta(eta.remaining_seconds()))
+
+
+if __name__ == "__main__":
+    test_scheduler()
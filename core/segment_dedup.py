@@ -0,0 +1,431 @@
+"""
+Segment Dedup
+Phát hiện segment lặp lại (intro, quảng cáo, jingle...) trong cùng một file và
+giữa các file, trước khi segment được encode + ghi ra đĩa.
+
+- Fingerprint: mỗi frame 256ms (hop 16ms, audio 8kHz mono) cho một số 32 bit,
+  bit = dấu của hiệu năng lượng giữa hai band liền kề, lấy sai phân theo thời
+  gian (33 band log từ 300Hz tới 3kHz). Framing, FFT và tính band đều vector
+  hóa bằng NumPy; ~250 byte cho mỗi giây audio.
+- Index: SQLite (B-tree trên anchor key) - mỗi cụm segment giống nhau chỉ lưu
+  một fingerprint và vài anchor (các sub-fingerprint có hash nhỏ nhất, kiểu
+  min-hash). Tra cứu = một truy vấn theo index + so bit error rate với vài
+  ứng viên, nên vẫn nhanh khi index có hàng triệu segment.
+- Lần xuất hiện được ghi theo (input, khoảng thời gian): chạy lại cùng file
+  không biến segment của chính nó thành bản lặp.
+"""
+
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .resampler import resample
+
+
+FINGERPRINT_RATE = 8000
+FRAME_SIZE = 2048
+HOP_SIZE = 128
+NUM_BANDS = 33
+BAND_RANGE = (300.0, 3000.0)
+
+# Sub-fingerprint của frame im lặng / bão hòa - không dùng làm anchor
+_DEGENERATE = (0, 0xFFFFFFFF)
+
+# Segment có ít frame hơn thì không fingerprint (luôn giữ)
+MIN_FRAMES = 8
+
+DEFAULT_ANCHORS = 32
+DEFAULT_MAX_BER = 0.35
+DEFAULT_MIN_OVERLAP = 0.8
+
+# Số ứng viên tối đa được so bit error rate mỗi lần tra
+MAX_CANDIDATES = 16
+
+REPEAT_ACTIONS = ('drop', 'flag')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    duration REAL NOT NULL,
+    fingerprint BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS anchors (
+    key INTEGER NOT NULL,
+    segment_id INTEGER NOT NULL,
+    PRIMARY KEY (key, segment_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS occurrences (
+    id INTEGER PRIMARY KEY,
+    segment_id INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS occurrences_segment ON occurrences (segment_id, source);
+"""
+
+
+@lru_cache(maxsize=1)
+def _analysis_tables() -> Tuple[np.ndarray, np.ndarray]:
+    """(window [FRAME_SIZE], ma trận band [FRAME_SIZE // 2 + 1, NUM_BANDS])"""
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / FINGERPRINT_RATE)
+    edges = np.geomspace(BAND_RANGE[0], BAND_RANGE[1], NUM_BANDS + 1)
+    band = np.searchsorted(edges, freqs, side='right') - 1
+    bands = np.zeros((len(freqs), NUM_BANDS), dtype=np.float32)
+    inside = (band >= 0) & (band < NUM_BANDS)
+    bands[np.flatnonzero(inside), band[inside]] = 1.0
+    return window, bands
+
+
+def fingerprint(samples: np.ndarray, sample_rate: int, chunk_frames: int = 512) -> np.ndarray:
+    """
+    Fingerprint của một segment
+
+    Args:
+        samples: [frames] hoặc [frames, channels], float hoặc int16
+        sample_rate: Sample rate của samples
+        chunk_frames: Số frame FFT mỗi lần (giới hạn memory tạm)
+
+    Returns:
+        uint32 [n] - một sub-fingerprint cho mỗi hop (rỗng nếu segment quá ngắn)
+    """
+    samples = np.asarray(samples)
+    if samples.dtype == np.int16:
+        samples = samples.astype(np.float32) / 32768.0
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    samples = resample(samples.astype(np.float32, copy=False), sample_rate, FINGERPRINT_RATE)
+
+    if len(samples) < FRAME_SIZE + HOP_SIZE:
+        return np.zeros(0, dtype=np.uint32)
+
+    window, bands = _analysis_tables()
+    frames = sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE]
+
+    energy = np.empty((len(frames), NUM_BANDS), dtype=np.float32)
+    for start in range(0, len(frames), chunk_frames):
+        chunk = frames[start:start + chunk_frames] * window
+        spectrum = np.fft.rfft(chunk, axis=1)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+        energy[start:start + chunk_frames] = power @ bands
+
+    band_diff = energy[:, :-1] - energy[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    return np.packbits(bits, axis=1, bitorder='little').view('<u4').ravel().copy()
+
+
+def anchor_keys(fp: np.ndarray, count: int = DEFAULT_ANCHORS) -> np.ndarray:
+    """
+    Các sub-fingerprint dùng làm key tra cứu: count giá trị có hash nhỏ nhất
+
+    Hai segment giống nhau có phần lớn sub-fingerprint trùng nhau, nên với xác
+    suất cao có chung anchor (min-hash trên tập sub-fingerprint).
+    """
+    values = np.unique(fp)
+    values = values[~np.isin(values, _DEGENERATE)]
+    hashed = (values.astype(np.uint64) * np.uint64(0x9E3779B1)) & np.uint64(0xFFFFFFFF)
+    return values[np.argsort(hashed, kind='stable')[:count]]
+
+
+def bit_error_rate(a: np.ndarray, b: np.ndarray, offset: int) -> Tuple[float, int]:
+    """
+    Tỷ lệ bit khác nhau khi a[i] khớp với b[i - offset]
+
+    Returns:
+        (bit error rate, số frame chồng lấn)
+    """
+    start = max(0, offset)
+    end = min(len(a), len(b) + offset)
+    if end <= start:
+        return 1.0, 0
+    diff = np.bitwise_xor(a[start:end], b[start - offset:end - offset])
+    errors = int(np.unpackbits(diff.view(np.uint8)).sum())
+    return errors / (32 * (end - start)), end - start
+
+
+class SegmentIndex:
+    """
+    Index fingerprint bền vững (SQLite) của các segment đã gặp
+
+    Mỗi cụm segment giống nhau là một dòng trong segments (fingerprint của lần
+    gặp đầu) và các lần xuất hiện nằm trong occurrences. Mỗi observe() là một
+    transaction IMMEDIATE nên nhiều thread / process (worker) dùng chung một file
+    index không tạo ra hai cụm cho cùng một đoạn audio. Mỗi thread nên mở
+    SegmentIndex riêng (connection SQLite không chia sẻ giữa thread).
+
+    Usage:
+        with SegmentIndex('.cache/segment_index.sqlite') as index:
+            hit = index.observe(fingerprint(samples, 16000), 'a.mp3', 12.0, 17.5)
+            hit['occurrence']   # 1 = lần đầu, 2 = lặp lần thứ nhất...
+    """
+
+    def __init__(
+        self,
+        index_path: str,
+        max_ber: float = DEFAULT_MAX_BER,
+        min_overlap: float = DEFAULT_MIN_OVERLAP,
+        anchors: int = DEFAULT_ANCHORS
+    ):
+        self.index_path = str(index_path)
+        self.max_ber = max_ber
+        self.min_overlap = min_overlap
+        self.anchors = anchors
+
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.index_path, timeout=60, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def match(self, fp: np.ndarray) -> Optional[int]:
+        """id của cụm có fingerprint gần fp nhất (None nếu không có cụm nào đủ gần)"""
+        keys = anchor_keys(fp, self.anchors)
+        if len(fp) < MIN_FRAMES or not len(keys):
+            return None
+
+        duration = len(fp) * HOP_SIZE / FINGERPRINT_RATE
+        placeholders = ",".join("?" * len(keys))
+        candidates = self._conn.execute(
+            f"SELECT s.id, s.fingerprint FROM anchors a JOIN segments s ON s.id = a.segment_id "
+            f"WHERE a.key IN ({placeholders}) AND s.duration BETWEEN ? AND ? "
+            f"GROUP BY s.id ORDER BY COUNT(*) DESC LIMIT {MAX_CANDIDATES}",
+            [int(k) for k in keys] + [duration * self.min_overlap, duration / self.min_overlap]
+        ).fetchall()
+
+        best_id, best_ber = None, self.max_ber
+        for segment_id, blob in candidates:
+            other = np.frombuffer(blob, dtype='<u4')
+            min_frames = self.min_overlap * max(len(fp), len(other))
+            # Căn hai fingerprint theo vị trí của các anchor chung
+            shared = np.intersect1d(keys, other)
+            offsets = {
+                int(np.argmax(fp == key)) - int(np.argmax(other == key)) for key in shared
+            }
+            for offset in offsets:
+                ber, overlap = bit_error_rate(fp, other, offset)
+                if overlap >= min_frames and ber < best_ber:
+                    best_id, best_ber = segment_id, ber
+        return best_id
+
+    def observe(self, fp: np.ndarray, source: str, start: float, end: float) -> Dict:
+        """
+        Ghi nhận một segment, trả về nó là lần xuất hiện thứ mấy của nội dung đó
+
+        Lần xuất hiện trùng input và chồng lấn thời gian với một lần đã ghi là
+        cùng một đoạn audio (chạy lại file), không tính là lặp.
+
+        Returns:
+            Dict {segment_id, occurrence, first: {input, start, end}}
+        """
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            segment_id = self.match(fp)
+            if segment_id is None:
+                segment_id = conn.execute(
+                    "INSERT INTO segments (duration, fingerprint) VALUES (?, ?)",
+                    (len(fp) * HOP_SIZE / FINGERPRINT_RATE, fp.astype('<u4').tobytes())
+                ).lastrowid
+                conn.executemany(
+                    "INSERT INTO anchors (key, segment_id) VALUES (?, ?)",
+                    [(int(k), segment_id) for k in anchor_keys(fp, self.anchors)]
+                )
+
+            row = conn.execute(
+                "SELECT id FROM occurrences WHERE segment_id = ? AND source = ? "
+                "AND start < ? AND end > ? ORDER BY id LIMIT 1",
+                (segment_id, source, end, start)
+            ).fetchone()
+            if row is not None:
+                occurrence_id = row[0]
+            else:
+                occurrence_id = conn.execute(
+                    "INSERT INTO occurrences (segment_id, source, start, end) VALUES (?, ?, ?, ?)",
+                    (segment_id, source, start, end)
+                ).lastrowid
+
+            occurrence = conn.execute(
+                "SELECT COUNT(*) FROM occurrences WHERE segment_id = ? AND id <= ?",
+                (segment_id, occurrence_id)
+            ).fetchone()[0]
+            first = conn.execute(
+                "SELECT source, start, end FROM occurrences WHERE segment_id = ? ORDER BY id LIMIT 1",
+                (segment_id,)
+            ).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        return {
+            'segment_id': segment_id,
+            'occurrence': occurrence,
+            'first': {'input': first[0], 'start': round(first[1], 3), 'end': round(first[2], 3)}
+        }
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SegmentDeduper:
+    """
+    Quyết định giữ / bỏ từng segment theo số lần nội dung đã xuất hiện
+
+    Segment là lần xuất hiện thứ > max_repeats + 1 bị bỏ (action 'drop', không
+    encode/ghi) hoặc vẫn ghi nhưng đánh dấu repeat_of trong manifest ('flag').
+    Mỗi lần cắt một file mở một deduper (một connection SQLite).
+
+    Usage:
+        with SegmentDeduper('.cache/segment_index.sqlite', max_repeats=0) as dedup:
+            repeat = dedup.check(samples, 16000, 'a.mp3', start, end)
+            if dedup.keep(repeat):
+                ... ghi segment, thêm repeat vào metadata nếu có ...
+    """
+
+    def __init__(
+        self,
+        index_path: str,
+        max_repeats: int = 0,
+        action: str = 'drop',
+        max_ber: float = DEFAULT_MAX_BER
+    ):
+        if action not in REPEAT_ACTIONS:
+            raise ValueError(f"Unknown repeat action: {action} (expected one of {REPEAT_ACTIONS})")
+        self.index = SegmentIndex(index_path, max_ber=max_ber)
+        self.max_repeats = max_repeats
+        self.action = action
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.repeats = 0
+        self.over_limit = 0
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional['SegmentDeduper']:
+        """Tạo deduper từ section segment_dedup của config.yaml (None nếu tắt)"""
+        dedup_config = config.get('segment_dedup', {})
+        if not dedup_config.get('enabled', False):
+            return None
+        return cls(
+            dedup_config.get('index_path', '.cache/segment_index.sqlite'),
+            max_repeats=dedup_config.get('max_repeats', 0),
+            action=dedup_config.get('action', 'drop'),
+            max_ber=dedup_config.get('max_bit_error_rate', DEFAULT_MAX_BER)
+        )
+
+    def check(
+        self,
+        samples: np.ndarray,
+        sample_rate: int,
+        source: str,
+        start: float,
+        end: float
+    ) -> Optional[Dict]:
+        """
+        Fingerprint + tra index một segment
+
+        Args:
+            samples, sample_rate: Audio của segment
+            source: Input chứa segment (lưu theo đường dẫn tuyệt đối)
+            start, end: Vị trí segment trong input (giây)
+
+        Returns:
+            None nếu segment được giữ bình thường, hoặc Dict {repeat_of,
+            occurrence} nếu vượt quá max_repeats (bỏ hoặc đánh dấu theo action)
+        """
+        fp = fingerprint(samples, sample_rate)
+        if len(fp) < MIN_FRAMES:
+            return None
+
+        hit = self.index.observe(fp, os.path.abspath(str(source)), start, end)
+        with self._lock:
+            self.checked += 1
+            if hit['occurrence'] > 1:
+                self.repeats += 1
+            if hit['occurrence'] <= self.max_repeats + 1:
+                return None
+            self.over_limit += 1
+        return {'repeat_of': hit['first'], 'occurrence': hit['occurrence']}
+
+    def keep(self, repeat: Optional[Dict]) -> bool:
+        """Segment có được encode + ghi không"""
+        return repeat is None or self.action == 'flag'
+
+    def report(self) -> Dict:
+        return {
+            'checked': self.checked,
+            'repeats': self.repeats,
+            'dropped' if self.action == 'drop' else 'flagged': self.over_limit,
+            'max_repeats': self.max_repeats
+        }
+
+    def close(self):
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def test_segment_dedup():
+    """Test function"""
+    import sys
+    import tempfile
+    import time
+
+    from .audio_reader import AudioReader
+
+    if len(sys.argv) > 1:
+        reader = AudioReader(sys.argv[1])
+        audio = np.concatenate([block for _, block in reader.blocks()])
+        sample_rate = reader.sample_rate
+    else:
+        sample_rate = 16000
+        rng = np.random.default_rng(0)
+        audio = rng.standard_normal((sample_rate * 120, 1)).astype(np.float32)
+        audio *= np.repeat(rng.random(120 * 4), sample_rate // 4)[:, None]
+
+    def clip(start, length=8.0):
+        return audio[int(start * sample_rate):int((start + length) * sample_rate)]
+
+    base = fingerprint(clip(20.0), sample_rate)
+    shifted = fingerprint(clip(20.013), sample_rate)
+    noisy = clip(20.0) + 0.01 * np.random.default_rng(1).standard_normal(clip(20.0).shape)
+    other = fingerprint(clip(60.0), sample_rate)
+    print(f"frames: {len(base)}")
+    print(f"BER shifted 13ms: {bit_error_rate(base, shifted, 0)[0]:.3f}")
+    print(f"BER + noise: {bit_error_rate(base, fingerprint(noisy, sample_rate), 0)[0]:.3f}")
+    print(f"BER other clip: {bit_error_rate(base, other, 0)[0]:.3f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with SegmentDeduper(os.path.join(tmp, 'index.sqlite'), max_repeats=0) as dedup:
+            start = time.perf_counter()
+            for k in range(10):
+                dedup.check(clip(k * 10.0, 6.0), sample_rate, 'a.wav', k * 10.0, k * 10.0 + 6.0)
+            print(f"10 segments in {time.perf_counter() - start:.3f}s")
+            print("repeat in b.wav:", dedup.check(clip(30.02, 6.0), sample_rate, 'b.wav', 5.0, 11.0))
+            print("rerun of a.wav:", dedup.check(clip(30.0, 6.0), sample_rate, 'a.wav', 30.0, 36.0))
+            print(dedup.report())
+
+
+if __name__ == "__main__":
+    test_segment_dedup()
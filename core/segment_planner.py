@@ -0,0 +1,241 @@
+"""
+Segment Planning Module
+Chọn điểm cắt giữa các câu sao cho độ dài segment rơi vào các duration bucket,
+giảm padding lãng phí khi training theo batch
+"""
+
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# Phạt cho segment nằm ngoài [min_duration, max_duration] (chỉ dùng khi không còn cách khác)
+OUT_OF_RANGE_PENALTY = 1e6
+# Chi phí nhỏ cho mỗi segment để ưu tiên ít điểm cắt khi waste bằng nhau
+SEGMENT_COST = 1e-3
+# Phạt cắt giữa câu: lớn hơn waste của mọi cách cắt ở cuối câu, nhỏ hơn phạt
+# ngoài giới hạn (câu dài hơn max_duration vẫn phải cắt giữa câu)
+MID_SENTENCE_CUT_PENALTY = 1e3
+
+# Dấu kết thúc câu
+SENTENCE_END = ('.', '!', '?', '…')
+
+
+def sentence_boundaries(texts: Sequence[str]) -> List[bool]:
+    """Với mỗi đoạn text: cắt ngay sau nó có phải là cuối câu không"""
+    return [text.rstrip().endswith(SENTENCE_END) for text in texts]
+
+
+class SegmentPlanner:
+    """Quy hoạch động trên các ranh giới câu ứng viên"""
+
+    def __init__(
+        self,
+        buckets: Sequence[float],
+        min_duration: float,
+        max_duration: float,
+        max_gap: float = 1.0,
+        padding: float = 0.0
+    ):
+        """
+        Args:
+            buckets: Các mức độ dài (giây) mà batch sẽ được pad tới
+            min_duration: Độ dài tối thiểu của segment
+            max_duration: Độ dài tối đa của segment
+            max_gap: Không gộp hai câu cách nhau khoảng lặng dài hơn (giây)
+            padding: Padding được thêm khi cắt audio (trước + sau)
+        """
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.max_gap = max_gap
+        self.padding = padding
+        # max_duration luôn là bucket cuối cùng
+        self.buckets = sorted(set(b for b in buckets if b < max_duration) | {max_duration})
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'SegmentPlanner':
+        """Tạo planner từ config.yaml (sections segment_planner + audio_segmentation)"""
+        seg_config = config['audio_segmentation']
+        planner_config = config.get('segment_planner', {})
+
+        return cls(
+            buckets=planner_config.get('buckets', [2.0, 4.0, 6.0, 8.0, 10.0]),
+            min_duration=seg_config['min_duration'],
+            max_duration=seg_config['max_duration'],
+            max_gap=planner_config.get('max_gap', 1.0),
+            padding=seg_config['padding_before'] + seg_config['padding_after']
+        )
+
+    def bucket_for(self, duration: float) -> float:
+        """Bucket nhỏ nhất chứa được duration (segment quá dài tự thành bucket riêng)"""
+        index = bisect_left(self.buckets, duration)
+        return self.buckets[index] if index < len(self.buckets) else duration
+
+    def plan(
+        self,
+        spans: List[Tuple[float, float]],
+        boundaries: Optional[Sequence[bool]] = None
+    ) -> List[Tuple[int, int]]:
+        """
+        Chọn cách gộp các câu liên tiếp thành segment
+
+        Args:
+            spans: List (start, end) của các câu, đã sắp xếp theo thời gian
+            boundaries: boundaries[k] = cắt sau spans[k] là cuối câu (vd. từ
+                sentence_boundaries). Khi spans là phrase chứ không phải câu,
+                cắt ở ranh giới khác bị phạt MID_SENTENCE_CUT_PENALTY - chỉ xảy
+                ra khi câu không vừa max_duration. None = mọi ranh giới đều là
+                cuối câu.
+
+        Returns:
+            List (i, j): segment gồm các câu spans[i:j]
+
+        Complexity: O(n * k), với k là số câu tối đa vừa trong max_duration.
+        """
+        n = len(spans)
+        if n == 0:
+            return []
+
+        best = [0.0] + [float('inf')] * n
+        choice = [0] * (n + 1)
+
+        for j in range(1, n + 1):
+            end = spans[j - 1][1]
+            cut_cost = 0.0
+            if boundaries is not None and j < n and not boundaries[j - 1]:
+                cut_cost = MID_SENTENCE_CUT_PENALTY
+
+            for i in range(j - 1, -1, -1):
+                duration = end - spans[i][0] + self.padding
+
+                # Gộp thêm câu i sẽ vượt max hoặc chứa khoảng lặng quá dài
+                if i < j - 1 and (
+                    duration > self.max_duration
+                    or spans[i + 1][0] - spans[i][1] > self.max_gap
+                ):
+                    break
+
+                cost = best[i] + self._segment_cost(duration) + cut_cost
+                if cost < best[j]:
+                    best[j] = cost
+                    choice[j] = i
+
+        groups = []
+        j = n
+        while j > 0:
+            groups.append((choice[j], j))
+            j = choice[j]
+
+        return groups[::-1]
+
+    def plan_sentences(self, sentences: List[Dict]) -> List[Dict]:
+        """
+        Gộp các câu đã align ({text, start, end, confidence}) theo kế hoạch
+
+        Returns:
+            List câu mới, confidence là trung bình của các câu được gộp
+        """
+        groups = self.plan([(s['start'], s['end']) for s in sentences])
+
+        planned = []
+        for i, j in groups:
+            members = sentences[i:j]
+            confidences = [s['confidence'] for s in members if s.get('confidence') is not None]
+
+            planned.append({
+                'text': ' '.join(s['text'] for s in members),
+                'start': members[0]['start'],
+                'end': members[-1]['end'],
+                'confidence': sum(confidences) / len(confidences) if confidences else None
+            })
+
+        return planned
+
+    def report(
+        self,
+        spans: List[Tuple[float, float]],
+        baseline: Optional[List[Tuple[float, float]]] = None
+    ) -> Dict:
+        """
+        Thống kê hiệu quả padding
+
+        padding_efficiency = tổng độ dài thật / tổng độ dài sau khi pad tới bucket
+
+        Args:
+            spans: Segments sau khi plan
+            baseline: Segments trước khi plan (để so sánh, optional)
+        """
+        durations = [end - start + self.padding for start, end in spans]
+
+        bucket_counts = {}
+        for duration in durations:
+            bucket = self.bucket_for(duration)
+            key = f"{bucket:g}" if bucket in self.buckets else "overflow"
+            bucket_counts[key] = bucket_counts.get(key, 0) + 1
+
+        report = {
+            'buckets': self.buckets,
+            'num_segments': len(durations),
+            'padding_efficiency': round(self.padding_efficiency(durations), 4),
+            'out_of_range': sum(
+                1 for d in durations if d < self.min_duration or d > self.max_duration
+            ),
+            'bucket_counts': bucket_counts
+        }
+
+        if baseline is not None:
+            report['baseline_padding_efficiency'] = round(self.padding_efficiency(
+                [end - start + self.padding for start, end in baseline]
+            ), 4)
+
+        return report
+
+    def padding_efficiency(self, durations: List[float]) -> float:
+        """Tỷ lệ audio thật trên tổng độ dài đã pad"""
+        padded = sum(self.bucket_for(d) for d in durations)
+        return sum(durations) / padded if padded else 1.0
+
+    def _segment_cost(self, duration: float) -> float:
+        """Chi phí = thời gian pad lãng phí, cộng phạt nếu ngoài giới hạn"""
+        cost = self.bucket_for(duration) - duration + SEGMENT_COST
+        if duration < self.min_duration or duration > self.max_duration:
+            cost += OUT_OF_RANGE_PENALTY
+        return cost
+
+
+def test_planner():
+    """Test function"""
+    config = {
+        'audio_segmentation': {
+            'padding_before': 0.1,
+            'padding_after': 0.1,
+            'min_duration': 0.5,
+            'max_duration': 15.0
+        },
+        'segment_planner': {
+            'buckets': [2.0, 4.0, 6.0, 8.0, 10.0],
+            'max_gap': 1.0
+        }
+    }
+
+    planner = SegmentPlanner.from_config(config)
+
+    # Mock aligned sentences
+    sentences = [
+        {'text': 'Câu một.', 'start': 0.0, 'end': 1.2, 'confidence': 0.9},
+        {'text': 'Câu hai.', 'start': 1.3, 'end': 3.5, 'confidence': 0.8},
+        {'text': 'Câu ba.', 'start': 3.6, 'end': 4.9, 'confidence': 0.95},
+        {'text': 'Câu bốn.', 'start': 7.0, 'end': 9.7, 'confidence': 0.85},
+    ]
+
+    planned = planner.plan_sentences(sentences)
+    for item in planned:
+        print(f"[{item['start']:.2f}-{item['end']:.2f}] {item['text']}")
+
+    print(planner.report(
+        [(s['start'], s['end']) for s in planned],
+        baseline=[(s['start'], s['end']) for s in sentences]
+    ))
+
+
+if __name__ == "__main__":
+    test_planner()
@@ -4,14 +4,133 @@ Tách text thành các câu độc lập với hỗ trợ tiếng Việt
 """
 
 import re
-from typing import List, Dict
-import nltk
+import threading
+from typing import List, Dict, Optional, Tuple, Iterable, Iterator
 
-# Download NLTK data nếu chưa có
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt', quiet=True)
+
+class TokenizerResourceError(LookupError):
+    """Tokenizer data không có sẵn trên máy (không bao giờ tự download)"""
+
+
+# Cache tokenizer dùng chung cho toàn bộ process (mọi SentenceSplitter)
+_TOKENIZER_CACHE: Dict[tuple, object] = {}
+_TOKENIZER_LOCK = threading.Lock()
+_MISSING = object()
+
+
+def _punkt_resource() -> str:
+    """Tên resource NLTK: punkt_tab (NLTK >= 3.8.2) hoặc punkt (pickle)"""
+    import nltk
+    
+    return 'punkt_tab' if hasattr(nltk.tokenize, 'PunktTokenizer') else 'punkt'
+
+
+def _load_punkt(language: str, data_dir: Optional[str]):
+    """Load Punkt tokenizer từ data dir local, không truy cập mạng"""
+    import nltk
+    
+    if data_dir and data_dir not in nltk.data.path:
+        nltk.data.path.insert(0, data_dir)
+    
+    try:
+        if hasattr(nltk.tokenize, 'PunktTokenizer'):
+            return nltk.tokenize.PunktTokenizer(language)
+        return nltk.data.load(f'tokenizers/punkt/{language}.pickle')
+    except LookupError as e:
+        raise TokenizerResourceError(
+            f"NLTK '{_punkt_resource()}' data for '{language}' not found "
+            f"(searched: {', '.join(str(p) for p in nltk.data.path)}). "
+            f"Run 'python cli.py --prepare-tokenizers' with network access, or copy "
+            f"nltk_data into sentence_splitter.nltk_data_dir"
+        ) from e
+
+
+def _load_underthesea():
+    """Import underthesea một lần, trả về None nếu chưa cài"""
+    try:
+        from underthesea import sent_tokenize
+        return sent_tokenize
+    except ImportError:
+        print("Warning: underthesea not installed, using basic splitting for Vietnamese")
+        return None
+
+
+def get_tokenizer(name: str, language: str = 'english', data_dir: Optional[str] = None):
+    """
+    Lấy tokenizer từ cache của process, load lần đầu nếu cần
+    
+    Args:
+        name: 'punkt' hoặc 'underthesea'
+        language: Ngôn ngữ của Punkt model
+        data_dir: Thư mục nltk_data local
+        
+    Returns:
+        Tokenizer object (hoặc None nếu underthesea chưa cài)
+    
+    Raises:
+        TokenizerResourceError: Nếu data của tokenizer không có trên máy
+    """
+    key = (name, language, data_dir)
+    tokenizer = _TOKENIZER_CACHE.get(key, _MISSING)
+    if tokenizer is not _MISSING:
+        return tokenizer
+    
+    with _TOKENIZER_LOCK:
+        if key not in _TOKENIZER_CACHE:
+            if name == 'punkt':
+                _TOKENIZER_CACHE[key] = _load_punkt(language, data_dir)
+            elif name == 'underthesea':
+                _TOKENIZER_CACHE[key] = _load_underthesea()
+            else:
+                raise ValueError(f"Unknown tokenizer: {name}")
+        return _TOKENIZER_CACHE[key]
+
+
+def prepare_tokenizers(config: Dict, download: bool = True) -> Dict[str, str]:
+    """
+    Pre-warm tokenizer resources (chạy một lần trước khi xử lý offline)
+    
+    Download NLTK data vào sentence_splitter.nltk_data_dir nếu còn thiếu
+    (đây là chỗ duy nhất được phép truy cập mạng), sau đó load vào cache.
+    
+    Returns:
+        Dict tên tokenizer -> trạng thái
+    """
+    data_dir = config['sentence_splitter'].get('nltk_data_dir')
+    status = {}
+    
+    try:
+        get_tokenizer('punkt', data_dir=data_dir)
+        status['punkt'] = 'ready'
+    except TokenizerResourceError:
+        if not download:
+            raise
+        
+        import nltk
+        
+        resource = _punkt_resource()
+        print(f"Downloading NLTK '{resource}' to {data_dir or 'default nltk_data'}...")
+        if not nltk.download(resource, download_dir=data_dir, quiet=True):
+            raise TokenizerResourceError(f"Failed to download NLTK '{resource}'")
+        
+        get_tokenizer('punkt', data_dir=data_dir)
+        status['punkt'] = 'downloaded'
+    
+    status['underthesea'] = 'ready' if get_tokenizer('underthesea') else 'not installed'
+    
+    return status
+
+
+# Các pattern dùng chung, compile một lần khi import module
+_WHITESPACE_RE = re.compile(r'\s+')
+_WORD_RE = re.compile(r'\S+')
+_SOFT_BREAK_RE = re.compile(r'[,;]')
+# Loại bỏ ký tự đặc biệt không cần thiết (giữ lại dấu câu)
+_UNWANTED_CHARS_RE = re.compile(
+    r'[^\w\s\.,;:!?\'\"()áàảãạăắằẳẵặâấầẩẫậéèẻẽẹêếềểễệíìỉĩịóòỏõọôốồổỗộơớờởỡợúùủũụưứừửữựýỳỷỹỵđ-]'
+)
+
+Span = Tuple[int, int]
 
 
 class SentenceSplitter:
@@ -23,15 +142,15 @@ class SentenceSplitter:
         self.max_length = config['sentence_splitter']['max_length']
         self.merge_short = config['sentence_splitter']['merge_short_sentences']
         self.sentence_endings = config['sentence_splitter']['sentence_endings']
+        self.nltk_data_dir = config['sentence_splitter'].get('nltk_data_dir')
         
-        # Load underthesea cho tiếng Việt
-        try:
-            from underthesea import sent_tokenize
-            self.vi_sent_tokenize = sent_tokenize
-            self.has_underthesea = True
-        except ImportError:
-            print("Warning: underthesea not installed, using basic splitting for Vietnamese")
-            self.has_underthesea = False
+        # Một hoặc nhiều dấu kết thúc câu liên tiếp ("?!", "...")
+        endings = sorted(self.sentence_endings, key=len, reverse=True)
+        self._endings_re = re.compile('(?:' + '|'.join(re.escape(e) for e in endings) + ')+')
+        
+        # Underthesea cho tiếng Việt (import một lần cho cả process)
+        self.vi_sent_tokenize = get_tokenizer('underthesea')
+        self.has_underthesea = self.vi_sent_tokenize is not None
     
     def split_sentences(self, text: str, language: str = "vi") -> List[str]:
         """
@@ -42,136 +161,296 @@ class SentenceSplitter:
             language: Ngôn ngữ (vi/en/auto)
             
         Returns:
-            List các câu
+            List các câu (đã làm sạch)
+        """
+        sentences = []
+        for start, end in self.split_sentence_spans(text, language):
+            sentence = self._clean_text(text[start:end])
+            if sentence:
+                sentences.append(sentence)
+        
+        return sentences
+    
+    def split_sentence_spans(self, text: str, language: str = "vi") -> List[Span]:
+        """
+        Tách text thành các câu dạng (start_char, end_char) trỏ vào text gốc
+        
+        Không copy chuỗi: tách câu, gộp câu ngắn và chia câu dài đều làm
+        trên offsets, một lượt qua text.
+        
+        Args:
+            text: Text cần tách
+            language: Ngôn ngữ (vi/en/auto)
+            
+        Returns:
+            List (start, end) sao cho text[start:end] là một câu
         """
         if not text or not text.strip():
             return []
         
-        # Làm sạch text
-        text = self._clean_text(text)
-        
         # Tách câu theo ngôn ngữ
         if language == "vi" and self.has_underthesea:
-            sentences = self._split_vietnamese(text)
+            spans = self._split_vietnamese(text)
         elif language == "en":
-            sentences = self._split_english(text)
+            spans = self._split_english(text)
         else:
-            sentences = self._split_basic(text)
+            spans = self._split_basic(text)
         
         # Post-processing
-        sentences = self._post_process_sentences(sentences)
+        return self._post_process_spans(text, spans)
+    
+    def split_word_stream(
+        self,
+        words: Iterable[Dict],
+        max_duration: Optional[float] = None
+    ) -> Iterator[Dict]:
+        """
+        Tách câu trực tiếp trên dòng từ có timestamps
         
-        return sentences
+        Args:
+            words: Iterable {word, start, end, probability} (ví dụ
+                core.transcriber.iter_words), có thể là generator
+            max_duration: Thời lượng tối đa của một câu (giây)
+            
+        Yields:
+            {text, start, end, confidence, start_word, end_word} với
+            [start_word, end_word) là khoảng index trong dòng từ
+        
+        Chỉ giữ câu đang xây dựng và một câu chờ (để gộp câu ngắn theo sau
+        vào nó) nên chạy được tăng dần khi model còn đang decode.
+        """
+        endings = tuple(self.sentence_endings)
+        buffer = []  # [(index, word_dict)] của câu hiện tại
+        buffer_chars = 0
+        pending = None  # câu đã xong, giữ lại một nhịp để gộp câu ngắn
+        
+        def complete(items):
+            nonlocal pending
+            if not items:
+                return None
+            span = self._make_word_span(items)
+            if pending is None:
+                pending = span
+                return None
+            if (self.merge_short and len(span['text']) < self.min_length
+                    and self._fits_duration(span['end'] - pending['start'], max_duration)):
+                pending = self._merge_word_spans(pending, span)
+                return None
+            ready, pending = pending, span
+            return ready
+        
+        for index, word in enumerate(words):
+            token = word['word'].strip()
+            if not token:
+                continue
+            
+            if buffer and (
+                buffer_chars + 1 + len(token) > self.max_length
+                or not self._fits_duration(word['end'] - buffer[0][1]['start'], max_duration)
+            ):
+                # Câu quá dài: cắt ở dấu phẩy/chấm phẩy gần nhất nếu có
+                cut = len(buffer)
+                for k in range(len(buffer) - 1, 0, -1):
+                    if buffer[k - 1][1]['word'].strip().endswith((',', ';')):
+                        cut = k
+                        break
+                
+                head, buffer = buffer[:cut], buffer[cut:]
+                ready = complete(head)
+                if ready:
+                    yield ready
+                
+                buffer_chars = sum(len(w['word'].strip()) for _, w in buffer) + max(len(buffer) - 1, 0)
+                if buffer and (
+                    buffer_chars + 1 + len(token) > self.max_length
+                    or not self._fits_duration(word['end'] - buffer[0][1]['start'], max_duration)
+                ):
+                    ready = complete(buffer)
+                    if ready:
+                        yield ready
+                    buffer, buffer_chars = [], 0
+            
+            buffer_chars += len(token) + (1 if buffer else 0)
+            buffer.append((index, word))
+            
+            if token.endswith(endings):
+                ready = complete(buffer)
+                if ready:
+                    yield ready
+                buffer, buffer_chars = [], 0
+        
+        ready = complete(buffer)
+        if ready:
+            yield ready
+        if pending is not None:
+            yield pending
     
-    def _clean_text(self, text: str) -> str:
-        """Làm sạch text"""
-        # Loại bỏ khoảng trắng thừa
-        text = re.sub(r'\s+', ' ', text)
+    def _fits_duration(self, duration: float, max_duration: Optional[float]) -> bool:
+        """Kiểm tra thời lượng có nằm trong giới hạn không"""
+        return max_duration is None or duration <= max_duration
+    
+    def _make_word_span(self, items: List[Tuple[int, Dict]]) -> Dict:
+        """Tạo câu từ các từ liên tiếp trong buffer"""
+        probabilities = [w['probability'] for _, w in items if w.get('probability') is not None]
         
-        # Loại bỏ ký tự đặc biệt không cần thiết (giữ lại dấu câu)
-        text = re.sub(r'[^\w\s\.,;:!?\'\"()áàảãạăắằẳẵặâấầẩẫậéèẻẽẹêếềểễệíìỉĩịóòỏõọôốồổỗộơớờởỡợúùủũụưứừửữựýỳỷỹỵđ-]', '', text)
+        return {
+            'text': ' '.join(w['word'].strip() for _, w in items),
+            'start': items[0][1]['start'],
+            'end': items[-1][1]['end'],
+            'confidence': sum(probabilities) / len(probabilities) if probabilities else None,
+            'start_word': items[0][0],
+            'end_word': items[-1][0] + 1,
+            'num_words': len(items)
+        }
+    
+    def _merge_word_spans(self, first: Dict, second: Dict) -> Dict:
+        """Gộp hai câu liền nhau (confidence tính theo số từ)"""
+        confidence = first['confidence']
+        if first['confidence'] is not None and second['confidence'] is not None:
+            confidence = (
+                first['confidence'] * first['num_words'] + second['confidence'] * second['num_words']
+            ) / (first['num_words'] + second['num_words'])
         
+        return {
+            'text': first['text'] + ' ' + second['text'],
+            'start': first['start'],
+            'end': second['end'],
+            'confidence': confidence,
+            'start_word': first['start_word'],
+            'end_word': second['end_word'],
+            'num_words': first['num_words'] + second['num_words']
+        }
+    
+    def _clean_text(self, text: str) -> str:
+        """Làm sạch text của một câu"""
+        text = _WHITESPACE_RE.sub(' ', text)
+        text = _UNWANTED_CHARS_RE.sub('', text)
         return text.strip()
     
-    def _split_vietnamese(self, text: str) -> List[str]:
-        """Tách câu tiếng Việt sử dụng underthesea"""
+    def _trim(self, text: str, start: int, end: int) -> Span:
+        """Bỏ khoảng trắng ở hai đầu span"""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
+    
+    def _split_vietnamese(self, text: str) -> List[Span]:
+        """Tách câu tiếng Việt sử dụng underthesea, map kết quả về offsets"""
         try:
             sentences = self.vi_sent_tokenize(text)
-            return [s.strip() for s in sentences if s.strip()]
         except Exception as e:
             print(f"Error in Vietnamese tokenization: {e}")
             return self._split_basic(text)
+        
+        spans = []
+        cursor = 0
+        for sentence in sentences:
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            start = text.find(sentence, cursor)
+            if start < 0:
+                # Tokenizer đã chuẩn hóa text, không map được offsets
+                return self._split_basic(text)
+            cursor = start + len(sentence)
+            spans.append((start, cursor))
+        
+        return spans
     
-    def _split_english(self, text: str) -> List[str]:
-        """Tách câu tiếng Anh sử dụng NLTK"""
+    def _split_english(self, text: str) -> List[Span]:
+        """Tách câu tiếng Anh sử dụng NLTK Punkt"""
+        tokenizer = get_tokenizer('punkt', data_dir=self.nltk_data_dir)
+        
         try:
-            sentences = nltk.sent_tokenize(text)
-            return [s.strip() for s in sentences if s.strip()]
+            spans = (self._trim(text, s, e) for s, e in tokenizer.span_tokenize(text))
+            return [(s, e) for s, e in spans if e > s]
         except Exception as e:
             print(f"Error in English tokenization: {e}")
             return self._split_basic(text)
     
-    def _split_basic(self, text: str) -> List[str]:
-        """Tách câu cơ bản dựa trên dấu câu"""
-        # Tạo pattern từ danh sách dấu kết thúc câu
-        endings_pattern = '|'.join(re.escape(end) for end in self.sentence_endings)
+    def _split_basic(self, text: str) -> List[Span]:
+        """Tách câu cơ bản dựa trên dấu câu (một lượt, pattern đã compile)"""
+        spans = []
+        position = 0
         
-        # Tách dựa trên dấu kết thúc câu
-        pattern = f'([^{endings_pattern}]+[{endings_pattern}]+)'
-        sentences = re.findall(pattern, text)
+        for match in self._endings_re.finditer(text):
+            start, end = self._trim(text, position, match.end())
+            if end > start:
+                spans.append((start, end))
+            position = match.end()
         
-        # Nếu không tìm thấy dấu kết thúc, trả về toàn bộ text
-        if not sentences:
-            return [text.strip()] if text.strip() else []
+        # Phần còn lại không có dấu kết thúc vẫn là một câu
+        start, end = self._trim(text, position, len(text))
+        if end > start:
+            spans.append((start, end))
         
-        return [s.strip() for s in sentences if s.strip()]
+        return spans
     
-    def _post_process_sentences(self, sentences: List[str]) -> List[str]:
-        """Post-process các câu sau khi tách"""
-        if not sentences:
-            return []
-        
+    def _post_process_spans(self, text: str, spans: List[Span]) -> List[Span]:
+        """Gộp câu quá ngắn và chia câu quá dài, làm trên offsets"""
         processed = []
         
-        for sentence in sentences:
-            # Bỏ qua câu quá ngắn hoặc quá dài
-            if len(sentence) < self.min_length:
+        for start, end in spans:
+            length = end - start
+            
+            if length < self.min_length:
                 if self.merge_short and processed:
-                    # Gộp với câu trước
-                    processed[-1] = processed[-1] + " " + sentence
+                    # Gộp với câu trước: chỉ cần kéo dài end
+                    processed[-1] = (processed[-1][0], end)
                 else:
-                    processed.append(sentence)
+                    processed.append((start, end))
                 continue
             
-            if len(sentence) > self.max_length:
+            if length > self.max_length:
                 # Chia câu dài thành nhiều câu nhỏ hơn
-                sub_sentences = self._split_long_sentence(sentence)
-                processed.extend(sub_sentences)
+                processed.extend(self._split_long_span(text, start, end))
             else:
-                processed.append(sentence)
+                processed.append((start, end))
         
         return processed
     
-    def _split_long_sentence(self, sentence: str) -> List[str]:
-        """Chia câu quá dài thành nhiều câu nhỏ hơn"""
-        # Thử tách theo dấu phẩy, chấm phẩy
-        parts = re.split(r'[,;]', sentence)
+    def _split_long_span(self, text: str, start: int, end: int) -> List[Span]:
+        """Chia câu quá dài: trước theo dấu phẩy/chấm phẩy, sau đó theo khoảng trắng"""
+        # Các phần giữa dấu phẩy, chấm phẩy (giữ dấu ở cuối phần)
+        parts = []
+        position = start
+        for match in _SOFT_BREAK_RE.finditer(text, start, end):
+            parts.append(self._trim(text, position, match.end()))
+            position = match.end()
+        parts.append(self._trim(text, position, end))
         
         result = []
-        current = ""
-        
-        for part in parts:
-            part = part.strip()
-            if len(current) + len(part) <= self.max_length:
-                current = current + " " + part if current else part
+        for part in self._pack_spans(parts):
+            if part[1] - part[0] > self.max_length:
+                # Vẫn còn dài: chia theo khoảng trắng gần nhất
+                words = [m.span() for m in _WORD_RE.finditer(text, part[0], part[1])]
+                result.extend(self._pack_spans(words))
             else:
-                if current:
-                    result.append(current.strip())
-                current = part
-        
-        if current:
-            result.append(current.strip())
-        
-        # Nếu vẫn có câu dài, chia theo số ký tự
-        final_result = []
-        for part in result:
-            if len(part) > self.max_length:
-                # Chia theo khoảng trắng gần nhất
-                words = part.split()
-                temp = ""
-                for word in words:
-                    if len(temp) + len(word) + 1 <= self.max_length:
-                        temp = temp + " " + word if temp else word
-                    else:
-                        if temp:
-                            final_result.append(temp.strip())
-                        temp = word
-                if temp:
-                    final_result.append(temp.strip())
+                result.append(part)
+        
+        return result
+    
+    def _pack_spans(self, pieces: List[Span]) -> List[Span]:
+        """Gộp tham lam các span liên tiếp sao cho mỗi nhóm <= max_length"""
+        packed = []
+        current = None
+        
+        for start, end in pieces:
+            if end <= start:
+                continue
+            if current is None:
+                current = (start, end)
+            elif end - current[0] <= self.max_length:
+                current = (current[0], end)
             else:
-                final_result.append(part)
+                packed.append(current)
+                current = (start, end)
+        
+        if current is not None:
+            packed.append(current)
         
-        return final_result
+        return packed
 
 
 def test_splitter():
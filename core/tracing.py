@@ -0,0 +1,155 @@
+"""
+Tracing Module
+Ghi timeline dạng Chrome trace-event JSON (mở bằng chrome://tracing hoặc
+https://ui.perfetto.dev) với span cho từng file, stage và segment.
+
+Mỗi span được gắn pid + tid nên khi xử lý song song (thread/process pool)
+có thể thấy chỗ chồng lấn, chờ đợi và tuần tự hóa. Khi không bật trace,
+span() chỉ trả về một context manager rỗng dùng chung.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+
+_NULL_SPAN = nullcontext()
+
+# Recorder đang hoạt động của process (None = tắt trace)
+_recorder: Optional['TraceRecorder'] = None
+
+
+class TraceRecorder:
+    """Thu thập trace events ("X" complete events) từ mọi thread"""
+
+    def __init__(self):
+        self.events: List[Dict] = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._threads: Dict[int, str] = {}
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self._origin) * 1e6
+
+    @contextmanager
+    def span(self, name: str, cat: str = 'stage', args: Optional[Dict] = None):
+        """Ghi một span từ lúc vào tới lúc ra khỏi context"""
+        thread = threading.current_thread()
+        start = self._now_us()
+        try:
+            yield
+        finally:
+            event = {
+                'name': name,
+                'cat': cat,
+                'ph': 'X',
+                'ts': round(start, 1),
+                'dur': round(self._now_us() - start, 1),
+                'pid': os.getpid(),
+                'tid': thread.ident
+            }
+            if args:
+                event['args'] = args
+
+            with self._lock:
+                self.events.append(event)
+                self._threads.setdefault(thread.ident, thread.name)
+
+    def to_dict(self) -> Dict:
+        """Trace-event JSON, kèm metadata tên process/thread"""
+        pid = os.getpid()
+        metadata = [{
+            'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+            'args': {'name': f"audio-processor ({pid})"}
+        }]
+        with self._lock:
+            metadata.extend(
+                {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                for tid, name in self._threads.items()
+            )
+            events = list(self.events)
+
+        return {'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}
+
+    def write(self, path: str):
+        """Ghi trace ra file JSON"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+
+
+def start_tracing() -> TraceRecorder:
+    """Bật trace cho process hiện tại"""
+    global _recorder
+    if _recorder is None:
+        _recorder = TraceRecorder()
+    return _recorder
+
+
+def stop_tracing(path: Optional[str] = None) -> Optional[TraceRecorder]:
+    """Tắt trace, ghi ra path nếu có"""
+    global _recorder
+    recorder, _recorder = _recorder, None
+
+    if recorder is not None and path:
+        recorder.write(path)
+
+    return recorder
+
+
+@contextmanager
+def trace_to(path: Optional[str]):
+    """
+    Bật trace trong phạm vi context và ghi ra path khi kết thúc
+
+    Không làm gì nếu path là None, để entry point dùng trực tiếp với flag --trace.
+    """
+    if not path:
+        yield None
+        return
+
+    recorder = start_tracing()
+    try:
+        yield recorder
+    finally:
+        stop_tracing(path)
+
+
+def span(name: str, cat: str = 'stage', **args):
+    """
+    Context manager ghi span nếu trace đang bật
+
+    Usage:
+        with span('segment', cat='segment', index=i):
+            ...
+    """
+    recorder = _recorder
+    if recorder is None:
+        return _NULL_SPAN
+    return recorder.span(name, cat, args)
+
+
+def test_tracing():
+    """Test function"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def work(i):
+        with span('segment', cat='segment', index=i):
+            time.sleep(0.01)
+
+    with trace_to('trace_test.json') as recorder:
+        with span('file', cat='file', file='sample.wav'):
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                list(pool.map(work, range(4)))
+
+    print(f"{len(recorder.events)} events -> trace_test.json")
+
+
+if __name__ == "__main__":
+    test_tracing()
@@ -5,9 +5,11 @@ Sử dụng Whisper/Faster-Whisper để chuyển audio thành text với timest
 
 import os
 import warnings
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Iterable, Iterator, Union
 import numpy as np
 
+from .cascade import ModelCascade
+
 # Suppress warnings
 warnings.filterwarnings("ignore")
 
@@ -23,6 +25,12 @@ class Transcriber:
         self.language = config['stt']['language']
         self.device = config['stt']['device']
         
+        # Cascade: model lớn chỉ được load khi gặp span yếu đầu tiên
+        self.cascade = ModelCascade.from_config(config)
+        self._fallback = None
+        if self.cascade is not None:
+            self.cascade.redecode = self._redecode
+        
         self._load_model()
     
     def _load_model(self):
@@ -46,12 +54,13 @@ class Transcriber:
             self.model = whisper.load_model(self.model_size, device=self.device)
             print(f"✓ Whisper model loaded")
     
-    def transcribe(self, audio_path: str) -> Dict:
+    def transcribe(self, audio_path) -> Dict:
         """
         Chuyển audio thành text với timestamps
         
         Args:
-            audio_path: Đường dẫn file audio
+            audio_path: Đường dẫn file audio, hoặc np.ndarray float32
+                16kHz mono đã decode sẵn
             
         Returns:
             Dict chứa:
@@ -59,22 +68,78 @@ class Transcriber:
             - segments: List các segment với timestamps
             - language: Ngôn ngữ phát hiện được
         """
-        if not os.path.exists(audio_path):
-            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        if isinstance(audio_path, np.ndarray):
+            print(f"\nTranscribing: <array {len(audio_path) / 16000:.2f}s>")
+        else:
+            if not os.path.exists(audio_path):
+                raise FileNotFoundError(f"Audio file not found: {audio_path}")
+            
+            print(f"\nTranscribing: {os.path.basename(audio_path)}")
         
-        print(f"\nTranscribing: {os.path.basename(audio_path)}")
+        if self.cascade is None:
+            return self._run(audio_path)
         
+        audio = self._cascade_audio(audio_path)
+        result = self._run(audio)
+        result['segments'] = list(self.cascade.refine(result['segments'], audio))
+        result['text'] = ' '.join(seg['text'] for seg in result['segments'])
+        result['cascade'] = self.cascade.report(len(audio) / 16000)
+        print(
+            f"  ✓ Cascade: {result['cascade']['spans']} spans "
+            f"({result['cascade']['redecoded_ratio']:.1%} audio) re-decoded with {self.cascade.model}"
+        )
+        return result
+    
+    def _run(self, audio_path) -> Dict:
+        """Transcribe bằng engine đã cấu hình (không qua cascade)"""
         if self.engine == "faster-whisper":
             return self._transcribe_faster_whisper(audio_path)
         else:
             return self._transcribe_whisper(audio_path)
     
-    def _transcribe_faster_whisper(self, audio_path: str) -> Dict:
-        """Transcribe using Faster-Whisper"""
+    @staticmethod
+    def _cascade_audio(audio_path) -> np.ndarray:
+        """Cascade cần audio đã decode để cắt các span yếu"""
+        if isinstance(audio_path, np.ndarray):
+            return audio_path
+        from .audio_io import load_audio
+        return load_audio(audio_path)
+    
+    def _redecode(self, audio: np.ndarray) -> List[Dict]:
+        """Decode lại một span yếu bằng model lớn của cascade"""
+        if self._fallback is None:
+            stt = {**self.config['stt'], 'model': self.cascade.model, 'cascade': {'enabled': False}}
+            self._fallback = Transcriber({**self.config, 'stt': stt})
+        return self._fallback._run(audio)['segments']
+    
+    def transcribe_stream(self, audio_path) -> Iterator[Dict]:
+        """
+        Yield từng segment dict ngay khi model decode xong
+        
+        Faster-Whisper decode lười (generator) nên segment đầu tiên có sớm;
+        Whisper chuẩn decode hết rồi mới yield. Với cascade, span yếu được
+        yield sau khi decode lại (khi gặp segment tốt tiếp theo).
+        """
+        if self.cascade is not None:
+            audio = self._cascade_audio(audio_path)
+            yield from self.cascade.refine(self._stream(audio), audio)
+        else:
+            yield from self._stream(audio_path)
+    
+    def _stream(self, audio_path) -> Iterator[Dict]:
+        if self.engine == "faster-whisper":
+            segments, _ = self._run_faster_whisper(audio_path)
+            for segment in segments:
+                yield self._faster_whisper_segment(segment)
+        else:
+            yield from self._transcribe_whisper(audio_path)['segments']
+    
+    def _run_faster_whisper(self, audio_path):
+        """Gọi Faster-Whisper, trả về (segments generator, info)"""
         language = None if self.language == "auto" else self.language
         word_timestamps = self.config['stt'].get('word_timestamps', True)
         
-        segments, info = self.model.transcribe(
+        return self.model.transcribe(
             audio_path,
             language=language,
             word_timestamps=word_timestamps,
@@ -86,32 +151,40 @@ class Transcriber:
                 min_silence_duration_ms=100
             )
         )
+    
+    def _faster_whisper_segment(self, segment) -> Dict:
+        """Convert một Faster-Whisper segment sang dict"""
+        seg_dict = {
+            'start': segment.start,
+            'end': segment.end,
+            'text': segment.text.strip(),
+            'confidence': getattr(segment, 'avg_logprob', None)
+        }
+        
+        # Thêm word-level timestamps nếu có
+        if self.config['stt'].get('word_timestamps', True) and getattr(segment, 'words', None):
+            seg_dict['words'] = [
+                {
+                    'word': word.word,
+                    'start': word.start,
+                    'end': word.end,
+                    'probability': word.probability
+                }
+                for word in segment.words
+            ]
+        
+        return seg_dict
+    
+    def _transcribe_faster_whisper(self, audio_path: str) -> Dict:
+        """Transcribe using Faster-Whisper"""
+        segments, info = self._run_faster_whisper(audio_path)
         
         # Convert segments to list and extract info
         result_segments = []
         full_text = []
         
         for segment in segments:
-            seg_dict = {
-                'start': segment.start,
-                'end': segment.end,
-                'text': segment.text.strip(),
-                'confidence': getattr(segment, 'avg_logprob', None)
-            }
-            
-            # Thêm word-level timestamps nếu có
-            if word_timestamps and hasattr(segment, 'words'):
-                seg_dict['words'] = [
-                    {
-                        'word': word.word,
-                        'start': word.start,
-                        'end': word.end,
-                        'probability': word.probability
-                    }
-                    for word in segment.words
-                ]
-            
-            result_segments.append(seg_dict)
+            result_segments.append(self._faster_whisper_segment(segment))
             full_text.append(segment.text.strip())
         
         return {
@@ -155,7 +228,8 @@ class Transcriber:
             'text': result['text'],
             'segments': result_segments,
             'language': result['language'],
-            'duration': None  # Whisper doesn't provide duration directly
+            # Whisper không trả về duration, chỉ biết được khi input là array
+            'duration': len(audio_path) / 16000 if isinstance(audio_path, np.ndarray) else None
         }
     
     def get_words_with_timestamps(self, transcription: Dict) -> List[Dict]:
@@ -163,20 +237,47 @@ class Transcriber:
         Trích xuất tất cả các từ với timestamps từ transcription
         
         Returns:
-            List of {word, start, end}
+            List of {word, start, end, probability}
         """
-        words = []
-        
-        for segment in transcription['segments']:
-            if 'words' in segment:
-                for word_info in segment['words']:
-                    words.append({
-                        'word': word_info['word'].strip(),
+        return list(iter_words(transcription))
+
+
+def iter_words(transcription: Union[Dict, Iterable[Dict]]) -> Iterator[Dict]:
+    """
+    Duyệt lần lượt các từ với timestamps
+    
+    Args:
+        transcription: Kết quả Transcriber.transcribe, hoặc iterable các
+            segment dict (ví dụ Transcriber.transcribe_stream)
+    
+    Yields:
+        {word, start, end, probability}. Segment không có word timestamps
+        được chia đều thời gian cho các từ.
+    """
+    segments = transcription['segments'] if isinstance(transcription, dict) else transcription
+    
+    for segment in segments:
+        if 'words' in segment:
+            for word_info in segment['words']:
+                word = word_info['word'].strip()
+                if word:
+                    yield {
+                        'word': word,
                         'start': word_info['start'],
-                        'end': word_info['end']
-                    })
-        
-        return words
+                        'end': word_info['end'],
+                        'probability': word_info.get('probability')
+                    }
+        else:
+            words = segment['text'].split()
+            word_duration = (segment['end'] - segment['start']) / len(words) if words else 0
+            
+            for i, word in enumerate(words):
+                yield {
+                    'word': word,
+                    'start': segment['start'] + i * word_duration,
+                    'end': segment['start'] + (i + 1) * word_duration,
+                    'probability': None
+                }
 
 
 def test_transcriber():
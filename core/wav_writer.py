@@ -0,0 +1,191 @@
+"""
+WAV Writer
+Ghi segment WAV (PCM 16-bit) trực tiếp từ NumPy buffer, không qua pydub/ffmpeg.
+WavFileWriter ghi file dài theo từng block khi chưa biết trước độ dài.
+
+WavWriteQueue cho phép ghi nền (write-behind): thread cắt segment chỉ đẩy
+buffer vào hàng đợi giới hạn kích thước, một thread riêng ghi xuống đĩa.
+Hữu ích khi output nằm trên network filesystem hoặc đĩa chậm.
+"""
+
+import queue
+import struct
+import threading
+from typing import Optional
+
+import numpy as np
+
+from .audio_reader import to_int16
+from .tracing import span
+
+
+# RIFF header cho PCM: RIFF <size> WAVE, chunk fmt (16 byte), chunk data
+_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+_WAVE_FORMAT_PCM = 0x0001
+
+# Giá trị đánh dấu kết thúc hàng đợi
+_STOP = object()
+
+
+def _pack_header(channels: int, sample_rate: int, data_bytes: int) -> bytes:
+    block_align = 2 * channels
+    return _HEADER.pack(
+        b'RIFF', 36 + data_bytes, b'WAVE',
+        b'fmt ', 16, _WAVE_FORMAT_PCM, channels, sample_rate,
+        sample_rate * block_align, block_align, 16,
+        b'data', data_bytes
+    )
+
+
+def _pcm16(samples: np.ndarray) -> np.ndarray:
+    """int16/float [frames] hoặc [frames, channels] -> int16 little-endian liền mạch"""
+    if samples.dtype != np.int16:
+        samples = to_int16(samples)
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    return np.ascontiguousarray(samples, dtype='<i2')
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int):
+    """
+    Ghi samples ra file WAV PCM 16-bit
+
+    Args:
+        path: File output
+        samples: int16 hoặc float [-1, 1], dạng [frames] hoặc [frames, channels]
+        sample_rate: Sample rate (Hz)
+    """
+    data = _pcm16(samples)
+
+    with open(path, 'wb') as f:
+        f.write(_pack_header(data.shape[1], sample_rate, data.nbytes))
+        f.write(data)
+
+
+class WavFileWriter:
+    """
+    Ghi WAV PCM 16-bit theo từng block (độ dài chưa biết trước)
+
+    Header được ghi lại với kích thước thật khi close().
+
+    Usage:
+        with WavFileWriter('out.wav', 16000) as writer:
+            for block in blocks:
+                writer.write(block)
+    """
+
+    def __init__(self, path: str, sample_rate: int, channels: int = 1):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames = 0
+        self._file = open(path, 'wb')
+        self._file.write(_pack_header(channels, sample_rate, 0))
+
+    def write(self, samples: np.ndarray):
+        data = _pcm16(samples)
+        if data.shape[1] != self.channels:
+            raise ValueError(f"Expected {self.channels} channel(s), got {data.shape[1]}")
+        self._file.write(data)
+        self.frames += len(data)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.seek(0)
+        self._file.write(_pack_header(self.channels, self.sample_rate, self.frames * 2 * self.channels))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class WavWriteQueue:
+    """
+    Ghi WAV qua hàng đợi nền có giới hạn
+
+    max_pending = 0: ghi đồng bộ ngay trong submit(). Khi hàng đợi đầy, submit()
+    chờ thread ghi (backpressure) nên memory giới hạn ở max_pending segment.
+    Lỗi ghi được raise lại ở lần submit()/close() kế tiếp.
+
+    Usage:
+        with WavWriteQueue(max_pending=32) as writer:
+            for path, samples in segments:
+                writer.submit(path, samples, 16000)
+    """
+
+    def __init__(self, max_pending: int = 0):
+        self.max_pending = max_pending
+        self.written = 0
+        self._error: Optional[BaseException] = None
+        self._queue = None
+        self._thread = None
+
+        if max_pending > 0:
+            self._queue = queue.Queue(maxsize=max_pending)
+            self._thread = threading.Thread(target=self._run, name='wav-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            if self._error is None:
+                try:
+                    self._write(*item)
+                except BaseException as e:
+                    self._error = e
+
+    def _write(self, path: str, samples: np.ndarray, sample_rate: int):
+        with span('encode_write', cat='segment'):
+            write_wav(path, samples, sample_rate)
+        self.written += 1
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError(f"Failed to write WAV segment: {self._error}") from self._error
+
+    def submit(self, path: str, samples: np.ndarray, sample_rate: int):
+        """Ghi (hoặc xếp hàng ghi) một segment"""
+        self._raise_error()
+        if self._queue is None:
+            self._write(path, samples, sample_rate)
+        else:
+            self._queue.put((path, samples, sample_rate))
+
+    def close(self):
+        """Chờ ghi hết các segment đang chờ"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def test_wav_writer():
+    """Test function"""
+    import soundfile as sf
+
+    t = np.arange(16000) / 16000
+    tone = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+    with WavWriteQueue(max_pending=4) as writer:
+        for i in range(8):
+            writer.submit(f"wav_writer_test_{i}.wav", tone, 16000)
+
+    data, sr = sf.read("wav_writer_test_0.wav", dtype='float32')
+    print(f"{writer.written} files, {sr}Hz, max error {np.abs(data - tone).max():.5f}")
+
+
+if __name__ == "__main__":
+    test_wav_writer()
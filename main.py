@@ -8,7 +8,8 @@ import sys
 from pathlib import Path
 
 from config import AppConfig, WhisperConfig, AudioConfig, ProcessConfig, PathConfig
-from processor import AudioProcessor
+from processor import AudioProcessor, load_processing_stats
+from core.tracing import span, start_tracing, stop_tracing
 
 
 def setup_logging(verbose: bool = False, log_file: str = None):
@@ -71,6 +72,9 @@ Examples:
   
   # Custom segment duration
   python main.py --input sample.wav --min-duration 1.0 --max-duration 20.0
+  
+  # Chrome trace timeline of a batch run (open in ui.perfetto.dev)
+  python main.py --batch --input-dir ./audio_files --trace trace.json
         """
     )
     
@@ -113,6 +117,12 @@ Examples:
         default='base',
         help='Whisper model size (default: base)'
     )
+    parser.add_argument(
+        '--cascade-model',
+        type=str,
+        choices=['small', 'medium', 'large'],
+        help='Re-transcribe only low-confidence spans with this larger model (--model runs first)'
+    )
     parser.add_argument(
         '--device',
         type=str,
@@ -140,6 +150,18 @@ Examples:
         default=30.0,
         help='Maximum segment duration in seconds (default: 30.0)'
     )
+    parser.add_argument(
+        '--duration-buckets',
+        type=str,
+        help='Comma-separated duration buckets in seconds (e.g. 2,4,6,8,10) '
+             'to plan segment cuts for minimal training padding'
+    )
+    parser.add_argument(
+        '--audio-cache',
+        type=str,
+        metavar='DIR',
+        help='Cache normalized 16kHz mono audio in DIR and reuse it on later runs'
+    )
     parser.add_argument(
         '--format',
         type=str,
@@ -155,6 +177,43 @@ Examples:
         help='Prefix for output files (default: segment)'
     )
     
+    parser.add_argument(
+        '--schedule',
+        type=str,
+        choices=['longest', 'shortest', 'name'],
+        default='longest',
+        help='Batch order by audio duration (default: longest first)'
+    )
+    
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Batch: reprocess inputs already processed with the same settings'
+    )
+    parser.add_argument(
+        '--no-dedup',
+        action='store_true',
+        help='Process inputs with identical content separately (default: process once, link outputs)'
+    )
+    parser.add_argument(
+        '--dedup-segments',
+        choices=['drop', 'flag'],
+        help='Drop or flag segments repeated across/within files (intros, ads, jingles)'
+    )
+    
+    parser.add_argument(
+        '--profile-memory',
+        action='store_true',
+        help='Record peak memory and top allocators per stage (slow, writes memory_report.json)'
+    )
+    
+    parser.add_argument(
+        '--trace',
+        type=str,
+        metavar='PATH',
+        help='Write a Chrome trace-event JSON timeline of files/stages/segments to PATH'
+    )
+    
     # Logging
     parser.add_argument(
         '--verbose', '-v',
@@ -191,9 +250,8 @@ def main():
     if args.stats:
         logger.info(f"Loading statistics from: {args.stats}")
         
-        config = AppConfig()
-        processor = AudioProcessor(config)
-        stats = processor.get_processing_stats(args.stats)
+        # Không cần model để đọc manifest
+        stats = load_processing_stats(args.stats)
         
         if "error" in stats:
             logger.error(f"Error: {stats['error']}")
@@ -219,15 +277,26 @@ def main():
         whisper=WhisperConfig(
             model_size=args.model,
             device=args.device,
-            language=args.language
+            language=args.language,
+            cascade_model=args.cascade_model
         ),
         audio=AudioConfig(
             min_segment_duration=args.min_duration,
             max_segment_duration=args.max_duration,
-            format=args.format
+            format=args.format,
+            duration_buckets=(
+                [float(b) for b in args.duration_buckets.split(',')]
+                if args.duration_buckets else None
+            ),
+            cache_dir=Path(args.audio_cache) if args.audio_cache else None,
+            segment_dedup=args.dedup_segments
         ),
         process=ProcessConfig(
-            prefix=args.prefix
+            prefix=args.prefix,
+            profile_memory=args.profile_memory,
+            schedule=args.schedule,
+            overwrite=args.force,
+            dedup=not args.no_dedup
         ),
         paths=PathConfig(
             input_dir=Path(args.input_dir),
@@ -236,9 +305,13 @@ def main():
         verbose=args.verbose
     )
     
+    if args.trace:
+        start_tracing()
+    
     # Create processor
     logger.info("Initializing Audio Processor...")
-    processor = AudioProcessor(config)
+    with span('load_model'):
+        processor = AudioProcessor(config)
     
     try:
         if args.batch:
@@ -292,6 +365,11 @@ def main():
     except Exception as e:
         logger.error(f"Error during processing: {e}", exc_info=True)
         sys.exit(1)
+    
+    finally:
+        if args.trace:
+            stop_tracing(args.trace)
+            logger.info(f"Trace written to: {args.trace}")
 
 
 if __name__ == "__main__":
@@ -2,15 +2,81 @@
 Audio Processor - Module chính điều phối toàn bộ workflow
 """
 
+from contextlib import nullcontext
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
 import logging
 import json
 from datetime import datetime
 
+import numpy as np
+
 from config import AppConfig
 from transcriber import AudioTranscriber, TranscriptSegment
 from segmenter import AudioSegmenter
+from core.audio_cache import AudioCache, read_normalized
+from core.audio_io import load_audio
+from core.audio_reader import AudioReader
+from core.batch_pipeline import BatchPipeline, PipelineStage, format_pipeline_stats
+from core.scheduler import EtaEstimator, format_eta, order_files, probe_durations
+from core.probe_index import ProbeIndex
+from core.ledger import ProcessedLedger, config_fingerprint
+from core.dedup import duplicate_result, find_duplicates, savings_report
+from core.segment_dedup import SegmentDeduper
+from core.metrics import StageTimer, aggregate_timings, format_timing_table
+from core.memprofile import MemoryProfiler, find_scaling_stages
+from core.tracing import span
+
+
+def load_processing_stats(output_dir: str) -> dict:
+    """
+    Tính toán thống kê từ một output directory
+    
+    Chỉ đọc manifest.json nên không cần load model - dùng được mà không
+    khởi tạo AudioProcessor.
+    
+    Args:
+        output_dir: Thư mục chứa kết quả đã xử lý
+    
+    Returns:
+        Dictionary chứa thống kê
+    """
+    output_dir = Path(output_dir)
+    
+    if not output_dir.exists():
+        return {"error": "Directory not found"}
+    
+    # Load manifest
+    manifest_path = output_dir / "manifest.json"
+    if not manifest_path.exists():
+        return {"error": "Manifest not found"}
+    
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    
+    segments = manifest["segments"]
+    
+    stats = {
+        "total_segments": len(segments),
+        "total_duration": manifest["total_duration"],
+        "avg_segment_duration": manifest["total_duration"] / len(segments) if segments else 0,
+        "shortest_segment": min(s["duration"] for s in segments) if segments else 0,
+        "longest_segment": max(s["duration"] for s in segments) if segments else 0,
+        "total_words": sum(len(s["text"].split()) for s in segments),
+        "avg_words_per_segment": sum(len(s["text"].split()) for s in segments) / len(segments) if segments else 0
+    }
+    
+    return stats
+
+
+class SegmentSample(NamedTuple):
+    """Một segment trong memory, do AudioProcessor.iter_segments trả về"""
+    samples: np.ndarray          # float32 mono, [-1, 1]
+    sample_rate: int
+    text: str
+    start: float                 # Thời gian trong file gốc (giây, chưa tính padding)
+    end: float
+    confidence: Optional[float]  # None nếu transcriber không cho xác suất
 
 
 class AudioProcessor:
@@ -19,12 +85,14 @@ class AudioProcessor:
     Audio → Transcribe → Segment → Export
     """
     
-    def __init__(self, config: AppConfig):
+    def __init__(self, config: AppConfig, transcriber: Optional[AudioTranscriber] = None):
         """
         Khởi tạo processor với configuration
         
         Args:
             config: AppConfig object
+            transcriber: Transcriber đã tạo sẵn (vd. StubTranscriber), None = load
+                Whisper theo config.whisper
         """
         self.config = config
         self.logger = logging.getLogger(__name__)
@@ -33,15 +101,34 @@ class AudioProcessor:
         self.config.paths.create_directories()
         
         # Khởi tạo các sub-components
-        self.transcriber = AudioTranscriber(self.config.whisper)
-        self.segmenter = AudioSegmenter(self.config.audio)
+        self.transcriber = transcriber or AudioTranscriber(self.config.whisper)
+        
+        # Cache audio 16kHz mono: decode + resample mỗi file input một lần
+        self.audio_cache = None
+        if self.config.audio.cache_dir:
+            self.audio_cache = AudioCache(
+                self.config.audio.cache_dir,
+                max_size_mb=self.config.audio.cache_max_mb,
+                sample_rate=self.config.audio.sample_rate,
+                block_seconds=self.config.audio.read_block_seconds
+            )
+        
+        self.segmenter = AudioSegmenter(self.config.audio, audio_cache=self.audio_cache)
+        
+        # Duration/format của input đọc từ header, persist giữa các lần chạy
+        self.probe_index = ProbeIndex(
+            self.config.process.probe_index or self.config.paths.temp_dir / "probe_index.json",
+            workers=self.config.process.probe_workers
+        )
         
         self.logger.info("AudioProcessor initialized")
     
     def process_single_file(
         self, 
         audio_path: str,
-        output_dir: Optional[str] = None
+        output_dir: Optional[str] = None,
+        model_lock=None,
+        on_stage: Optional[Callable[[str], None]] = None
     ) -> dict:
         """
         Xử lý một file audio duy nhất
@@ -49,6 +136,10 @@ class AudioProcessor:
         Args:
             audio_path: Đường dẫn tới file audio input
             output_dir: Thư mục output (nếu None, dùng config default)
+            model_lock: Lock giữ trong lúc transcribe khi nhiều thread dùng chung
+                processor (model chỉ chạy một file mỗi lúc, decode/export chồng lấn)
+            on_stage: Callback nhận tên stage ('prepare', 'transcribe', 'export')
+                khi bắt đầu stage đó
         
         Returns:
             Dictionary chứa kết quả và metadata
@@ -78,18 +169,152 @@ class AudioProcessor:
         self.logger.info(f"Output dir: {output_dir}")
         self.logger.info(f"{'='*60}\n")
         
-        # Step 1: Transcribe
+        profiler = MemoryProfiler() if self.config.process.profile_memory else None
+        try:
+            with span('file', cat='file', file=audio_path.name):
+                return self._process_file(
+                    audio_path, output_dir, StageTimer(profiler=profiler), model_lock, on_stage
+                )
+        finally:
+            if profiler is not None:
+                profiler.stop()
+    
+    def iter_segments(self, audio_path: str, model_lock=None) -> Iterator[SegmentSample]:
+        """
+        Transcribe rồi cắt từng segment trong memory, không ghi file nào
+        
+        Dùng để đưa segment thẳng vào pipeline dữ liệu thay vì export rồi đọc
+        lại. Audio được cắt bằng một lần đọc tuần tự theo block: ngoài lúc
+        transcribe, memory chỉ giữ một block và segment đang yield. Cắt giống
+        export_segments (padding keep_silence, mono, config.audio.sample_rate).
+        
+        Args:
+            audio_path: Đường dẫn file audio
+            model_lock: Như process_single_file
+        
+        Yields:
+            SegmentSample(samples, sample_rate, text, start, end, confidence)
+        
+        Usage:
+            for samples, sr, text, start, end, confidence in processor.iter_segments('a.wav'):
+                dataset.add(samples, sr, text)
+        """
+        audio_path = Path(audio_path)
+        if not audio_path.exists():
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        
+        timer = StageTimer()
+        with span('file', cat='file', file=audio_path.name):
+            audio, source_path = self._prepare_audio(audio_path, timer, decode=model_lock is not None)
+            with model_lock or nullcontext():
+                segments, _ = self._transcribe(audio, timer)
+            audio = None
+        
+        with AudioReader(source_path, block_seconds=self.config.audio.read_block_seconds) as reader:
+            for index, samples in self.segmenter.iter_segment_samples(reader, segments):
+                seg = segments[index]
+                yield SegmentSample(
+                    samples=samples,
+                    sample_rate=self.config.audio.sample_rate,
+                    text=seg.text,
+                    start=seg.start,
+                    end=seg.end,
+                    confidence=seg.confidence
+                )
+    
+    def _process_file(
+        self,
+        audio_path: Path,
+        output_dir: Path,
+        timer: StageTimer,
+        model_lock=None,
+        on_stage: Optional[Callable[[str], None]] = None
+    ) -> dict:
+        """Các bước xử lý của process_single_file, đo theo stage bằng timer"""
+        notify = on_stage or (lambda stage: None)
+        
+        notify('prepare')
+        # Có model_lock: decode sẵn ngoài lock để thread khác không phải chờ
+        audio, source_path = self._prepare_audio(audio_path, timer, decode=model_lock is not None)
+        
+        notify('transcribe')
+        with model_lock or nullcontext():
+            segments, reports = self._transcribe(audio, timer)
+        # Không giữ cả file audio trong memory khi cắt segment
+        audio = None
+        
+        notify('export')
+        return self._export(audio_path, source_path, output_dir, segments, reports, timer)
+    
+    def _prepare_audio(self, audio_path: Path, timer: StageTimer, decode: bool = False):
+        """
+        Audio cho transcriber và file nguồn để cắt segment
+        
+        decode=True decode sẵn file gốc thành array khi không có cache (batch
+        pipeline: decode chạy ngoài thread của model).
+        
+        Returns:
+            (np.ndarray hoặc đường dẫn, đường dẫn file nguồn để cắt)
+        """
+        # Segmenter luôn xuất mono ở sample rate của config nên cắt thẳng từ cache
+        source_path = str(audio_path)
+        audio = source_path
+        if self.audio_cache is not None:
+            with timer.stage('normalize'):
+                source_path = self.audio_cache.get(str(audio_path))
+            with timer.stage('load_audio'):
+                audio = read_normalized(source_path)
+        elif decode:
+            with timer.stage('load_audio'):
+                audio = load_audio(source_path)
+        
+        return audio, source_path
+    
+    def _transcribe(self, audio, timer: StageTimer):
+        """
+        Transcribe thành câu (hoặc theo duration buckets)
+        
+        Returns:
+            (segments, reports) - reports gồm segment_plan / cascade (nếu bật),
+            được ghi vào metadata
+        """
         self.logger.info("Step 1/4: Transcribing audio...")
-        segments = self.transcriber.transcribe_to_sentences(
-            str(audio_path),
-            min_duration=self.config.audio.min_segment_duration,
-            max_duration=self.config.audio.max_segment_duration
-        )
+        plan_report = None
+        with timer.stage('transcribe'):
+            if self.config.audio.duration_buckets:
+                segments, plan_report = self.transcriber.transcribe_to_buckets(
+                    audio,
+                    self._build_planner()
+                )
+            else:
+                segments = self.transcriber.transcribe_to_sentences(
+                    audio,
+                    min_duration=self.config.audio.min_segment_duration,
+                    max_duration=self.config.audio.max_segment_duration
+                )
         
+        reports = {}
+        if plan_report:
+            reports["segment_plan"] = plan_report
+        if self.transcriber.cascade_report:
+            reports["cascade"] = self.transcriber.cascade_report
+        return segments, reports
+    
+    def _export(
+        self,
+        audio_path: Path,
+        source_path: str,
+        output_dir: Path,
+        segments: List[TranscriptSegment],
+        reports: Optional[dict],
+        timer: StageTimer
+    ) -> dict:
+        """Lưu transcript, cắt + export segment, ghi manifest và metadata"""
         if not segments:
-            self.logger.warning("No speech detected in audio")
+            self.logger.warning(f"No speech detected in {audio_path.name}")
             return {
                 "status": "failed",
+                "input_file": str(audio_path),
                 "reason": "No speech detected",
                 "segments": 0
             }
@@ -99,23 +324,35 @@ class AudioProcessor:
         transcript_path = output_dir / "full_transcript.txt"
         transcript_json_path = output_dir / "full_transcript.json"
         
-        self.transcriber.save_transcript(segments, str(transcript_path))
-        self.transcriber.save_transcript_json(segments, str(transcript_json_path))
+        with timer.stage('save_transcript'):
+            self.transcriber.save_transcript(segments, str(transcript_path))
+            self.transcriber.save_transcript_json(segments, str(transcript_json_path))
         
-        # Step 3: Segment and export audio
+        # Step 3: Segment and export audio (segmenter tự đo decode/cut/export)
         self.logger.info("Step 3/4: Segmenting and exporting audio...")
-        exported_files = self.segmenter.export_segments(
-            audio_path=str(audio_path),
-            segments=segments,
-            output_dir=str(output_dir),
-            prefix=self.config.process.prefix,
-            padding=self.config.process.padding
-        )
+        dedup = self._segment_deduper()
+        try:
+            exported_files = self.segmenter.export_segments(
+                audio_path=source_path,
+                segments=segments,
+                output_dir=str(output_dir),
+                prefix=self.config.process.prefix,
+                padding=self.config.process.padding,
+                timer=timer,
+                dedup=dedup,
+                source=str(audio_path)
+            )
+        finally:
+            if dedup is not None:
+                dedup.close()
+        
+        timing = timer.summary(num_segments=len(exported_files))
         
         # Step 4: Create manifest
         self.logger.info("Step 4/4: Creating manifest...")
         manifest_path = output_dir / "manifest.json"
-        self.segmenter.export_manifest(exported_files, str(manifest_path))
+        with timer.stage('manifest'):
+            self.segmenter.export_manifest(exported_files, str(manifest_path), timing=timing)
         
         # Create processing metadata
         metadata = {
@@ -132,6 +369,30 @@ class AudioProcessor:
             }
         }
         
+        metadata.update(reports or {})
+        
+        if dedup is not None:
+            metadata["segment_dedup"] = dedup.report()
+            self.logger.info(
+                f"  - Repeated segments: {dedup.repeats}/{dedup.checked} "
+                f"({dedup.action}: {dedup.over_limit})"
+            )
+        
+        metadata["timing"] = timer.summary(num_segments=len(exported_files))
+        
+        if timer.profiler is not None:
+            memory_report = timer.profiler.write_report(
+                str(output_dir / "memory_report.json"),
+                audio_duration=metadata["timing"]["audio_duration"] or metadata["total_duration"],
+                input_file=str(audio_path)
+            )
+            metadata["memory"] = memory_report
+            self.logger.info(f"  - Peak RSS: {memory_report['peak_rss_mb']} MB")
+            if memory_report["scaling_stages"]:
+                self.logger.warning(
+                    f"Memory scales with duration: {', '.join(memory_report['scaling_stages'])}"
+                )
+        
         # Save metadata
         metadata_path = output_dir / "metadata.json"
         with open(metadata_path, 'w') as f:
@@ -141,11 +402,27 @@ class AudioProcessor:
         self.logger.info(f"✓ Processing complete!")
         self.logger.info(f"  - Segments: {len(segments)}")
         self.logger.info(f"  - Duration: {segments[-1].end:.2f}s")
+        if timing["real_time_factor"] is not None:
+            self.logger.info(
+                f"  - Time: {timing['total_wall']:.2f}s (RTF {timing['real_time_factor']:.3f})"
+            )
         self.logger.info(f"  - Output: {output_dir}")
         self.logger.info(f"{'='*60}\n")
         
         return metadata
     
+    def _build_planner(self):
+        """Tạo SegmentPlanner từ AudioConfig"""
+        from core.segment_planner import SegmentPlanner
+        
+        return SegmentPlanner(
+            buckets=self.config.audio.duration_buckets,
+            min_duration=self.config.audio.min_segment_duration,
+            max_duration=self.config.audio.max_segment_duration,
+            max_gap=self.config.audio.max_merge_gap,
+            padding=2 * self.config.audio.keep_silence / 1000
+        )
+    
     def process_batch(
         self,
         input_dir: Optional[str] = None,
@@ -185,9 +462,214 @@ class AudioProcessor:
             self.logger.warning(f"No audio files found in {input_dir}")
             return []
         
-        self.logger.info(f"Found {len(audio_files)} audio files to process")
+        total_files = len(audio_files)
+        
+        # Bỏ qua input đã xử lý vào output_dir với cùng nội dung và cùng setting
+        ledger = ProcessedLedger(output_dir, self.output_fingerprint())
+        skipped, relocated = [], []
+        if not self.config.process.overwrite:
+            audio_files, skipped, relocated = self._skip_processed(audio_files, ledger)
+            if skipped:
+                self.logger.info(
+                    f"Skipping {len(skipped)} already processed files "
+                    f"(unchanged input and settings, --force to redo)"
+                )
+        
+        # Cùng nội dung (bản copy ở tên khác) chỉ xử lý một lần
+        duplicates = {}
+        if self.config.process.dedup:
+            audio_files, duplicates = find_duplicates(audio_files, full_digest=ledger.content_key)
+            ledger.save()
+            if duplicates:
+                self.logger.info(
+                    f"Skipping {sum(len(d) for d in duplicates.values())} duplicates "
+                    f"of other inputs (same content)"
+                )
+        
+        # Thứ tự theo độ dài (đọc từ header) và ETA theo RTF đo được
+        policy = self.config.process.schedule
+        self.probe_index.probe_all(audio_files)
+        durations = probe_durations(audio_files, probe=self.probe_index.get)
+        audio_files = order_files(audio_files, policy, durations)
+        eta = EtaEstimator(durations.values())
+        
+        self.logger.info(
+            f"Found {total_files} audio files, {len(audio_files)} to process "
+            f"({eta.total_audio / 3600:.2f}h audio, {policy} first)"
+        )
         
-        # Process each file
+        pipeline_stats = None
+        try:
+            # tracemalloc đo toàn process: profile memory chạy tuần tự để số đo đúng từng file
+            if self.config.process.pipeline and not self.config.process.profile_memory:
+                results, pipeline_stats = self._process_pipeline(
+                    audio_files, output_dir, eta, durations, ledger
+                )
+            else:
+                results = self._process_sequential(audio_files, output_dir, eta, durations, ledger)
+        finally:
+            # Ghi các record còn trong lô cuối
+            ledger.save()
+        
+        # Output của bản trùng: hardlink (hoặc tham chiếu) tới output của bản gốc
+        by_input = {r.get("input_file"): r for r in results}
+        duplicate_results = [
+            duplicate_result(dup, source, by_input.get(str(source), {}), output_dir / dup.stem)
+            for source, dups in duplicates.items()
+            for dup in dups
+        ]
+        
+        # Bản copy/đổi tên của input đã xử lý ở lần chạy trước: output gốc lấy từ ledger
+        saved_duplicates = {source: list(dups) for source, dups in duplicates.items()}
+        for dup, entry in relocated:
+            result = duplicate_result(
+                dup, entry["input_file"], {**entry, "status": "success"}, output_dir / dup.stem
+            )
+            duplicate_results.append(result)
+            # 'same': dùng chung output đã có, không tiết kiệm thêm gì
+            if result.get("link") != "same":
+                saved_duplicates.setdefault(entry["input_file"], []).append(dup)
+        
+        # Lần chạy sau bản trùng được báo skipped, không link và tính tiết kiệm lại
+        for result in duplicate_results:
+            if result["status"] == "duplicate":
+                ledger.record_copy(result["input_file"], result)
+        ledger.save()
+        if relocated:
+            self.logger.info(
+                f"Linked {len(relocated)} copies of previously processed inputs (same content)"
+            )
+        results += duplicate_results
+        
+        timing_summary = aggregate_timings(
+            [r["timing"] for r in results if r["status"] == "success" and "timing" in r]
+        )
+        
+        summary = {
+            "total_files": total_files,
+            "successful": sum(1 for r in results if r["status"] == "success"),
+            "failed": sum(1 for r in results if r["status"] == "failed"),
+            "skipped": len(skipped),
+            "duplicates": sum(1 for r in results if r["status"] == "duplicate"),
+            "timing": timing_summary,
+            "results": results + skipped,
+            "processed_at": datetime.now().isoformat(),
+            "schedule": {"policy": policy, **eta.summary()}
+        }
+        if saved_duplicates:
+            dup_durations = probe_durations([dup for dup, _ in relocated])
+            summary["dedup"] = savings_report(saved_duplicates, {**durations, **dup_durations}, eta.rtf)
+        if pipeline_stats is not None:
+            summary["pipeline"] = pipeline_stats
+        
+        memory_reports = [r["memory"] for r in results if "memory" in r]
+        if memory_reports:
+            summary["memory_scaling_stages"] = find_scaling_stages(memory_reports)
+        
+        # Save batch summary
+        summary_path = output_dir / "batch_summary.json"
+        with open(summary_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        
+        self.logger.info(f"\n{'='*60}")
+        self.logger.info(f"Batch processing complete!")
+        self.logger.info(f"  - Total files: {total_files}")
+        self.logger.info(f"  - Successful: {sum(1 for r in results if r['status'] == 'success')}")
+        self.logger.info(f"  - Failed: {sum(1 for r in results if r['status'] == 'failed')}")
+        self.logger.info(f"  - Skipped (already processed): {len(skipped)}")
+        if saved_duplicates:
+            saved = summary["dedup"]
+            self.logger.info(
+                f"  - Duplicates (linked, not reprocessed): {summary['duplicates']} "
+                f"(saved {saved['audio_hours_saved']:.2f}h audio, "
+                f"~{saved['compute_hours_saved'] or 0:.2f}h compute)"
+            )
+        self.logger.info(f"  - Summary: {summary_path}")
+        self.logger.info(f"{'='*60}\n")
+        
+        if timing_summary["files"]:
+            self.logger.info("Stage timing:\n" + format_timing_table(timing_summary))
+        if pipeline_stats is not None:
+            self.logger.info("Pipeline:\n" + format_pipeline_stats(pipeline_stats))
+        
+        for name, fit in summary.get("memory_scaling_stages", {}).items():
+            self.logger.warning(
+                f"Memory of '{name}' scales with duration: {fit['slope_mb_per_hour']} MB per audio hour"
+            )
+        
+        return results + skipped
+    
+    def output_fingerprint(self) -> str:
+        """Fingerprint các setting quyết định output (không gồm tùy chọn tốc độ/cache)"""
+        return config_fingerprint({
+            "whisper": self.config.whisper.model_dump(),
+            "audio": self.config.audio.model_dump(exclude={
+                "read_block_seconds", "cut_backend", "write_queue_size",
+                "cache_dir", "cache_max_mb", "segment_index"
+            }),
+            "process": self.config.process.model_dump(include={
+                "output_format", "prefix", "padding"
+            })
+        })
+    
+    def _segment_deduper(self) -> Optional[SegmentDeduper]:
+        """Deduper segment lặp cho một file (None nếu tắt); mỗi file một connection index"""
+        audio = self.config.audio
+        if not audio.segment_dedup:
+            return None
+        return SegmentDeduper(
+            audio.segment_index or self.config.paths.temp_dir / "segment_index.sqlite",
+            max_repeats=audio.max_segment_repeats,
+            action=audio.segment_dedup
+        )
+    
+    def _skip_processed(self, audio_files: List[Path], ledger: ProcessedLedger):
+        """
+        Tách các file đã có trong ledger
+        
+        File cùng nội dung với một input đã xử lý ở path khác (bản copy, đổi
+        tên) không bị bỏ qua mà được trả về riêng để tạo output bằng link.
+        
+        Returns:
+            (file cần xử lý, list kết quả status 'skipped' của file đã xử lý,
+             list (file, entry ledger của input gốc) cho bản copy/đổi tên)
+        """
+        pending, skipped, relocated = [], [], []
+        for audio_file in audio_files:
+            entry = ledger.lookup(str(audio_file))
+            if entry is None:
+                pending.append(audio_file)
+            elif Path(entry["input_file"]).resolve() != audio_file.resolve():
+                relocated.append((audio_file, entry))
+            else:
+                skipped.append({
+                    "status": "skipped",
+                    "input_file": str(audio_file),
+                    "output_dir": entry["output_dir"],
+                    "total_segments": entry["total_segments"],
+                    "processed_at": entry["processed_at"]
+                })
+        # Lưu hash nội dung vừa tính để lần sau tra O(1)
+        ledger.save()
+        return pending, skipped, relocated
+    
+    def _log_eta(self, eta: EtaEstimator):
+        info = eta.summary()
+        self.logger.info(
+            f"Progress: {info['files_done']} file(s), "
+            f"{info['audio_done'] / 60:.1f}/{info['audio_total'] / 60:.1f} min audio, "
+            f"ETA {format_eta(eta.remaining_seconds())}"
+        )
+    
+    def _process_sequential(
+        self,
+        audio_files: List[Path],
+        output_dir: Path,
+        eta: Optional[EtaEstimator] = None,
+        durations: Optional[Dict[str, float]] = None,
+        ledger: Optional[ProcessedLedger] = None
+    ) -> List[dict]:
+        """Xử lý lần lượt từng file"""
         results = []
         for idx, audio_file in enumerate(audio_files, 1):
             self.logger.info(f"\nProcessing file {idx}/{len(audio_files)}")
@@ -200,6 +682,8 @@ class AudioProcessor:
                     str(audio_file),
                     str(file_output_dir)
                 )
+                if ledger is not None and result["status"] == "success":
+                    ledger.record(str(audio_file), result)
                 results.append(result)
                 
             except Exception as e:
@@ -209,64 +693,102 @@ class AudioProcessor:
                     "input_file": str(audio_file),
                     "error": str(e)
                 })
-        
-        # Save batch summary
-        summary_path = output_dir / "batch_summary.json"
-        with open(summary_path, 'w') as f:
-            json.dump({
-                "total_files": len(audio_files),
-                "successful": sum(1 for r in results if r["status"] == "success"),
-                "failed": sum(1 for r in results if r["status"] == "failed"),
-                "results": results,
-                "processed_at": datetime.now().isoformat()
-            }, f, indent=2)
-        
-        self.logger.info(f"\n{'='*60}")
-        self.logger.info(f"Batch processing complete!")
-        self.logger.info(f"  - Total files: {len(audio_files)}")
-        self.logger.info(f"  - Successful: {sum(1 for r in results if r['status'] == 'success')}")
-        self.logger.info(f"  - Failed: {sum(1 for r in results if r['status'] == 'failed')}")
-        self.logger.info(f"  - Summary: {summary_path}")
-        self.logger.info(f"{'='*60}\n")
+            
+            if eta is not None:
+                eta.complete((durations or {}).get(str(audio_file), 0.0))
+                self._log_eta(eta)
         
         return results
     
-    def get_processing_stats(self, output_dir: str) -> dict:
+    def _process_pipeline(
+        self,
+        audio_files: List[Path],
+        output_dir: Path,
+        eta: Optional[EtaEstimator] = None,
+        durations: Optional[Dict[str, float]] = None,
+        ledger: Optional[ProcessedLedger] = None
+    ):
         """
-        Tính toán thống kê từ một output directory
+        Xử lý các file chồng lấn nhau qua BatchPipeline
         
-        Args:
-            output_dir: Thư mục chứa kết quả đã xử lý
+        prepare (normalize/decode) của file sau và export của file trước chạy
+        trong thread pool riêng trong lúc model transcribe file hiện tại; model
+        chỉ chạy trên một thread.
         
         Returns:
-            Dictionary chứa thống kê
+            (list metadata theo thứ tự audio_files, thống kê pipeline)
         """
-        output_dir = Path(output_dir)
+        io_workers = max(1, self.config.process.num_workers)
+        
+        def prepare(audio_file: Path) -> dict:
+            file_output_dir = output_dir / audio_file.stem
+            file_output_dir.mkdir(parents=True, exist_ok=True)
+            timer = StageTimer()
+            with span('file.prepare', cat='file', file=audio_file.name):
+                audio, source_path = self._prepare_audio(audio_file, timer, decode=True)
+            return {
+                "audio_path": audio_file,
+                "output_dir": file_output_dir,
+                "timer": timer,
+                "audio": audio,
+                "source_path": source_path
+            }
         
-        if not output_dir.exists():
-            return {"error": "Directory not found"}
+        def transcribe(job: dict) -> dict:
+            self.logger.info(f"Transcribing: {job['audio_path'].name}")
+            job["segments"], job["reports"] = self._transcribe(job.pop("audio"), job["timer"])
+            return job
         
-        # Load manifest
-        manifest_path = output_dir / "manifest.json"
-        if not manifest_path.exists():
-            return {"error": "Manifest not found"}
+        def export(job: dict) -> dict:
+            with span('file.export', cat='file', file=job["audio_path"].name):
+                result = self._export(
+                    job["audio_path"], job["source_path"], job["output_dir"],
+                    job["segments"], job["reports"], job["timer"]
+                )
+            if ledger is not None and result["status"] == "success":
+                ledger.record(str(job["audio_path"]), result)
+            if eta is not None:
+                eta.complete((durations or {}).get(str(job["audio_path"]), 0.0))
+                self._log_eta(eta)
+            return result
+        
+        pipeline = BatchPipeline([
+            PipelineStage("prepare", prepare, workers=io_workers),
+            PipelineStage("transcribe", transcribe),
+            PipelineStage("export", export, workers=io_workers),
+        ], queue_size=self.config.process.prefetch)
+        
+        self.logger.info(
+            f"Pipeline: {io_workers} I/O worker(s), prefetch {pipeline.queue_size}"
+        )
         
-        with open(manifest_path, 'r') as f:
-            manifest = json.load(f)
+        results = []
+        for item, audio_file in zip(pipeline.run(audio_files), audio_files):
+            if item.error is not None:
+                self.logger.error(
+                    f"Failed to process {audio_file.name} ({item.failed_stage}): {item.error}"
+                )
+                results.append({
+                    "status": "failed",
+                    "input_file": str(audio_file),
+                    "error": str(item.error)
+                })
+            else:
+                results.append(item.value)
         
-        segments = manifest["segments"]
+        return results, pipeline.stats()
+    
+    def get_processing_stats(self, output_dir: str) -> dict:
+        """
+        Tính toán thống kê từ một output directory
         
-        stats = {
-            "total_segments": len(segments),
-            "total_duration": manifest["total_duration"],
-            "avg_segment_duration": manifest["total_duration"] / len(segments) if segments else 0,
-            "shortest_segment": min(s["duration"] for s in segments) if segments else 0,
-            "longest_segment": max(s["duration"] for s in segments) if segments else 0,
-            "total_words": sum(len(s["text"].split()) for s in segments),
-            "avg_words_per_segment": sum(len(s["text"].split()) for s in segments) / len(segments) if segments else 0
-        }
+        Args:
+            output_dir: Thư mục chứa kết quả đã xử lý
         
-        return stats
+        Returns:
+            Dictionary chứa thống kê
+        """
+        return load_processing_stats(output_dir)
 
 
 # Example usage
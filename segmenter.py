@@ -2,15 +2,27 @@
 Audio Segmenter Module - Cắt audio file thành các đoạn nhỏ theo timestamp
 """
 
+from __future__ import annotations
+
 from pathlib import Path
-from typing import List, Tuple
+from typing import Iterator, List, Optional, Tuple, Dict, TYPE_CHECKING
 import logging
-from pydub import AudioSegment
-from pydub.silence import detect_silence
-import soundfile as sf
+
+import numpy as np
 
 from config import AudioConfig
 from transcriber import TranscriptSegment
+from core.audio_cache import AudioCache
+from core.audio_reader import AudioReader, detect_silence, to_int16
+from core.ffmpeg_cutter import cut_segments
+from core.resampler import resample
+from core.metrics import timed
+from core.segment_dedup import SegmentDeduper
+from core.tracing import span
+from core.wav_writer import WavWriteQueue
+
+if TYPE_CHECKING:
+    from pydub import AudioSegment
 
 
 class AudioSegmenter:
@@ -18,14 +30,17 @@ class AudioSegmenter:
     Class xử lý cắt audio file thành các đoạn nhỏ
     """
     
-    def __init__(self, config: AudioConfig):
+    def __init__(self, config: AudioConfig, audio_cache: Optional[AudioCache] = None):
         """
         Khởi tạo AudioSegmenter
         
         Args:
             config: AudioConfig object
+            audio_cache: AudioCache (optional) - phân tích silence trên file
+                16kHz mono đã chuẩn hóa thay vì decode lại file gốc
         """
         self.config = config
+        self.audio_cache = audio_cache
         self.logger = logging.getLogger(__name__)
     
     def load_audio(self, audio_path: str) -> AudioSegment:
@@ -46,6 +61,8 @@ class AudioSegmenter:
         
         self.logger.info(f"Loading audio: {audio_path.name}")
         
+        from pydub import AudioSegment
+        
         # Detect format từ extension
         format = audio_path.suffix[1:]  # Remove dot
         audio = AudioSegment.from_file(str(audio_path), format=format)
@@ -115,7 +132,10 @@ class AudioSegmenter:
         segments: List[TranscriptSegment],
         output_dir: str,
         prefix: str = "segment",
-        padding: int = 4
+        padding: int = 4,
+        timer=None,
+        dedup: Optional[SegmentDeduper] = None,
+        source: Optional[str] = None
     ) -> List[Dict]:
         """
         Export các audio segments ra file riêng biệt
@@ -126,6 +146,10 @@ class AudioSegmenter:
             output_dir: Thư mục output
             prefix: Tiền tố tên file
             padding: Số chữ số đệm (0001, 0002...)
+            timer: StageTimer (optional) - đo riêng decode, cut, export
+            dedup: SegmentDeduper (optional) - segment lặp quá max_repeats bị
+                bỏ trước khi ghi (drop) hoặc có repeat_of trong metadata (flag)
+            source: Tên input ghi vào index dedup (mặc định audio_path)
         
         Returns:
             List dict chứa thông tin các file đã export
@@ -138,56 +162,245 @@ class AudioSegmenter:
                 segment_0002.txt
                 ...
         """
-        # Load audio
-        audio = self.load_audio(audio_path)
-        
-        # Segment audio
-        segmented_audios = self.segment_audio(audio, segments)
-        
-        # Tạo output directory
-        output_dir = Path(output_dir)
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        exported_files = []
-        
-        for audio_seg, transcript_seg in segmented_audios:
-            # Tạo tên file
-            file_id = str(transcript_seg.id).zfill(padding)
-            audio_filename = f"{prefix}_{file_id}.{self.config.format}"
-            text_filename = f"{prefix}_{file_id}.txt"
+        # Mở reader: audio được stream theo block, không load cả file
+        with timed(timer, 'decode'):
+            reader = AudioReader(audio_path, block_seconds=self.config.read_block_seconds)
+        
+        # Đóng reader (và process ffmpeg của nó) cả khi lỗi / return sớm
+        with reader:
+            if timer is not None:
+                timer.audio_duration = reader.duration
+            
+            # Tạo output directory
+            output_dir = Path(output_dir)
+            output_dir.mkdir(parents=True, exist_ok=True)
+            
+            source = str(source or audio_path)
+            
+            if self._use_ffmpeg(reader):
+                repeats = {}
+                kept = segments
+                if dedup is not None:
+                    # ffmpeg encode thẳng ra file: fingerprint trước, chỉ cắt segment được giữ
+                    with timed(timer, 'dedup'):
+                        for index, samples in self.iter_segment_samples(reader, segments):
+                            repeat = self._check_repeat(
+                                dedup, to_int16(samples), segments[index], source
+                            )
+                            if repeat:
+                                repeats[segments[index].id] = repeat
+                    kept = [seg for seg in segments if dedup.keep(repeats.get(seg.id))]
+                
+                # Cắt + encode nhiều segment trong mỗi lệnh ffmpeg
+                with timed(timer, 'export'):
+                    exported_files = self._export_with_ffmpeg(
+                        audio_path, reader, kept, output_dir, prefix, padding
+                    ) if kept else []
+                for item in exported_files:
+                    item.update(repeats.get(item["id"], {}))
+                self.logger.info(
+                    f"Successfully exported {len(exported_files)} segments to {output_dir}"
+                )
+                return exported_files
             
-            audio_path_out = output_dir / audio_filename
-            text_path_out = output_dir / text_filename
+            # Cắt và ghi xen kẽ từng segment, đo riêng hai stage
+            exported = {}
+            segment_samples = self.iter_segment_samples(reader, segments)
+            writer = WavWriteQueue(self.config.write_queue_size)
+            try:
+                while True:
+                    with timed(timer, 'cut'):
+                        item = next(segment_samples, None)
+                        if item is None:
+                            break
+                        index, samples = item
+                        # int16 một lần, dùng chung cho dedup và WAV writer
+                        pcm = to_int16(samples)
+                    
+                    repeat = None
+                    if dedup is not None:
+                        with timed(timer, 'dedup'):
+                            repeat = self._check_repeat(dedup, pcm, segments[index], source)
+                        if not dedup.keep(repeat):
+                            continue
+                    
+                    with timed(timer, 'export'):
+                        exported[index] = self._write_segment(
+                            pcm, segments[index], output_dir, prefix, padding, writer
+                        )
+                    if repeat:
+                        exported[index].update(repeat)
+            finally:
+                # Chờ thread nền ghi xong các segment còn trong hàng đợi
+                with timed(timer, 'export'):
+                    writer.close()
             
-            # Export audio
-            audio_seg.export(
-                str(audio_path_out),
-                format=self.config.format,
-                parameters=["-ar", str(self.config.sample_rate)]
+            exported_files = [exported[i] for i in sorted(exported)]
+            
+            self.logger.info(
+                f"Successfully exported {len(exported_files)} segments to {output_dir}"
             )
             
-            # Export text
-            with open(text_path_out, 'w', encoding='utf-8') as f:
-                f.write(transcript_seg.text)
+            return exported_files
+    
+    def iter_segment_samples(
+        self,
+        reader: AudioReader,
+        segments: List[TranscriptSegment]
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Cắt các segment (có padding keep_silence) bằng một lần đọc tuần tự
+        
+        Memory giới hạn theo block của reader thay vì cả file. Mỗi segment được
+        chuyển về mono + sample rate của config.
+        
+        Yields:
+            (index trong segments, samples float32 mono)
+        """
+        padding = self.config.keep_silence / 1000
+        spans = [(max(0.0, seg.start - padding), seg.end + padding) for seg in segments]
+        
+        for index, samples in reader.extract(spans):
+            # Mono + resample bằng NumPy (windowed-sinc), không qua audioop
+            samples = resample(samples.mean(axis=1), reader.sample_rate, self.config.sample_rate)
             
-            # Lưu metadata
-            exported_files.append({
-                "id": transcript_seg.id,
-                "audio_file": audio_filename,
-                "text_file": text_filename,
-                "text": transcript_seg.text,
-                "start": transcript_seg.start,
-                "end": transcript_seg.end,
-                "duration": transcript_seg.duration
-            })
+            seg = segments[index]
+            self.logger.debug(
+                f"Segment {seg.id}: {seg.start:.2f}s - {seg.end:.2f}s "
+                f"({len(samples) / self.config.sample_rate:.2f}s)"
+            )
             
-            self.logger.debug(f"Exported: {audio_filename}")
+            yield index, samples
+    
+    def _check_repeat(
+        self,
+        dedup: SegmentDeduper,
+        pcm: np.ndarray,
+        transcript_seg: TranscriptSegment,
+        source: str
+    ) -> Optional[Dict]:
+        """Fingerprint một segment (int16 mono, sample rate của config) và tra index dedup"""
+        with span('fingerprint', cat='segment', index=transcript_seg.id):
+            return dedup.check(
+                pcm,
+                self.config.sample_rate,
+                source,
+                transcript_seg.start,
+                transcript_seg.end
+            )
+    
+    def _use_ffmpeg(self, reader: AudioReader) -> bool:
+        """
+        auto: cắt bằng ffmpeg multi-output khi input không seek được hoặc format
+        output cần encoder, thay vì một process ffmpeg cho mỗi segment
+        """
+        if self.config.cut_backend != 'auto':
+            return self.config.cut_backend == 'ffmpeg'
+        return not reader.seekable or self.config.format != 'wav'
+    
+    def _export_with_ffmpeg(
+        self,
+        audio_path: str,
+        reader: AudioReader,
+        segments: List[TranscriptSegment],
+        output_dir: Path,
+        prefix: str,
+        padding: int
+    ) -> List[Dict]:
+        """Export tất cả segment (mono, sample rate của config) bằng vài lệnh ffmpeg"""
+        keep_silence = self.config.keep_silence / 1000
         
-        self.logger.info(
-            f"Successfully exported {len(exported_files)} segments to {output_dir}"
+        jobs = []
+        for seg in segments:
+            audio_filename, _ = self._segment_filenames(seg, prefix, padding)
+            jobs.append((
+                max(0.0, seg.start - keep_silence),
+                min(reader.duration, seg.end + keep_silence),
+                str(output_dir / audio_filename)
+            ))
+        
+        commands = cut_segments(audio_path, jobs, self.config.sample_rate, 1)
+        self.logger.info(f"ffmpeg: {len(jobs)} segments in {commands} command(s)")
+        
+        return [
+            self._write_text(seg, output_dir, prefix, padding)
+            for seg in segments
+        ]
+    
+    def _segment_filenames(
+        self,
+        transcript_seg: TranscriptSegment,
+        prefix: str,
+        padding: int
+    ) -> Tuple[str, str]:
+        file_id = str(transcript_seg.id).zfill(padding)
+        return f"{prefix}_{file_id}.{self.config.format}", f"{prefix}_{file_id}.txt"
+    
+    def _write_segment(
+        self,
+        pcm: np.ndarray,
+        transcript_seg: TranscriptSegment,
+        output_dir: Path,
+        prefix: str,
+        padding: int,
+        writer: WavWriteQueue
+    ) -> Dict:
+        """Ghi audio + text của một segment, trả về metadata"""
+        # Tạo tên file
+        audio_filename, _ = self._segment_filenames(transcript_seg, prefix, padding)
+        audio_path_out = str(output_dir / audio_filename)
+        
+        # Export audio: WAV ghi thẳng từ buffer NumPy (đã ở sample rate của
+        # config), chỉ format nén mới qua pydub + ffmpeg
+        if self.config.format == 'wav':
+            writer.submit(audio_path_out, pcm, self.config.sample_rate)
+        else:
+            from pydub import AudioSegment
+            
+            audio_seg = AudioSegment(
+                data=pcm.tobytes(),
+                sample_width=2,
+                frame_rate=self.config.sample_rate,
+                channels=1
+            )
+            with span('encode_write', cat='segment', index=transcript_seg.id):
+                audio_seg.export(
+                    audio_path_out,
+                    format=self.config.format,
+                    parameters=["-ar", str(self.config.sample_rate)]
+                ).close()
+        
+        return self._write_text(transcript_seg, output_dir, prefix, padding)
+    
+    def _write_text(
+        self,
+        transcript_seg: TranscriptSegment,
+        output_dir: Path,
+        prefix: str,
+        padding: int
+    ) -> Dict:
+        """Ghi file text của một segment (audio đã ghi), trả về metadata"""
+        audio_filename, text_filename = self._segment_filenames(
+            transcript_seg, prefix, padding
         )
-        
-        return exported_files
+        text_path_out = output_dir / text_filename
+        
+        # Export text
+        with open(text_path_out, 'w', encoding='utf-8') as f:
+            f.write(transcript_seg.text)
+        
+        self.logger.debug(f"Exported: {audio_filename}")
+        
+        # Lưu metadata
+        return {
+            "id": transcript_seg.id,
+            "audio_file": audio_filename,
+            "text_file": text_filename,
+            "text": transcript_seg.text,
+            "start": transcript_seg.start,
+            "end": transcript_seg.end,
+            "duration": transcript_seg.duration
+        }
     
     def detect_silence_segments(self, audio_path: str) -> List[Tuple[float, float]]:
         """
@@ -200,20 +413,16 @@ class AudioSegmenter:
         Returns:
             List of (start, end) tuples in seconds
         """
-        audio = self.load_audio(audio_path)
-        
-        # Detect silence
-        silence_ranges = detect_silence(
-            audio,
-            min_silence_len=self.config.min_silence_len,
-            silence_thresh=self.config.silence_thresh
-        )
-        
-        # Convert từ milliseconds sang seconds
-        silence_ranges_sec = [
-            (start / 1000.0, end / 1000.0) 
-            for start, end in silence_ranges
-        ]
+        if self.audio_cache is not None:
+            audio_path = self.audio_cache.get(audio_path)
+        
+        # Phân tích theo từng block, không load cả file vào memory
+        with AudioReader(audio_path, block_seconds=self.config.read_block_seconds) as reader:
+            silence_ranges_sec = detect_silence(
+                reader,
+                min_silence_len=self.config.min_silence_len,
+                silence_thresh=self.config.silence_thresh
+            )
         
         self.logger.info(f"Detected {len(silence_ranges_sec)} silence segments")
         return silence_ranges_sec
@@ -221,7 +430,8 @@ class AudioSegmenter:
     def export_manifest(
         self,
         exported_files: List[Dict],
-        output_path: str
+        output_path: str,
+        timing: Dict = None
     ):
         """
         Tạo manifest file (JSON) chứa metadata của tất cả segments
@@ -229,6 +439,7 @@ class AudioSegmenter:
         Args:
             exported_files: List dict từ export_segments()
             output_path: Đường dẫn file manifest JSON
+            timing: Timing theo stage từ StageTimer.summary() (optional)
         
         Format manifest:
             {
@@ -250,6 +461,9 @@ class AudioSegmenter:
             "segments": exported_files
         }
         
+        if timing:
+            manifest["timing"] = timing
+        
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(manifest, f, indent=2, ensure_ascii=False)
         
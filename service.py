@@ -0,0 +1,594 @@
+"""
+Audio Service - Chạy AudioProcessor như một service HTTP local
+
+Model được load một lần lúc khởi động và giữ trong memory, nên mỗi file gửi
+tới không phải trả chi phí khởi động interpreter, import và load model. Job
+(đường dẫn file hoặc upload) vào một hàng đợi có giới hạn và được xử lý bởi
+N thread: decode/export của job này chồng lấn với transcribe của job khác,
+riêng bước transcribe dùng chung một model nên chạy lần lượt.
+
+API:
+    POST /jobs                  {"path": "/data/a.wav"} (JSON) hoặc body là file
+                                audio (?filename=a.mp3) - trả về 202 + job
+    GET  /jobs                  Danh sách job
+    GET  /jobs/<id>             Trạng thái job
+    GET  /jobs/<id>/events      Stream NDJSON: một dòng mỗi lần trạng thái đổi,
+                                dòng cuối có result + manifest
+    GET  /jobs/<id>/manifest    manifest.json của job đã xong
+    GET  /health                Trạng thái service
+
+Usage:
+    python service.py --output ./output
+    python service.py --output ./output --stub-transcriber   # không cần Whisper
+    curl -s localhost:8765/jobs -H 'Content-Type: application/json' -d '{"path": "/data/a.wav"}'
+    curl -s --data-binary @a.mp3 'localhost:8765/jobs?filename=a.mp3'
+    curl -sN localhost:8765/jobs/<id>/events
+"""
+
+import argparse
+import json
+import logging
+import queue
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from config import AppConfig
+from processor import AudioProcessor
+
+
+DEFAULT_PORT = 8765
+
+# Trạng thái job
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+# Số job đã xong giữ lại để tra cứu, job cũ hơn bị quên (output vẫn còn trên đĩa)
+MAX_FINISHED_JOBS = 1000
+
+# Upload được ghi ra đĩa theo chunk, không giữ cả file trong memory
+UPLOAD_CHUNK = 1 << 20
+
+# Stream events gửi lại trạng thái hiện tại nếu không có gì mới sau ngần này giây
+HEARTBEAT_SECONDS = 15.0
+
+
+class QueueFullError(Exception):
+    """Hàng đợi job đã đầy"""
+
+
+@dataclass
+class Job:
+    """Một file được gửi tới service"""
+    id: str
+    input_file: Path
+    output_dir: Path
+    upload: bool = False
+    status: str = QUEUED
+    stage: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    version: int = 0  # Tăng mỗi lần trạng thái đổi (cho stream events)
+
+    def to_dict(self) -> dict:
+        def iso(ts: Optional[float]) -> Optional[str]:
+            return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+        data = {
+            "id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "input_file": self.input_file.name if self.upload else str(self.input_file),
+            "output_dir": str(self.output_dir),
+            "submitted_at": iso(self.submitted_at),
+            "started_at": iso(self.started_at),
+            "finished_at": iso(self.finished_at),
+        }
+        if self.started_at:
+            data["wait_seconds"] = round(self.started_at - self.submitted_at, 3)
+        if self.finished_at:
+            data["run_seconds"] = round(self.finished_at - self.started_at, 3)
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class AudioService:
+    """
+    Hàng đợi job quanh một AudioProcessor (model đã load sẵn)
+
+    Usage:
+        service = AudioService(AudioProcessor(config), './output', concurrency=2)
+        service.start()
+        job = service.submit_path('/data/a.wav')
+        version, snapshot = service.wait(job.id, -1, timeout=60)
+    """
+
+    def __init__(
+        self,
+        processor: AudioProcessor,
+        output_dir: str,
+        upload_dir: Optional[str] = None,
+        concurrency: int = 1,
+        max_queue: int = 100,
+        max_upload_mb: float = 2048,
+        keep_uploads: bool = False
+    ):
+        """
+        Args:
+            processor: AudioProcessor (transcriber đã load)
+            output_dir: Output của mỗi job nằm trong <output_dir>/<tên file>-<job id>
+            upload_dir: Nơi lưu file upload, None = <temp_dir>/uploads
+            concurrency: Số job xử lý cùng lúc (transcribe vẫn lần lượt)
+            max_queue: Số job chờ tối đa, vượt quá thì từ chối (503)
+            max_upload_mb: Kích thước upload tối đa (MB)
+            keep_uploads: Giữ file upload sau khi xử lý xong
+        """
+        self.processor = processor
+        self.output_dir = Path(output_dir)
+        self.upload_dir = Path(upload_dir or processor.config.paths.temp_dir / "uploads")
+        self.concurrency = max(1, concurrency)
+        self.max_upload_bytes = int(max_upload_mb * 1024 * 1024)
+        self.keep_uploads = keep_uploads
+        self.logger = logging.getLogger(__name__)
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=max(1, max_queue))
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._changed = threading.Condition()
+        self._model_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self.started_at = time.time()
+
+    def start(self):
+        """Khởi động các thread xử lý job"""
+        for k in range(self.concurrency):
+            thread = threading.Thread(target=self._run_jobs, name=f"job-{k}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Dừng sau khi các job đang chạy xong; job còn trong hàng đợi bị hủy"""
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                self._finish(job, FAILED, error="Service stopped")
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    # ------------------------------------------------------------------ submit
+
+    def submit_path(self, path: str) -> Job:
+        """Thêm job cho một file có sẵn trên máy"""
+        input_file = Path(path).expanduser().resolve()
+        if not input_file.is_file():
+            raise FileNotFoundError(f"Audio file not found: {path}")
+        return self._submit(uuid.uuid4().hex[:12], input_file)
+
+    def submit_upload(self, stream, length: int, filename: str) -> Job:
+        """
+        Lưu file upload (đọc length byte từ stream) rồi thêm job
+
+        Raises:
+            QueueFullError: hàng đợi đầy (kiểm tra trước khi nhận file)
+            ValueError: tên file / kích thước không hợp lệ
+        """
+        name = Path(filename or "").name
+        if not name or name.startswith("."):
+            raise ValueError("Upload needs a filename (?filename=audio.mp3)")
+        if length <= 0:
+            raise ValueError("Empty upload")
+        if length > self.max_upload_bytes:
+            raise ValueError(f"Upload too large: {length} bytes (max {self.max_upload_bytes})")
+        if self._queue.full():
+            raise QueueFullError("Job queue is full")
+
+        job_id = uuid.uuid4().hex[:12]
+        upload_path = self.upload_dir / job_id / name
+        upload_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(upload_path, "wb") as f:
+                remaining = length
+                while remaining > 0:
+                    chunk = stream.read(min(UPLOAD_CHUNK, remaining))
+                    if not chunk:
+                        raise ValueError(f"Upload truncated: {length - remaining}/{length} bytes")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            return self._submit(job_id, upload_path, upload=True)
+        except BaseException:
+            shutil.rmtree(upload_path.parent, ignore_errors=True)
+            raise
+
+    def _submit(self, job_id: str, input_file: Path, upload: bool = False) -> Job:
+        job = Job(
+            id=job_id,
+            input_file=input_file,
+            output_dir=self.output_dir / f"{input_file.stem}-{job_id}",
+            upload=upload
+        )
+        with self._changed:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._changed:
+                del self._jobs[job.id]
+            raise QueueFullError("Job queue is full")
+
+        self.logger.info(f"Queued {job.id}: {input_file.name}")
+        return job
+
+    # ------------------------------------------------------------------ query
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Trạng thái job (None nếu không có)"""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job is not None else None
+
+    def list_jobs(self) -> List[dict]:
+        with self._changed:
+            return [self._snapshot(job) for job in self._jobs.values()]
+
+    def wait(self, job_id: str, version: int, timeout: float) -> Optional[Tuple[int, dict]]:
+        """
+        Chờ tới khi job có trạng thái khác version (hoặc hết timeout)
+
+        Returns:
+            (version, trạng thái job) hoặc None nếu không có job
+        """
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._changed.wait_for(lambda: job.version != version, timeout=timeout)
+            return job.version, self._snapshot(job)
+
+    def manifest(self, job_id: str) -> Optional[dict]:
+        """manifest.json của job (None nếu chưa có)"""
+        with self._changed:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        manifest_path = job.output_dir / "manifest.json"
+        if job.status != DONE or not manifest_path.exists():
+            return None
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def health(self) -> dict:
+        with self._changed:
+            counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {
+            "status": "ok",
+            "model": self.processor.config.whisper.model_size,
+            "transcriber": type(self.processor.transcriber).__name__,
+            "concurrency": self.concurrency,
+            "queue_capacity": self._queue.maxsize,
+            "jobs": counts,
+            "uptime_seconds": round(time.time() - self.started_at, 1)
+        }
+
+    def _snapshot(self, job: Job) -> dict:
+        data = job.to_dict()
+        if job.status == QUEUED:
+            data["position"] = sum(
+                1 for other in self._jobs.values()
+                if other.status == QUEUED and other.submitted_at < job.submitted_at
+            )
+        return data
+
+    # ------------------------------------------------------------------ run
+
+    def _update(self, job: Job, **changes):
+        with self._changed:
+            for key, value in changes.items():
+                setattr(job, key, value)
+            job.version += 1
+            self._changed.notify_all()
+
+    def _finish(self, job: Job, status: str, result: Optional[dict] = None, error: Optional[str] = None):
+        self._update(
+            job, status=status, stage=None, result=result, error=error, finished_at=time.time()
+        )
+        with self._changed:
+            finished = [k for k, j in self._jobs.items() if j.status in FINISHED]
+            for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self._jobs[job_id]
+
+    def _run_jobs(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._run(job)
+
+    def _run(self, job: Job):
+        self._update(job, status=RUNNING, started_at=time.time())
+        try:
+            job.output_dir.mkdir(parents=True, exist_ok=True)
+            result = self.processor.process_single_file(
+                str(job.input_file),
+                str(job.output_dir),
+                model_lock=self._model_lock,
+                on_stage=lambda stage: self._update(job, stage=stage)
+            )
+        except Exception as e:
+            self.logger.error(f"Job {job.id} failed: {e}")
+            self._finish(job, FAILED, error=str(e))
+        else:
+            success = result.get("status") == "success"
+            self._finish(
+                job, DONE if success else FAILED, result=result,
+                error=None if success else result.get("reason") or result.get("error")
+            )
+            self.logger.info(f"Job {job.id} {job.status} in {job.finished_at - job.started_at:.2f}s")
+        finally:
+            if job.upload and not self.keep_uploads:
+                shutil.rmtree(job.input_file.parent, ignore_errors=True)
+
+
+class ServiceServer:
+    """HTTP server cho AudioService"""
+
+    def __init__(self, service: AudioService, port: int = DEFAULT_PORT, host: str = "127.0.0.1"):
+        self.service = service
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(service))
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def start(self):
+        """Serve trong daemon thread (dùng khi nhúng service / test)"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _make_handler(service: AudioService):
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "AudioService/1.0"
+
+        def do_GET(self):
+            parts = [p for p in urlparse(self.path).path.split("/") if p]
+
+            if parts == ["health"]:
+                return self._json(200, service.health())
+            if parts == ["jobs"]:
+                return self._json(200, {"jobs": service.list_jobs()})
+            if len(parts) in (2, 3) and parts[0] == "jobs":
+                job = service.get(parts[1])
+                if job is None:
+                    return self._json(404, {"error": f"Unknown job: {parts[1]}"})
+                if len(parts) == 2:
+                    return self._json(200, job)
+                if parts[2] == "events":
+                    return self._stream_events(parts[1])
+                if parts[2] == "manifest":
+                    manifest = service.manifest(parts[1])
+                    if manifest is None:
+                        return self._json(409, {"error": f"Job is {job['status']}, no manifest"})
+                    return self._json(200, manifest)
+            self._json(404, {"error": "Not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if [p for p in url.path.split("/") if p] != ["jobs"]:
+                return self._json(404, {"error": "Not found"})
+
+            content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+            raw_length = self.headers.get("Content-Length", "").strip() or "0"
+            try:
+                if not raw_length.isdigit():
+                    raise ValueError("Invalid Content-Length")
+                length = int(raw_length)
+                if content_type == "application/json":
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                    path = body.get("path") if isinstance(body, dict) else None
+                    if not path or not isinstance(path, str):
+                        raise ValueError('JSON body must be an object with a "path" string')
+                    job = service.submit_path(path)
+                else:
+                    filename = (
+                        parse_qs(url.query).get("filename", [None])[0]
+                        or self.headers.get("X-Filename")
+                    )
+                    job = service.submit_upload(self.rfile, length, filename)
+            except QueueFullError as e:
+                return self._json(503, {"error": str(e)}, {"Retry-After": "5"})
+            except (ValueError, FileNotFoundError) as e:
+                return self._json(400, {"error": str(e)})
+
+            self._json(202, service.get(job.id), {"Location": f"/jobs/{job.id}"})
+
+        def _stream_events(self, job_id: str):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+
+            version = -1
+            try:
+                while True:
+                    update = service.wait(job_id, version, HEARTBEAT_SECONDS)
+                    if update is None:
+                        return
+                    version, job = update
+                    if job["status"] in FINISHED:
+                        job["manifest"] = service.manifest(job_id)
+                    self.wfile.write(_dumps(job) + b"\n")
+                    self.wfile.flush()
+                    if job["status"] in FINISHED:
+                        return
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+        def _json(self, code: int, data, headers: Optional[Dict[str, str]] = None):
+            body = _dumps(data)
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logging.getLogger(__name__).debug(format % args)
+
+    return Handler
+
+
+def _dumps(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def main():
+    """
+    Main entry point cho service
+    """
+    parser = argparse.ArgumentParser(
+        description='Audio Processor Service - local HTTP API with a warm model',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Example:
+  # Chạy service (model load một lần, giữ trong memory)
+  python service.py --output ./output --model base --port 8765
+
+  # Chạy thử không cần Whisper (transcriber giả)
+  python service.py --output ./output --stub-transcriber
+
+  # Gửi file có sẵn trên máy / upload file, rồi theo dõi tới khi xong
+  curl -s localhost:8765/jobs -H 'Content-Type: application/json' -d '{"path": "/data/a.wav"}'
+  curl -s --data-binary @a.mp3 'localhost:8765/jobs?filename=a.mp3'
+  curl -sN localhost:8765/jobs/<id>/events
+        """
+    )
+
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port (default: {DEFAULT_PORT})')
+    parser.add_argument('--output', type=str, default='./output', help='Output directory (default: ./output)')
+    parser.add_argument('--upload-dir', type=str, help='Where uploads are stored (default: <temp>/uploads)')
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=2,
+        help='Jobs processed at once; transcription still runs one at a time (default: 2)'
+    )
+    parser.add_argument('--max-queue', type=int, default=100, help='Max queued jobs before 503 (default: 100)')
+    parser.add_argument('--max-upload-mb', type=float, default=2048, help='Max upload size in MB (default: 2048)')
+    parser.add_argument('--keep-uploads', action='store_true', help='Keep uploaded files after processing')
+
+    # Processing options
+    parser.add_argument(
+        '--model',
+        type=str,
+        choices=['tiny', 'base', 'small', 'medium', 'large'],
+        default='base',
+        help='Whisper model size (default: base)'
+    )
+    parser.add_argument(
+        '--device',
+        type=str,
+        choices=['cpu', 'cuda'],
+        default='cpu',
+        help='Device (default: cpu)'
+    )
+    parser.add_argument(
+        '--audio-cache',
+        type=str,
+        metavar='DIR',
+        help='Cache normalized 16kHz mono audio in DIR and reuse it on later jobs'
+    )
+    parser.add_argument(
+        '--stub-transcriber',
+        action='store_true',
+        help='Use a fake transcriber (fixed-length placeholder sentences, no model) for testing'
+    )
+    parser.add_argument(
+        '--stub-delay',
+        type=float,
+        default=0.0,
+        help='Simulated transcription time per file for --stub-transcriber (seconds)'
+    )
+    parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+
+    from config import WhisperConfig, AudioConfig, ProcessConfig, PathConfig
+    config = AppConfig(
+        whisper=WhisperConfig(model_size=args.model, device=args.device),
+        audio=AudioConfig(cache_dir=Path(args.audio_cache) if args.audio_cache else None),
+        process=ProcessConfig(),
+        paths=PathConfig(output_dir=Path(args.output))
+    )
+
+    transcriber = None
+    if args.stub_transcriber:
+        from transcriber import StubTranscriber
+        transcriber = StubTranscriber(config.whisper, delay=args.stub_delay)
+
+    service = AudioService(
+        AudioProcessor(config, transcriber=transcriber),
+        args.output,
+        upload_dir=args.upload_dir,
+        concurrency=args.concurrency,
+        max_queue=args.max_queue,
+        max_upload_mb=args.max_upload_mb,
+        keep_uploads=args.keep_uploads
+    )
+    service.start()
+
+    server = ServiceServer(service, args.port, args.host)
+    logging.getLogger(__name__).info(f"Serving on http://{args.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,12 @@
 Transcriber Module - Sử dụng Whisper để chuyển audio thành text có timestamp
 """
 
-import whisper
-import stable_whisper
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 import logging
+import math
+import time
 
 from config import WhisperConfig
 
@@ -21,6 +21,7 @@ class TranscriptSegment:
     start: float  # Thời gian bắt đầu (giây)
     end: float    # Thời gian kết thúc (giây)
     text: str     # Nội dung text
+    confidence: Optional[float] = None  # Xác suất trung bình của các từ (0-1)
     
     @property
     def duration(self) -> float:
@@ -29,13 +30,66 @@ class TranscriptSegment:
     
     def to_dict(self) -> Dict:
         """Convert sang dictionary"""
-        return {
+        data = {
             "id": self.id,
             "start": self.start,
             "end": self.end,
             "text": self.text,
             "duration": self.duration
         }
+        if self.confidence is not None:
+            data["confidence"] = round(self.confidence, 4)
+        return data
+
+
+def segment_dict(segment) -> Dict:
+    """
+    Segment stable-whisper sang dict {start, end, text, confidence (avg_logprob),
+    words [{word, start, end, probability}]} - cùng dạng với core.transcriber
+    """
+    return {
+        "start": segment.start,
+        "end": segment.end,
+        "text": segment.text.strip(),
+        "confidence": getattr(segment, "avg_logprob", None),
+        "words": [
+            {
+                "word": word.word,
+                "start": word.start,
+                "end": word.end,
+                "probability": getattr(word, "probability", None)
+            }
+            for word in getattr(segment, "words", None) or []
+        ]
+    }
+
+
+def segment_confidence(segment: Dict) -> Optional[float]:
+    """
+    Confidence (0-1) của một segment dict: trung bình xác suất các từ, hoặc
+    exp(avg_logprob) nếu không có xác suất từng từ
+    """
+    probabilities = [
+        word["probability"] for word in segment.get("words") or []
+        if word.get("probability") is not None
+    ]
+    if probabilities:
+        return sum(probabilities) / len(probabilities)
+    avg_logprob = segment.get("confidence")
+    if avg_logprob is None:
+        return None
+    return math.exp(min(0.0, avg_logprob))
+
+
+def merge_confidence(segments: List[TranscriptSegment]) -> Optional[float]:
+    """Confidence của các segment gộp lại (trung bình theo độ dài)"""
+    scored = [seg for seg in segments if seg.confidence is not None]
+    if not scored:
+        return None
+    total = sum(seg.duration for seg in scored)
+    if total <= 0:
+        return sum(seg.confidence for seg in scored) / len(scored)
+    return sum(seg.confidence * seg.duration for seg in scored) / total
 
 
 class AudioTranscriber:
@@ -43,6 +97,9 @@ class AudioTranscriber:
     Class xử lý transcription audio thành text sử dụng Whisper
     """
     
+    # Thống kê cascade của lần transcribe gần nhất (None nếu không bật cascade)
+    cascade_report: Optional[Dict] = None
+    
     def __init__(self, config: WhisperConfig):
         """
         Khởi tạo transcriber
@@ -53,20 +110,36 @@ class AudioTranscriber:
         self.config = config
         self.logger = logging.getLogger(__name__)
         
-        # Load Whisper model
+        # Load Whisper model (import lazily: stable_whisper kéo theo torch)
+        import stable_whisper
+        
         self.logger.info(f"Loading Whisper model: {config.model_size} on {config.device}")
         self.model = stable_whisper.load_model(
             config.model_size,
             device=config.device
         )
         self.logger.info("Model loaded successfully")
+        
+        # Cascade: model lớn chỉ được load khi gặp span yếu đầu tiên
+        self.cascade = None
+        self._fallback = None
+        if config.cascade_model:
+            from core.cascade import ModelCascade
+            
+            self.cascade = ModelCascade(
+                redecode=self._redecode,
+                model=config.cascade_model,
+                min_avg_logprob=config.cascade_min_avg_logprob,
+                min_word_probability=config.cascade_min_word_probability
+            )
     
-    def transcribe(self, audio_path: str) -> List[TranscriptSegment]:
+    def transcribe(self, audio_path) -> List[TranscriptSegment]:
         """
         Transcribe audio file thành text với timestamp
         
         Args:
-            audio_path: Đường dẫn tới file audio
+            audio_path: Đường dẫn tới file audio, hoặc np.ndarray float32
+                16kHz mono đã decode sẵn (vd. từ AudioCache)
         
         Returns:
             List các TranscriptSegment
@@ -77,38 +150,71 @@ class AudioTranscriber:
             3. Stable-ts tự động align timestamp cho từng từ
             4. Split thành các segment theo câu
         """
-        audio_path = Path(audio_path)
-        if not audio_path.exists():
-            raise FileNotFoundError(f"Audio file not found: {audio_path}")
-        
-        self.logger.info(f"Transcribing: {audio_path.name}")
+        if isinstance(audio_path, (str, Path)):
+            audio_path = Path(audio_path)
+            if not audio_path.exists():
+                raise FileNotFoundError(f"Audio file not found: {audio_path}")
+            
+            self.logger.info(f"Transcribing: {audio_path.name}")
+            audio = str(audio_path)
+        else:
+            self.logger.info(f"Transcribing: <array {len(audio_path) / 16000:.2f}s>")
+            audio = audio_path
         
-        # Transcribe với stable-whisper để có timestamp chính xác
-        result = self.model.transcribe(
-            str(audio_path),
-            language=self.config.language,
-            task=self.config.task,
-            vad=self.config.vad,  # Voice Activity Detection
-            mel_first=self.config.mel_first,
-            word_timestamps=True  # Quan trọng: lấy timestamp từng từ
-        )
+        if self.cascade is None:
+            results = self._run_model(audio)
+        else:
+            # Cascade cắt các span yếu từ audio đã decode
+            if isinstance(audio, str):
+                from core.audio_io import load_audio
+                audio = load_audio(audio)
+            results = list(self.cascade.refine(self._run_model(audio), audio))
+            self.cascade_report = self.cascade.report(len(audio) / 16000)
+            self.logger.info(
+                f"Cascade: {self.cascade_report['spans']} spans "
+                f"({self.cascade_report['redecoded_ratio']:.1%} audio) "
+                f"re-decoded with {self.config.cascade_model}"
+            )
         
         # Convert result thành list TranscriptSegment
         segments = []
-        for idx, segment in enumerate(result.segments):
+        for idx, segment in enumerate(results):
             segments.append(TranscriptSegment(
                 id=idx,
-                start=segment.start,
-                end=segment.end,
-                text=segment.text.strip()
+                start=segment["start"],
+                end=segment["end"],
+                text=segment["text"],
+                confidence=segment_confidence(segment)
             ))
         
         self.logger.info(f"Transcription complete: {len(segments)} segments found")
         return segments
     
+    def _run_model(self, audio) -> List[Dict]:
+        """Chạy model, trả về segment dict (segment_dict)"""
+        # Transcribe với stable-whisper để có timestamp chính xác
+        result = self.model.transcribe(
+            audio,
+            language=self.config.language,
+            task=self.config.task,
+            vad=self.config.vad,  # Voice Activity Detection
+            mel_first=self.config.mel_first,
+            word_timestamps=True  # Quan trọng: lấy timestamp từng từ
+        )
+        return [segment_dict(segment) for segment in result.segments]
+    
+    def _redecode(self, audio) -> List[Dict]:
+        """Decode lại một span yếu bằng model lớn của cascade"""
+        if self._fallback is None:
+            self._fallback = AudioTranscriber(self.config.model_copy(update={
+                "model_size": self.config.cascade_model,
+                "cascade_model": None
+            }))
+        return self._fallback._run_model(audio)
+    
     def transcribe_to_sentences(
         self, 
-        audio_path: str,
+        audio_path,
         min_duration: float = 0.5,
         max_duration: float = 30.0
     ) -> List[TranscriptSegment]:
@@ -116,7 +222,7 @@ class AudioTranscriber:
         Transcribe và merge các segment thành câu hoàn chỉnh
         
         Args:
-            audio_path: Đường dẫn audio
+            audio_path: Đường dẫn audio (hoặc np.ndarray 16kHz mono)
             min_duration: Thời lượng tối thiểu của một segment (giây)
             max_duration: Thời lượng tối đa của một segment (giây)
         
@@ -135,6 +241,7 @@ class AudioTranscriber:
         
         merged_segments = []
         current_segment = segments[0]
+        current_parts = [current_segment]
         
         for next_segment in segments[1:]:
             # Kiểm tra nếu merge segment hiện tại với segment tiếp theo
@@ -151,16 +258,19 @@ class AudioTranscriber:
             
             if should_merge:
                 # Merge: cập nhật thời gian kết thúc và nối text
+                current_parts.append(next_segment)
                 current_segment = TranscriptSegment(
                     id=current_segment.id,
                     start=current_segment.start,
                     end=next_segment.end,
-                    text=current_segment.text + " " + next_segment.text
+                    text=current_segment.text + " " + next_segment.text,
+                    confidence=merge_confidence(current_parts)
                 )
             else:
                 # Không merge: lưu segment hiện tại và bắt đầu segment mới
                 merged_segments.append(current_segment)
                 current_segment = next_segment
+                current_parts = [current_segment]
         
         # Thêm segment cuối cùng
         merged_segments.append(current_segment)
@@ -176,6 +286,64 @@ class AudioTranscriber:
         
         return merged_segments
     
+    def transcribe_to_buckets(
+        self,
+        audio_path,
+        planner
+    ) -> Tuple[List[TranscriptSegment], Dict]:
+        """
+        Transcribe và gộp các segment theo kế hoạch của SegmentPlanner
+        
+        Segment của stable-whisper là phrase, không phải câu: planner chỉ được
+        cắt sau segment kết thúc bằng dấu câu (. ! ? …), trừ khi câu dài hơn
+        max_duration. Số điểm cắt giữa câu được ghi vào report.
+        
+        Args:
+            audio_path: Đường dẫn audio (hoặc np.ndarray 16kHz mono)
+            planner: core.segment_planner.SegmentPlanner
+        
+        Returns:
+            (List TranscriptSegment đã gộp, report padding efficiency)
+        """
+        segments = self.transcribe(audio_path)
+        
+        if not segments:
+            return [], {}
+        
+        from core.segment_planner import sentence_boundaries
+        
+        spans = [(seg.start, seg.end) for seg in segments]
+        boundaries = sentence_boundaries([seg.text for seg in segments])
+        groups = planner.plan(spans, boundaries=boundaries)
+        
+        planned = [
+            TranscriptSegment(
+                id=idx,
+                start=segments[i].start,
+                end=segments[j - 1].end,
+                text=" ".join(seg.text for seg in segments[i:j]),
+                confidence=merge_confidence(segments[i:j])
+            )
+            for idx, (i, j) in enumerate(groups)
+        ]
+        
+        report = planner.report(
+            [(seg.start, seg.end) for seg in planned],
+            baseline=spans
+        )
+        report['cut_points'] = 'sentence_end'
+        report['mid_sentence_cuts'] = sum(
+            1 for _, j in groups[:-1] if not boundaries[j - 1]
+        )
+        
+        self.logger.info(
+            f"Planned {len(planned)} segments (original: {len(segments)}), "
+            f"padding efficiency {report['padding_efficiency']:.1%}, "
+            f"{report['mid_sentence_cuts']} mid-sentence cuts"
+        )
+        
+        return planned, report
+    
     def save_transcript(self, segments: List[TranscriptSegment], output_path: str):
         """
         Lưu transcript ra file text
@@ -222,6 +390,57 @@ class AudioTranscriber:
         self.logger.info(f"JSON transcript saved to: {output_path}")
 
 
+class StubTranscriber(AudioTranscriber):
+    """
+    Transcriber giả, không load model: chia audio thành các câu dài đều nhau
+    với text placeholder
+    
+    Dùng để chạy thử / test service và pipeline trên máy không có Whisper.
+    """
+    
+    def __init__(
+        self,
+        config: WhisperConfig,
+        sentence_seconds: float = 4.0,
+        delay: float = 0.0
+    ):
+        """
+        Args:
+            config: WhisperConfig (chỉ để giữ cùng interface)
+            sentence_seconds: Độ dài mỗi câu giả (giây)
+            delay: Thời gian "transcribe" giả lập cho mỗi file (giây)
+        """
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.model = None
+        self.sentence_seconds = sentence_seconds
+        self.delay = delay
+        self.logger.info("Using stub transcriber (no model loaded)")
+    
+    def transcribe(self, audio_path) -> List[TranscriptSegment]:
+        """Các câu giả phủ toàn bộ audio (path hoặc np.ndarray 16kHz mono)"""
+        if isinstance(audio_path, (str, Path)):
+            from core.audio_io import load_audio
+            audio_path = load_audio(str(audio_path))
+        
+        duration = len(audio_path) / 16000
+        if self.delay:
+            time.sleep(self.delay)
+        
+        segments = []
+        start = 0.0
+        while duration - start >= 0.5:
+            end = min(duration, start + self.sentence_seconds)
+            segments.append(TranscriptSegment(
+                id=len(segments),
+                start=start,
+                end=end,
+                text=f"Câu số {len(segments) + 1}."
+            ))
+            start = end
+        return segments
+
+
 # Example usage
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
@@ -13,6 +13,9 @@ from datetime import datetime
 
 from config import AppConfig
 from processor import AudioProcessor
+from core.scheduler import EtaEstimator, format_eta, order_files, probe_durations
+from core.dedup import ContentRegistry, link_output
+from worker_metrics import MetricsServer, WorkerMetrics
 
 
 class Worker:
@@ -33,7 +36,9 @@ class Worker:
         worker_id: str,
         shared_input_dir: str,
         shared_output_dir: str,
-        config: AppConfig
+        config: AppConfig,
+        metrics_port: Optional[int] = None,
+        metrics_dir: Optional[str] = None
     ):
         """
         Khởi tạo Worker
@@ -43,6 +48,8 @@ class Worker:
             shared_input_dir: Thư mục chung chứa audio cần xử lý
             shared_output_dir: Thư mục chung để lưu kết quả
             config: AppConfig
+            metrics_port: Port serve /metrics (Prometheus), None = tắt
+            metrics_dir: Thư mục chung ghi <worker_id>.prom, None = tắt
         """
         self.worker_id = worker_id
         self.shared_input_dir = Path(shared_input_dir)
@@ -58,6 +65,24 @@ class Worker:
         # Initialize processor
         self.processor = AudioProcessor(config)
         
+        # RTF đo trên các file worker này đã xử lý, dùng cho ETA
+        self.eta = EtaEstimator()
+        
+        # Nội dung đã xử lý (của mọi worker), để bản trùng chỉ link output
+        self.registry = None
+        if config.process.dedup:
+            self.registry = ContentRegistry(self.shared_output_dir)
+        
+        # Metrics
+        self.metrics = WorkerMetrics(worker_id)
+        self.metrics_dir = metrics_dir
+        self.metrics_server = None
+        
+        if metrics_port is not None:
+            self.metrics_server = MetricsServer(self.metrics, metrics_port)
+            self.metrics_server.start()
+            self.logger.info(f"  Metrics: http://127.0.0.1:{self.metrics_server.port}/metrics")
+        
         self.logger.info(f"Worker {worker_id} initialized")
         self.logger.info(f"  Input dir: {shared_input_dir}")
         self.logger.info(f"  Output dir: {shared_output_dir}")
@@ -67,7 +92,8 @@ class Worker:
         Tìm các file audio chưa được xử lý
         
         Returns:
-            List các Path object
+            List các Path object, theo thứ tự của config.process.schedule
+            (mặc định file dài trước để file dài không dồn về cuối hàng đợi)
         
         Logic:
             - File chưa xử lý: không có .processing và không có .done
@@ -87,7 +113,40 @@ class Worker:
                 if not processing_marker.exists() and not done_marker.exists():
                     pending_files.append(audio_file)
         
-        return sorted(pending_files)
+        return order_files(
+            pending_files,
+            self.config.process.schedule,
+            self.get_durations(pending_files)
+        )
+    
+    def get_durations(self, audio_files: list) -> dict:
+        """
+        Độ dài (giây) của các file, tra từ probe index của processor
+        
+        Chỉ file mới hoặc đã thay đổi (theo size, mtime) mới được probe header.
+        
+        Returns:
+            Dict {str(path): duration}
+        """
+        probe_index = self.processor.probe_index
+        probe_index.probe_all(audio_files)
+        return probe_durations(audio_files, probe=probe_index.get)
+    
+    def update_eta(self, pending_files: list):
+        """Cập nhật gauge audio trong hàng đợi / ETA và log ETA"""
+        durations = self.get_durations(pending_files)
+        queue_audio = sum(durations.values())
+        remaining = self.eta.remaining_seconds(queue_audio)
+        
+        self.metrics.set("queue_audio_seconds", queue_audio)
+        if remaining is not None:
+            self.metrics.set("real_time_factor", self.eta.rtf)
+            self.metrics.set("eta_seconds", remaining)
+        
+        self.logger.info(
+            f"Queue: {len(pending_files)} files, {queue_audio / 3600:.2f}h audio, "
+            f"ETA (this worker alone) {format_eta(remaining)}"
+        )
     
     def lock_file(self, audio_file: Path) -> bool:
         """
@@ -106,6 +165,7 @@ class Worker:
         
         # Check nếu file đã bị lock (race condition)
         if lock_file.exists():
+            self.metrics.inc("lock_contention_total")
             return False
         
         try:
@@ -162,21 +222,69 @@ class Worker:
         Returns:
             True nếu thành công, False nếu thất bại
         """
+        result = None
+        duplicate = False
+        self.metrics.set("busy", 1)
+        
         try:
             # Tạo output directory cho file này
             output_dir = self.shared_output_dir / audio_file.stem
             
+            # Cùng nội dung đã được xử lý (bởi worker bất kỳ): chỉ link output
+            if self.registry is not None:
+                entry = self.registry.find(audio_file)
+                if entry is not None:
+                    duplicate = True
+                    self.link_duplicate(audio_file, entry, output_dir)
+                    return True
+            
             # Process
             result = self.processor.process_single_file(
                 str(audio_file),
                 str(output_dir)
             )
             
+            if result["status"] == "success" and self.registry is not None:
+                self.registry.register(audio_file, result["output_dir"])
+            
+            if result["status"] == "success":
+                timing = result.get("timing") or {}
+                duration = timing.get("audio_duration") or result.get("total_duration") or 0.0
+                self.eta.complete(duration, wall=timing.get("total_wall"))
+            
             return result["status"] == "success"
         
         except Exception as e:
             self.logger.error(f"Failed to process {audio_file.name}: {e}")
             return False
+        
+        finally:
+            self.metrics.set("busy", 0)
+            if not duplicate:
+                self.metrics.observe_file(result)
+            self.flush_metrics()
+    
+    def link_duplicate(self, audio_file: Path, entry: dict, output_dir: Path):
+        """Tạo output cho file trùng nội dung từ output đã có (hardlink hoặc tham chiếu)"""
+        method = link_output(entry["output_dir"], str(output_dir), entry["input_file"])
+        
+        info = self.processor.probe_index.get(str(audio_file))
+        self.metrics.inc("duplicates_total")
+        self.metrics.inc("audio_seconds_saved_total", info["duration"] if info else 0.0)
+        
+        self.logger.info(
+            f"Duplicate of {Path(entry['input_file']).name}: output {method} -> {output_dir}"
+        )
+    
+    def flush_metrics(self):
+        """Ghi textfile metrics vào thư mục chung (nếu bật --metrics-dir)"""
+        if not self.metrics_dir:
+            return
+        
+        try:
+            self.metrics.write_textfile(self.metrics_dir)
+        except OSError as e:
+            self.logger.warning(f"Failed to write metrics: {e}")
     
     def run(self, poll_interval: int = 10, max_files: Optional[int] = None):
         """
@@ -201,9 +309,11 @@ class Worker:
             while True:
                 # Tìm file pending
                 pending_files = self.get_pending_files()
+                self.metrics.set("queue_depth", len(pending_files))
+                self.metrics.touch()
                 
                 if pending_files:
-                    self.logger.info(f"Found {len(pending_files)} pending files")
+                    self.update_eta(pending_files)
                     
                     # Process first file
                     audio_file = pending_files[0]
@@ -234,7 +344,9 @@ class Worker:
                 
                 else:
                     self.logger.info("No pending files, waiting...")
+                    self.flush_metrics()
                     time.sleep(poll_interval)
+                    self.metrics.inc("idle_seconds_total", poll_interval)
         
         except KeyboardInterrupt:
             self.logger.info("Worker stopped by user")
@@ -243,6 +355,10 @@ class Worker:
             self.logger.error(f"Worker error: {e}", exc_info=True)
         
         finally:
+            self.flush_metrics()
+            if self.metrics_server is not None:
+                self.metrics_server.stop()
+            
             self.logger.info(f"Worker {self.worker_id} finished")
             self.logger.info(f"Total files processed: {processed_count}")
 
@@ -264,6 +380,13 @@ Example:
   
   # Chạy worker xử lý tối đa 10 files rồi dừng
   python worker.py --id worker_03 --input /shared/input --output /shared/output --max-files 10
+  
+  # Export metrics (Prometheus) qua HTTP và textfile trong thư mục chung
+  python worker.py --id worker_04 --input /shared/input --output /shared/output \\
+      --metrics-port 9108 --metrics-dir /shared/metrics
+  
+  # Gộp metrics của cả fleet
+  python worker_metrics.py aggregate --dir /shared/metrics
         """
     )
     
@@ -313,6 +436,43 @@ Example:
         type=int,
         help='Maximum files to process before stopping'
     )
+    parser.add_argument(
+        '--schedule',
+        type=str,
+        choices=['longest', 'shortest', 'name'],
+        default='longest',
+        help='Order of pending files by audio duration (default: longest first)'
+    )
+    parser.add_argument(
+        '--no-dedup',
+        action='store_true',
+        help='Process inputs with identical content separately (default: process once, link outputs)'
+    )
+    
+    parser.add_argument(
+        '--profile-memory',
+        action='store_true',
+        help='Record peak memory per stage into each output memory_report.json (slow)'
+    )
+    
+    parser.add_argument(
+        '--audio-cache',
+        type=str,
+        metavar='DIR',
+        help='Cache normalized 16kHz mono audio in DIR (local disk per worker)'
+    )
+    
+    # Metrics
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        help='Serve Prometheus metrics on this local port'
+    )
+    parser.add_argument(
+        '--metrics-dir',
+        type=str,
+        help='Shared directory to write <worker_id>.prom textfile metrics'
+    )
     
     # Logging
     parser.add_argument(
@@ -343,11 +503,19 @@ Example:
     )
     
     # Create config
-    from config import AppConfig, WhisperConfig
+    from config import AppConfig, WhisperConfig, AudioConfig, ProcessConfig
     config = AppConfig(
         whisper=WhisperConfig(
             model_size=args.model,
             device=args.device
+        ),
+        audio=AudioConfig(
+            cache_dir=Path(args.audio_cache) if args.audio_cache else None
+        ),
+        process=ProcessConfig(
+            profile_memory=args.profile_memory,
+            schedule=args.schedule,
+            dedup=not args.no_dedup
         )
     )
     
@@ -356,7 +524,9 @@ Example:
         worker_id=args.id,
         shared_input_dir=args.input,
         shared_output_dir=args.output,
-        config=config
+        config=config,
+        metrics_port=args.metrics_port,
+        metrics_dir=args.metrics_dir
     )
     
     worker.run(
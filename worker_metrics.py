@@ -0,0 +1,304 @@
+"""
+Worker Metrics - Counters/histograms cho worker.py theo Prometheus text format
+
+Mỗi worker có thể:
+    - Serve /metrics qua HTTP local (--metrics-port)
+    - Ghi textfile <worker_id>.prom vào thư mục chung (--metrics-dir),
+      dùng được với node-exporter textfile collector
+
+Gộp textfile của cả fleet:
+    python worker_metrics.py aggregate --dir /shared/metrics --output /var/lib/node_exporter/audio.prom
+"""
+
+import argparse
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+
+
+PREFIX = "audio_worker"
+
+# Bucket (giây) cho latency theo stage và theo file
+LATENCY_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+
+# (tên, type, help) của các metric family
+METRIC_HELP = [
+    ("files_processed_total", "counter", "Files processed successfully"),
+    ("files_failed_total", "counter", "Files that failed processing"),
+    ("audio_seconds_total", "counter", "Seconds of audio processed"),
+    ("duplicates_total", "counter", "Files skipped as duplicates of already processed content"),
+    ("audio_seconds_saved_total", "counter", "Seconds of audio not reprocessed thanks to deduplication"),
+    ("audio_hours_per_hour", "gauge", "Audio hours processed per wall-clock hour since start"),
+    ("queue_depth", "gauge", "Pending files seen at the last poll"),
+    ("queue_audio_seconds", "gauge", "Seconds of audio in pending files at the last poll"),
+    ("real_time_factor", "gauge", "Processing seconds per audio second measured by this worker"),
+    ("eta_seconds", "gauge", "Time for this worker alone to drain the pending queue"),
+    ("lock_contention_total", "counter", "Lock attempts lost to another worker"),
+    ("idle_seconds_total", "counter", "Seconds spent waiting for new files"),
+    ("busy", "gauge", "1 while a file is being processed"),
+    ("uptime_seconds", "gauge", "Seconds since the worker started"),
+    ("last_activity_timestamp_seconds", "gauge", "Unix time of the last poll or completed file"),
+    ("stage_seconds", "histogram", "Per-stage latency of processed files"),
+    ("file_seconds", "histogram", "Total processing time per file"),
+]
+
+
+class Histogram:
+    """Histogram đơn giản với bucket cố định (cumulative khi render)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class WorkerMetrics:
+    """Metrics của một worker, thread-safe (HTTP thread đọc, worker loop ghi)"""
+
+    def __init__(self, worker_id: str):
+        self.worker_id = worker_id
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+        self.counters = {
+            "files_processed_total": 0,
+            "files_failed_total": 0,
+            "audio_seconds_total": 0.0,
+            "duplicates_total": 0,
+            "audio_seconds_saved_total": 0.0,
+            "lock_contention_total": 0,
+            "idle_seconds_total": 0.0,
+        }
+        self.gauges = {
+            "queue_depth": 0,
+            "queue_audio_seconds": 0.0,
+            "real_time_factor": 0.0,
+            "eta_seconds": 0.0,
+            "busy": 0,
+            "last_activity_timestamp_seconds": self.started_at,
+        }
+        self.stage_histograms: Dict[str, Histogram] = {}
+        self.file_histogram = Histogram()
+
+    def inc(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def set(self, name: str, value: float):
+        with self._lock:
+            self.gauges[name] = value
+
+    def touch(self):
+        """Đánh dấu worker còn sống (dùng để phát hiện node bị treo)"""
+        self.set("last_activity_timestamp_seconds", time.time())
+
+    def observe_file(self, result: Optional[dict]):
+        """
+        Ghi nhận kết quả xử lý một file
+
+        Args:
+            result: Metadata từ AudioProcessor.process_single_file (None nếu exception)
+        """
+        with self._lock:
+            if result and result.get("status") == "success":
+                self.counters["files_processed_total"] += 1
+            else:
+                self.counters["files_failed_total"] += 1
+
+            timing = (result or {}).get("timing")
+            if timing:
+                self.counters["audio_seconds_total"] += timing.get("audio_duration") or 0.0
+                self.file_histogram.observe(timing["total_wall"])
+                for stage, stats in timing["stages"].items():
+                    self.stage_histograms.setdefault(stage, Histogram()).observe(stats["wall"])
+
+            self.gauges["last_activity_timestamp_seconds"] = time.time()
+
+    def render(self) -> str:
+        """Render Prometheus text exposition format"""
+        labels = f'worker="{self.worker_id}"'
+        now = time.time()
+
+        with self._lock:
+            uptime = now - self.started_at
+            values = dict(self.counters)
+            values.update(self.gauges)
+            values["uptime_seconds"] = uptime
+            values["audio_hours_per_hour"] = (
+                values["audio_seconds_total"] / uptime if uptime > 0 else 0.0
+            )
+
+            lines = []
+            for name, metric_type, help_text in METRIC_HELP:
+                full_name = f"{PREFIX}_{name}"
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {metric_type}")
+
+                if name == "stage_seconds":
+                    for stage, histogram in sorted(self.stage_histograms.items()):
+                        lines.extend(histogram.render(full_name, f'{labels},stage="{stage}"'))
+                elif name == "file_seconds":
+                    lines.extend(self.file_histogram.render(full_name, labels))
+                else:
+                    lines.append(f"{full_name}{{{labels}}} {_format_value(values[name])}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, directory: str) -> Path:
+        """Ghi <worker_id>.prom vào thư mục (atomic rename, an toàn với collector)"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        path = directory / f"{self.worker_id}.prom"
+        tmp_path = directory / f".{self.worker_id}.prom.tmp"
+        tmp_path.write_text(self.render(), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+        return path
+
+
+class MetricsServer:
+    """HTTP server local serve /metrics trong daemon thread"""
+
+    def __init__(self, metrics: WorkerMetrics, port: int, host: str = "127.0.0.1"):
+        handler = self._make_handler(metrics)
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @staticmethod
+    def _make_handler(metrics: WorkerMetrics):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.getLogger(__name__).debug(format % args)
+
+        return Handler
+
+
+def aggregate_textfiles(directory: str, stale_after: float = 600.0) -> str:
+    """
+    Gộp các <worker_id>.prom trong thư mục chung thành một textfile
+
+    HELP/TYPE của mỗi metric family chỉ xuất hiện một lần, các series của
+    mọi worker được gom dưới family tương ứng. Thêm metric tuổi của từng
+    file và cờ stale để phát hiện worker chậm/treo.
+
+    Args:
+        directory: Thư mục chứa các file .prom
+        stale_after: Số giây không cập nhật thì coi worker là stale
+    """
+    families: Dict[str, Dict] = {}
+    order: List[str] = []
+    ages = []
+    now = time.time()
+
+    for path in sorted(Path(directory).glob("*.prom")):
+        worker_id = path.stem
+        ages.append((worker_id, now - path.stat().st_mtime))
+
+        current = None
+        for line in path.read_text(encoding="utf-8").splitlines():
+            if not line.strip():
+                continue
+            if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                name = line.split()[2]
+                if name not in families:
+                    families[name] = {"meta": [], "samples": []}
+                    order.append(name)
+                if line not in families[name]["meta"]:
+                    families[name]["meta"].append(line)
+                current = name
+            elif current is not None:
+                families[current]["samples"].append(line)
+
+    lines = []
+    for name in order:
+        lines.extend(families[name]["meta"])
+        lines.extend(families[name]["samples"])
+
+    lines.append(f"# HELP {PREFIX}_textfile_age_seconds Seconds since the worker last wrote its metrics")
+    lines.append(f"# TYPE {PREFIX}_textfile_age_seconds gauge")
+    for worker_id, age in ages:
+        lines.append(f'{PREFIX}_textfile_age_seconds{{worker="{worker_id}"}} {age:.1f}')
+
+    lines.append(f"# HELP {PREFIX}_stale 1 if the worker has not written metrics for stale_after seconds")
+    lines.append(f"# TYPE {PREFIX}_stale gauge")
+    for worker_id, age in ages:
+        lines.append(f'{PREFIX}_stale{{worker="{worker_id}"}} {1 if age > stale_after else 0}')
+
+    return "\n".join(lines) + "\n"
+
+
+def _format_value(value: float) -> str:
+    return str(value) if isinstance(value, int) else f"{value:.6f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker metrics tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    aggregate = subparsers.add_parser('aggregate', help='Merge per-worker .prom files')
+    aggregate.add_argument('--dir', required=True, help='Shared metrics directory')
+    aggregate.add_argument('--output', help='Output file (default: stdout)')
+    aggregate.add_argument('--stale-after', type=float, default=600.0,
+                           help='Seconds without update before a worker is stale (default: 600)')
+
+    args = parser.parse_args()
+
+    text = aggregate_textfiles(args.dir, args.stale_after)
+    if args.output:
+        output = Path(args.output)
+        tmp_path = output.with_name(f".{output.name}.tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, output)
+    else:
+        print(text, end="")
+
+
+if __name__ == "__main__":
+    main()